@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+"""
+Import Path Benchmark
+
+Runs import_data.py over a generated data set (see generate_sdwis_data.py) once per
+import path and records wall time, rows/sec, the importer's time per phase (from
+--metrics-json), its peak RSS and the database size after the load. Each path starts from empty tables, except delta,
+which re-imports the same files over a completed load the way a quarterly re-run
+does. A load counts only if every table holds the distinct keys listed in the data
+set's manifest.json.
+
+Results are appended to a JSON lines file, one record per run with the git commit,
+the data set and the host, and compared with the latest earlier run of the same
+data set from another commit.
+
+The tables are emptied with TRUNCATE ... CASCADE, which also clears the map tables
+and AI explanations: point DB_NAME at a scratch database and pass --truncate.
+
+Usage:
+    python benchmark_import.py --data-dir ../bench/ga-10x --truncate
+    python benchmark_import.py --data-dir ../bench/ga-10x --truncate --paths bulk bulk-jobs delta --jobs 4
+                               [--results ../bench/results.jsonl] [--label NOTE]
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import subprocess
+import tempfile
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional
+from db import connect
+from import_data import IMPORT_ORDER, TABLE_SPECS
+
+SCRIPTS_DIR = Path(__file__).resolve().parent
+
+class ImportPath(NamedTuple):
+    name: str
+    args: List[str]
+    fresh: bool = True   # start from empty tables; otherwise run over a completed load
+    writes: bool = True  # parse-only reads the files without loading them
+
+IMPORT_PATHS = {path.name: path for path in [
+    ImportPath('rows', []),
+    ImportPath('bulk', ['--bulk']),
+    ImportPath('bulk-columnar', ['--bulk', '--parser', 'columnar']),
+    ImportPath('bulk-jobs', ['--bulk', '--jobs', '{jobs}']),
+    ImportPath('delta', ['--delta'], fresh=False),
+    ImportPath('parse-only', ['--parse-only', '--parser', 'columnar'], writes=False),
+]}
+
+# Besides the imported tables: checkpoints of earlier runs would make the importer skip
+# rows, and the map sync state would leave the map tables empty
+EXTRA_TABLES = ['import_checkpoints', 'map_location_syncs']
+
+def git_commit() -> Optional[str]:
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=SCRIPTS_DIR, capture_output=True,
+                                text=True, check=True).stdout.strip()
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=SCRIPTS_DIR,
+                               capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return commit + ('-dirty' if dirty else '')
+
+def dataset_key(dataset: dict) -> tuple:
+    """Runs are comparable when they loaded the same generated files"""
+    return (dataset.get('scale'), dataset.get('seed'), tuple(dataset.get('quarters', [])),
+            dataset.get('violations_per_system'), dataset.get('rows'))
+
+class ImportBenchmark:
+    def __init__(self, conn, data_dir: Path, jobs: int = 4, verbose: bool = False):
+        self.conn = conn
+        self.cursor = conn.cursor()
+        self.data_dir = data_dir
+        self.jobs = jobs
+        self.verbose = verbose
+        with open(data_dir / 'manifest.json') as f:
+            self.manifest = json.load(f)
+        self.loaded = False
+
+    def truncate(self):
+        tables = [TABLE_SPECS[table].table for table in IMPORT_ORDER] + EXTRA_TABLES
+        self.cursor.execute(f"TRUNCATE {', '.join(tables)} CASCADE")
+        self.conn.commit()
+        self.loaded = False
+
+    def run_importer(self, path: ImportPath):
+        """Run import_data.py; returns (seconds, peak RSS in MB, exit status, output, seconds per phase)"""
+        args = [arg.format(jobs=self.jobs) for arg in path.args]
+        with tempfile.TemporaryDirectory() as scratch, tempfile.TemporaryFile('w+') as log:
+            metrics_file = Path(scratch) / 'metrics.json'
+            command = [sys.executable, str(SCRIPTS_DIR / 'import_data.py'), '--data-dir', str(self.data_dir),
+                       '--quarantine-dir', str(Path(scratch) / 'quarantine'),
+                       '--metrics-json', str(metrics_file)] + args
+            started = time.perf_counter()
+            process = subprocess.Popen(command, cwd=SCRIPTS_DIR, stdout=None if self.verbose else log,
+                                       stderr=subprocess.STDOUT)
+            # wait4 reports the importer's own resource usage, including the --jobs workers it waited for
+            _, status, usage = os.wait4(process.pid, 0)
+            process.returncode = os.waitstatus_to_exitcode(status)
+            seconds = time.perf_counter() - started
+            log.seek(0)
+            output = log.read()
+            phases = {}
+            if metrics_file.exists():
+                with open(metrics_file) as f:
+                    phases = {name: total['seconds'] for name, total in json.load(f)['phase_totals'].items()}
+        # ru_maxrss is in kilobytes on Linux and bytes on macOS
+        peak_rss_mb = usage.ru_maxrss / (1024 * 1024 if sys.platform == 'darwin' else 1024)
+        return seconds, peak_rss_mb, process.returncode, output, phases
+
+    def check_load(self) -> List[str]:
+        """Tables whose row counts differ from the distinct keys in the manifest"""
+        problems = []
+        for info in self.manifest['files'].values():
+            self.cursor.execute(f"SELECT COUNT(*) FROM {TABLE_SPECS[info['table']].table} WHERE removed_at IS NULL")
+            actual = self.cursor.fetchone()[0]
+            if actual != info['keys']:
+                problems.append(f"{info['table']} has {actual:,} rows, expected {info['keys']:,}")
+        self.conn.commit()
+        return problems
+
+    def database_size(self):
+        """(database MB, imported tables MB including indexes and TOAST)"""
+        tables = [TABLE_SPECS[table].table for table in IMPORT_ORDER]
+        self.cursor.execute("""
+            SELECT pg_database_size(current_database()),
+                   (SELECT SUM(pg_total_relation_size(t::regclass))::bigint FROM unnest(%s::text[]) t)
+        """, (tables,))
+        database, imported = self.cursor.fetchone()
+        self.conn.commit()
+        return database / 1e6, imported / 1e6
+
+    def run_path(self, path: ImportPath) -> Dict:
+        if path.fresh and path.writes:
+            self.truncate()
+        elif not path.fresh and not self.loaded:
+            # Delta needs a completed load to compare against; it is not timed
+            print(f"   ⏳ Loading with --bulk before {path.name}")
+            self.truncate()
+            _, _, status, output, _ = self.run_importer(IMPORT_PATHS['bulk'])
+            self.loaded = status == 0 and not self.check_load()
+
+        print(f"🔄 {path.name}: import_data.py {' '.join(arg.format(jobs=self.jobs) for arg in path.args)}")
+        seconds, peak_rss_mb, status, output, phases = self.run_importer(path)
+        problems = [] if status == 0 else [f"importer exited with status {status}"]
+        if path.writes:
+            problems += self.check_load()
+            self.loaded = not problems
+        database_mb, tables_mb = self.database_size()
+        rows = self.manifest['rows']
+        result = {
+            'path': path.name,
+            'args': [arg.format(jobs=self.jobs) for arg in path.args],
+            'seconds': round(seconds, 3),
+            'rows': rows,
+            'rows_per_sec': round(rows / seconds, 1),
+            'peak_rss_mb': round(peak_rss_mb, 1),
+            'database_mb': round(database_mb, 1),
+            'tables_mb': round(tables_mb, 1),
+            # Summed over worker processes with --jobs, so they can add up to more than seconds
+            'phases': phases,
+            'ok': not problems,
+            'problems': problems,
+        }
+        if problems:
+            for problem in problems:
+                print(f"   ❌ {problem}")
+            if output:
+                print("   Last importer output:")
+                for line in output.strip().splitlines()[-10:]:
+                    print(f"      {line}")
+        else:
+            print(f"   ✅ {rows:,} rows in {seconds:.1f}s ({rows / seconds:,.0f} rows/sec), "
+                  f"peak RSS {peak_rss_mb:.0f} MB, database {database_mb:.0f} MB")
+            if phases:
+                print("      " + ", ".join(f"{name} {phase_seconds:.1f}s" for name, phase_seconds
+                                          in sorted(phases.items(), key=lambda item: item[1], reverse=True)))
+        return result
+
+    def host(self) -> Dict:
+        self.cursor.execute("SHOW server_version")
+        server_version = self.cursor.fetchone()[0]
+        self.conn.commit()
+        return {
+            'hostname': platform.node(),
+            'platform': platform.platform(),
+            'python': platform.python_version(),
+            'cpus': os.cpu_count(),
+            'postgres': server_version,
+        }
+
+    def run(self, paths: List[str], label: Optional[str] = None) -> Dict:
+        print(f"📦 {self.data_dir}: {self.manifest['scale']:g}x, {self.manifest['systems']:,} systems, "
+              f"{self.manifest['rows']:,} rows ({self.manifest['bytes'] / 1e6:.0f} MB)")
+        return {
+            'commit': git_commit(),
+            'label': label,
+            'started_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'dataset': {key: value for key, value in self.manifest.items() if key != 'files'},
+            'host': self.host(),
+            'paths': [self.run_path(IMPORT_PATHS[name]) for name in paths],
+        }
+
+def load_results(results_file: Path) -> List[Dict]:
+    if not results_file.exists():
+        return []
+    with open(results_file) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def print_comparison(record: Dict, previous: List[Dict]):
+    """Rates and memory against the latest earlier run of the same data set from another commit"""
+    baseline = next((run for run in reversed(previous)
+                     if dataset_key(run['dataset']) == dataset_key(record['dataset'])
+                     and run['commit'] != record['commit']), None)
+    print("\n📋 Results" + (f" (change from {(baseline['commit'] or 'unknown')[:12]}, {baseline['started_at']})"
+                           if baseline else ""))
+    before = {result['path']: result for result in baseline['paths'] if result['ok']} if baseline else {}
+    print("   " + "path".ljust(15) + "seconds".rjust(10) + "rows/sec".rjust(12) + "change".rjust(9)
+          + "peak RSS MB".rjust(13) + "change".rjust(9) + "DB MB".rjust(9))
+    for result in record['paths']:
+        if not result['ok']:
+            print("   " + result['path'].ljust(15) + "failed".rjust(10))
+            continue
+        old = before.get(result['path'])
+        rate_change = f"{result['rows_per_sec'] / old['rows_per_sec'] - 1:+.0%}" if old else ""
+        rss_change = f"{result['peak_rss_mb'] / old['peak_rss_mb'] - 1:+.0%}" if old else ""
+        print("   " + result['path'].ljust(15) + f"{result['seconds']:10.1f}" + f"{result['rows_per_sec']:12,.0f}"
+              + rate_change.rjust(9) + f"{result['peak_rss_mb']:13.0f}" + rss_change.rjust(9)
+              + f"{result['database_mb']:9.0f}")
+
+def main():
+    parser = argparse.ArgumentParser(description='Time each import path over a generated data set')
+    parser.add_argument('--data-dir', required=True, help='Directory written by generate_sdwis_data.py')
+    parser.add_argument('--paths', nargs='+', choices=list(IMPORT_PATHS), default=list(IMPORT_PATHS),
+                        help='Import paths to time, in order')
+    parser.add_argument('--jobs', type=int, default=4, help='Worker processes for bulk-jobs')
+    parser.add_argument('--results', default='../bench/results.jsonl', help='JSON lines file the run is appended to')
+    parser.add_argument('--label', help='Note stored with the run, e.g. what changed')
+    parser.add_argument('--truncate', action='store_true',
+                        help='Allow emptying the imported tables before each path (required)')
+    parser.add_argument('--verbose', action='store_true', help="Show the importer's output")
+
+    args = parser.parse_args()
+    if not args.truncate:
+        parser.error('every path starts from empty tables; pass --truncate to confirm DB_NAME is a scratch database')
+    data_dir = Path(args.data_dir).resolve()
+    if not (data_dir / 'manifest.json').exists():
+        parser.error(f'{data_dir} has no manifest.json; generate it with generate_sdwis_data.py')
+
+    conn = connect()
+    try:
+        record = ImportBenchmark(conn, data_dir, args.jobs, args.verbose).run(args.paths, args.label)
+    finally:
+        conn.close()
+
+    results_file = Path(args.results)
+    previous = load_results(results_file)
+    results_file.parent.mkdir(parents=True, exist_ok=True)
+    with open(results_file, 'a') as f:
+        f.write(json.dumps(record) + '\n')
+    print_comparison(record, previous)
+    print(f"\n💾 Appended to {results_file}")
+    sys.exit(0 if all(result['ok'] for result in record['paths']) else 1)
+
+if __name__ == '__main__':
+    main()
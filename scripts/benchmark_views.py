@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""
+View Latency Benchmark
+
+Times the queries the apps and reports run over the violation tables, best of
+--repeat runs each, and the removal of the oldest quarter's violations inside a
+transaction that is rolled back. Meant for a database holding many quarters of
+history (generate_sdwis_data.py --quarters 24), run before and after a schema
+change such as partitioning violations_enforcement.
+
+Results are appended to a JSON lines file, one record per run with the git commit,
+the quarters and rows loaded and whether the violation tables are partitioned, and
+compared with the latest earlier run over the same data from another commit or schema.
+
+Usage:
+    python benchmark_views.py [--repeat 5] [--results ../bench/views.jsonl] [--label NOTE]
+"""
+
+import sys
+import json
+import time
+import argparse
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional
+from benchmark_import import git_commit, load_results
+from db import connect
+
+class Benchmark(NamedTuple):
+    """A query timed on every run; %(quarter)s is the latest quarter and %(pwsid)s its busiest system"""
+    name: str
+    sql: str
+
+BENCHMARKS = [
+    Benchmark('unaddressed violations, latest quarter',
+              """SELECT COUNT(*) FROM violations_enforcement
+                 WHERE submission_year_quarter = %(quarter)s AND violation_status = 'Unaddressed'"""),
+    Benchmark('health-based violations by status, latest quarter',
+              """SELECT violation_status, COUNT(*) FROM violations_enforcement
+                 WHERE submission_year_quarter = %(quarter)s AND is_health_based_ind = 'Y' GROUP BY 1"""),
+    Benchmark('one system, latest quarter',
+              """SELECT * FROM violations_enforcement
+                 WHERE submission_year_quarter = %(quarter)s AND pwsid = %(pwsid)s"""),
+    Benchmark('violation_severity_facts, latest quarter',
+              "SELECT COUNT(*) FROM violation_severity_facts WHERE submission_year_quarter = %(quarter)s"),
+    Benchmark('map markers by severity, latest quarter',
+              """SELECT severity_level, COUNT(*) FROM violation_locations
+                 WHERE submission_year_quarter = %(quarter)s GROUP BY 1"""),
+    Benchmark('public_violation_explanations, one system',
+              "SELECT * FROM public_violation_explanations WHERE pwsid = %(pwsid)s"),
+    Benchmark('get_violations_with_explanations()',
+              "SELECT * FROM get_violations_with_explanations(%(pwsid)s)"),
+    Benchmark('current_violations_summary, one system',
+              "SELECT * FROM current_violations_summary WHERE pwsid = %(pwsid)s"),
+    Benchmark('system_health_dashboard, first page',
+              "SELECT * FROM system_health_dashboard LIMIT 50"),
+    Benchmark('violation_trends', "SELECT * FROM violation_trends"),
+    Benchmark('refresh_system_violation_summary()', "SELECT refresh_system_violation_summary()"),
+]
+
+RETIRE = "remove oldest quarter's violations (rolled back)"
+
+# Children before parents, as the foreign keys require
+VIOLATION_TABLES = ['violation_ai_explanations', 'violation_locations', 'violations_enforcement']
+
+class ViewBenchmark:
+    def __init__(self, conn, repeat: int = 5):
+        self.conn = conn
+        self.cursor = conn.cursor()
+        self.repeat = repeat
+
+    def scalar(self, sql, params=None):
+        self.cursor.execute(sql, params)
+        return self.cursor.fetchone()[0]
+
+    def describe_data(self) -> Dict:
+        self.cursor.execute("SELECT DISTINCT submission_year_quarter FROM public_water_systems ORDER BY 1")
+        quarters = [row[0] for row in self.cursor.fetchall()]
+        return {
+            'quarters': quarters,
+            'systems': self.scalar("SELECT COUNT(*) FROM public_water_systems"),
+            'violations': self.scalar("SELECT COUNT(*) FROM violations_enforcement"),
+            'violation_locations': self.scalar("SELECT COUNT(*) FROM violation_locations"),
+        }
+
+    def describe_schema(self) -> Dict:
+        return {
+            'partitioned': self.scalar("SELECT relkind = 'p' FROM pg_class WHERE oid = 'violations_enforcement'::regclass"),
+            'partitions': self.scalar("SELECT COUNT(*) FROM pg_inherits WHERE inhparent = 'violations_enforcement'::regclass"),
+        }
+
+    def time_query(self, sql, params) -> float:
+        """Best of `repeat` runs, fetching every row"""
+        best = None
+        for _ in range(self.repeat):
+            started = time.perf_counter()
+            self.cursor.execute(sql, params)
+            self.cursor.fetchall()
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        self.conn.commit()
+        return best
+
+    def shared_buffers(self, sql, params) -> Optional[int]:
+        """Pages the query touched (hit or read), which does not depend on what is cached"""
+        self.cursor.execute(f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {sql}", params)
+        plan = self.cursor.fetchone()[0][0]['Plan']
+        self.conn.rollback()
+        return plan.get('Shared Hit Blocks', 0) + plan.get('Shared Read Blocks', 0)
+
+    def time_retire(self, quarter: str) -> float:
+        """Time removing a quarter's violations, then roll the removal back"""
+        started = time.perf_counter()
+        try:
+            if self.scalar("SELECT to_regprocedure('drop_quarter_partitions(varchar, boolean)') IS NOT NULL"):
+                self.cursor.execute("SELECT * FROM drop_quarter_partitions(%s)", (quarter,))
+            else:
+                for table in VIOLATION_TABLES:
+                    self.cursor.execute(f"DELETE FROM {table} WHERE submission_year_quarter = %s", (quarter,))
+            return time.perf_counter() - started
+        finally:
+            self.conn.rollback()
+
+    def run(self, retire: bool = True, label: Optional[str] = None) -> Dict:
+        data = self.describe_data()
+        if not data['quarters']:
+            print("❌ No systems loaded; import a generated data set first")
+            sys.exit(1)
+        schema = self.describe_schema()
+        quarter = data['quarters'][-1]
+        pwsid = self.scalar("""
+            SELECT pwsid FROM violations_enforcement WHERE submission_year_quarter = %s
+            GROUP BY pwsid ORDER BY COUNT(*) DESC, pwsid LIMIT 1""", (quarter,))
+        self.conn.commit()
+        params = {'quarter': quarter, 'pwsid': pwsid}
+
+        layout = f"{schema['partitions']} partitions" if schema['partitioned'] else "unpartitioned"
+        print(f"📦 {len(data['quarters'])} quarters ({data['quarters'][0]} to {quarter}), {data['systems']:,} systems, "
+              f"{data['violations']:,} violations; violations_enforcement {layout}")
+        print(f"⏱️  Best of {self.repeat} runs for {quarter}, system {pwsid}:")
+
+        results = []
+        for benchmark in BENCHMARKS:
+            seconds = self.time_query(benchmark.sql, params)
+            buffers = self.shared_buffers(benchmark.sql, params)
+            results.append({'name': benchmark.name, 'ms': round(seconds * 1000, 2), 'buffers': buffers})
+            print(f"   • {benchmark.name.ljust(52)}{seconds * 1000:10.1f} ms {buffers:>10,} pages")
+
+        if retire:
+            seconds = self.time_retire(data['quarters'][0])
+            results.append({'name': RETIRE, 'ms': round(seconds * 1000, 2), 'buffers': None})
+            print(f"   • {RETIRE.ljust(52)}{seconds * 1000:10.1f} ms")
+
+        return {
+            'commit': git_commit(),
+            'label': label,
+            'started_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'data': data,
+            'schema': schema,
+            'quarter': quarter,
+            'pwsid': pwsid,
+            'results': results,
+        }
+
+def data_key(data: Dict) -> tuple:
+    return tuple(data['quarters']), data['systems'], data['violations']
+
+def print_comparison(record: Dict, previous: List[Dict]):
+    """Latency against the latest earlier run over the same data from another commit or schema"""
+    baseline = next((run for run in reversed(previous)
+                     if data_key(run['data']) == data_key(record['data'])
+                     and (run['commit'] != record['commit'] or run['schema'] != record['schema'])), None)
+    if not baseline:
+        return
+    layout = (f"{baseline['schema']['partitions']} partitions" if baseline['schema']['partitioned']
+              else "unpartitioned")
+    print(f"\n📋 Change from {(baseline['commit'] or 'unknown')[:12]} ({layout}, {baseline['started_at']})")
+    before = {result['name']: result for result in baseline['results']}
+    print("   " + "query".ljust(52) + "before ms".rjust(11) + "after ms".rjust(11) + "change".rjust(9))
+    for result in record['results']:
+        old = before.get(result['name'])
+        if not old:
+            continue
+        change = f"{result['ms'] / old['ms'] - 1:+.0%}" if old['ms'] else ""
+        print("   " + result['name'].ljust(52) + f"{old['ms']:11.1f}" + f"{result['ms']:11.1f}" + change.rjust(9))
+
+def main():
+    parser = argparse.ArgumentParser(description='Time the violation views and queries over the loaded quarters')
+    parser.add_argument('--repeat', type=int, default=5, help='Runs per query; the best one counts')
+    parser.add_argument('--skip-retire', action='store_true',
+                        help="Do not time removing the oldest quarter's violations")
+    parser.add_argument('--results', default='../bench/views.jsonl', help='JSON lines file the run is appended to')
+    parser.add_argument('--label', help='Note stored with the run, e.g. what changed')
+
+    args = parser.parse_args()
+
+    conn = connect()
+    try:
+        record = ViewBenchmark(conn, args.repeat).run(not args.skip_retire, args.label)
+    finally:
+        conn.close()
+
+    results_file = Path(args.results)
+    previous = load_results(results_file)
+    results_file.parent.mkdir(parents=True, exist_ok=True)
+    with open(results_file, 'a') as f:
+        f.write(json.dumps(record) + '\n')
+    print_comparison(record, previous)
+    print(f"\n💾 Appended to {results_file}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Data Health Check
+
+Calls data_health_check() once and prints what it found: the rows of every table
+and materialized view, the submission quarters each table holds, whether each
+quarter is synced to the map tables and geocoded, and rows whose foreign key
+parent is missing or removed. Counts are estimates from planner statistics and
+small samples unless --exact is given, so the check takes milliseconds on any
+size of database. Exits non-zero when anything needs attention.
+
+Usage:
+    python check_data_health.py [--exact] [--sample-rows 2000] [--sync-map] [--json]
+"""
+
+import sys
+import json
+import argparse
+from typing import Dict
+from psycopg2.extras import RealDictCursor
+from db import describe_settings, pooled
+
+def run_check(conn, exact: bool, sample_rows: int) -> Dict:
+    with conn.cursor() as cur:
+        cur.execute("SELECT data_health_check(%s, %s) AS report", (exact, sample_rows))
+        return cur.fetchone()['report']
+
+def sync_map(conn):
+    with conn.cursor() as cur:
+        cur.execute("SELECT * FROM sync_map_locations()")
+        for row in cur.fetchall():
+            print(f"   ✅ {row['quarter']}: {row['systems_changed']:,} water system locations, "
+                  f"{row['violations_changed']:,} violation locations")
+    conn.commit()
+
+def count(value, estimated: bool) -> str:
+    if value is None:
+        return '?'
+    return f"~{value:,}" if estimated else f"{value:,}"
+
+def print_report(report: Dict):
+    estimated = not report['exact']
+    mode = 'exact counts' if report['exact'] else 'estimated counts'
+    print(f"📋 Data health at {report['checked_at']} ({mode}, {report['duration_ms']:.1f} ms)")
+
+    print("\n📦 Tables:")
+    for table in report['tables']:
+        analyzed = '' if table['analyzed_at'] else '  (never analyzed)'
+        kind = '' if table['kind'] == 'table' else f" [{table['kind']}]"
+        print(f"   • {(table['table'] + kind).ljust(48)}{count(table['rows'], estimated):>14}{analyzed}")
+
+    print("\n📅 Quarters:")
+    for table, quarters in sorted(report['coverage'].items()):
+        listed = ', '.join(f"{quarter} {count(rows, estimated)}" for quarter, rows in quarters.items())
+        print(f"   • {table.ljust(28)}{listed or 'empty'}")
+
+    map_status = report['map']
+    print(f"\n🗺️  Map ({'ready' if map_status['ready'] else 'not ready'}):")
+    for quarter in map_status['quarters']:
+        synced = quarter['synced_at'] or 'never'
+        print(f"   • {quarter['quarter']}: {count(quarter['systems'], estimated)} systems, "
+              f"{count(quarter['locations'], estimated)} locations ({count(quarter['geocoded'], estimated)} geocoded), "
+              f"{count(quarter['markers'], estimated)} markers ({count(quarter['detached_markers'], estimated)} "
+              f"without a location); synced {synced}{' (stale)' if quarter['stale'] else ''}")
+        for problem in quarter['problems']:
+            print(f"      ⚠️  {problem}")
+    for view, populated in sorted(map_status['views'].items()):
+        print(f"   • {view}: {'populated' if populated else 'not populated'}")
+
+    print("\n🔗 Foreign keys:")
+    for orphan in report['orphans']:
+        approximate = orphan['estimated']
+        removed = orphan['removed_parent']
+        removed_text = f", {count(removed, approximate)} under a removed parent" if removed is not None else ''
+        sampled = f" (sampled {orphan['rows_checked']:,} rows)" if approximate else ''
+        icon = '❌' if orphan['missing_parent'] or removed else '✅'
+        print(f"   {icon} {orphan['table_name']} → {orphan['references_table']}: "
+              f"{count(orphan['missing_parent'], approximate)} missing parent{removed_text}{sampled}")
+
+    if report['problems']:
+        print(f"\n❌ {len(report['problems'])} problem(s):")
+        for problem in report['problems']:
+            print(f"   • {problem}")
+    else:
+        print("\n✅ No problems found")
+
+def main():
+    parser = argparse.ArgumentParser(description='Check table counts, quarter coverage, map readiness and orphaned rows')
+    parser.add_argument('--exact', action='store_true', help='Count every row instead of estimating (scans each table)')
+    parser.add_argument('--sample-rows', type=int, default=2000,
+                        help='Rows sampled per foreign key when estimating orphans')
+    parser.add_argument('--sync-map', action='store_true',
+                        help='Run sync_map_locations() when a quarter is not synced or stale, then check again')
+    parser.add_argument('--json', action='store_true', help='Print the report as JSON')
+
+    args = parser.parse_args()
+
+    with pooled(RealDictCursor) as conn:
+        report = run_check(conn, args.exact, args.sample_rows)
+        if args.sync_map and any(q['synced_at'] is None or q['stale'] for q in report['map']['quarters']):
+            if not args.json:
+                print(f"🔄 Syncing map locations on {describe_settings()}...")
+            sync_map(conn)
+            report = run_check(conn, args.exact, args.sample_rows)
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+    sys.exit(1 if report['problems'] else 0)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""
+Map Tile Load Test
+
+Requests every tile covering the geocoded water systems at several zoom levels, first
+with an empty tile cache and then again from the cache, from several connections at
+once, and reports latency and throughput per zoom. It also checks that the clusters
+of a zoom level add up to every mapped violation exactly once, and that changing a
+location drops its cached tiles. The cold pass clears map_tile_cache for the quarter
+and zoom levels tested; the tiles are rebuilt on the next request.
+
+Usage:
+    python check_map_tiles.py [--quarter 2025Q1] [--zooms 6 8 10 12] [--workers 4] [--max-tiles 256] [--format clusters|mvt]
+"""
+
+import sys
+import math
+import time
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Tuple
+from db import connect
+
+TILE_FUNCTIONS = {
+    'clusters': "SELECT get_map_tile_clusters(%s, %s, %s, %s)",
+    'mvt': "SELECT get_map_tile(%s, %s, %s, %s)",
+}
+
+def tile_of(lat: float, lng: float, z: int) -> Tuple[int, int]:
+    """Same grid as map_world_x() and map_world_y()"""
+    world_x = (lng + 180) / 360 * 2 ** z
+    world_y = (1 - math.log(math.tan(math.radians(lat)) + 1 / math.cos(math.radians(lat))) / math.pi) / 2 * 2 ** z
+    return math.floor(world_x), math.floor(world_y)
+
+def percentile(values: List[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+class MapTileLoadTest:
+    def __init__(self, conn, workers: int = 4, max_tiles: int = 256, tile_format: str = 'clusters'):
+        self.conn = conn
+        self.cursor = conn.cursor()
+        self.workers = workers
+        self.max_tiles = max_tiles
+        self.sql = TILE_FUNCTIONS[tile_format]
+        # Threads and their connections live for the whole run
+        self.pool = ThreadPoolExecutor(max_workers=workers)
+        self.local = threading.local()
+        self.connections = []
+        self.lock = threading.Lock()
+
+    def worker_cursor(self):
+        """One connection per worker thread, like separate app users"""
+        if not hasattr(self.local, 'cursor'):
+            conn = connect()
+            conn.autocommit = True
+            with self.lock:
+                self.connections.append(conn)
+            self.local.cursor = conn.cursor()
+        return self.local.cursor
+
+    def fetch_tile(self, quarter, z, x, y):
+        cursor = self.worker_cursor()
+        started = time.perf_counter()
+        cursor.execute(self.sql, (z, x, y, quarter))
+        tile = cursor.fetchone()[0]
+        return time.perf_counter() - started, tile
+
+    def tile_grid(self, z, bounds) -> Tuple[List[Tuple[int, int]], bool]:
+        """Tiles covering the bounds, evenly thinned to max_tiles; the flag tells whether all are kept"""
+        south, north, west, east = bounds
+        min_x, min_y = tile_of(north, west, z)
+        max_x, max_y = tile_of(south, east, z)
+        tiles = [(x, y) for x in range(min_x, max_x + 1) for y in range(min_y, max_y + 1)]
+        if len(tiles) <= self.max_tiles:
+            return tiles, True
+        step = len(tiles) / self.max_tiles
+        return [tiles[int(i * step)] for i in range(self.max_tiles)], False
+
+    def run_pass(self, quarter, z, tiles):
+        """Fetch every tile across the workers; returns (latencies, tiles by position, wall time)"""
+        started = time.perf_counter()
+        results = list(self.pool.map(lambda tile: self.fetch_tile(quarter, z, *tile), tiles))
+        wall = time.perf_counter() - started
+        return [latency for latency, _ in results], {tile: body for tile, (_, body) in zip(tiles, results)}, wall
+
+    def check_invalidation(self, quarter) -> bool:
+        """Touch a mapped location inside a rolled back transaction; its tiles at every zoom must leave the cache"""
+        self.cursor.execute("""
+            SELECT wsl.id FROM water_system_locations wsl
+            JOIN violation_locations vl ON vl.water_system_location_id = wsl.id
+            JOIN map_tile_cache c ON c.submission_year_quarter = wsl.submission_year_quarter AND c.z = 0
+            WHERE wsl.submission_year_quarter = %s AND wsl.latitude IS NOT NULL
+            LIMIT 1
+        """, (quarter,))
+        row = self.cursor.fetchone()
+        if not row:
+            return True
+        counts_sql = """
+            SELECT COUNT(*) FILTER (WHERE c.z = zoom.z
+                                      AND c.x = floor(map_world_x(wsl.longitude::float, zoom.z))
+                                      AND c.y = floor(map_world_y(wsl.latitude::float, zoom.z))),
+                   COUNT(*)
+            FROM water_system_locations wsl
+            CROSS JOIN generate_series(0, map_max_zoom()) AS zoom(z)
+            JOIN map_tile_cache c ON c.submission_year_quarter = wsl.submission_year_quarter AND c.z = zoom.z
+            WHERE wsl.id = %s
+        """
+        try:
+            self.cursor.execute(counts_sql, row)
+            own_before, total_before = self.cursor.fetchone()
+            self.cursor.execute("UPDATE water_system_locations SET latitude = latitude WHERE id = %s", row)
+            self.cursor.execute(counts_sql, row)
+            own_after, total_after = self.cursor.fetchone()
+        finally:
+            self.conn.rollback()
+
+        others_dropped = (total_before - own_before) - (total_after - own_after)
+        if own_after == 0 and others_dropped == 0:
+            print(f"   ✅ Changing a location dropped its {own_before} cached tiles and kept the other {total_after}")
+            return True
+        print(f"   ❌ Changing a location left {own_after} of its {own_before} tiles cached and dropped {others_dropped} others")
+        return False
+
+    def run(self, quarter, zooms) -> bool:
+        if not quarter:
+            self.cursor.execute("SELECT MAX(submission_year_quarter) FROM water_system_locations")
+            quarter = self.cursor.fetchone()[0]
+        self.cursor.execute("""
+            SELECT MIN(latitude)::float, MAX(latitude)::float, MIN(longitude)::float, MAX(longitude)::float
+            FROM water_system_locations
+            WHERE submission_year_quarter = %s AND latitude IS NOT NULL
+        """, (quarter,))
+        bounds = self.cursor.fetchone()
+        if bounds[0] is None:
+            print(f"❌ No geocoded locations in {quarter}; run sync_map_locations() and geocode_systems.py first")
+            return False
+        self.cursor.execute("""
+            SELECT COUNT(*) FROM violation_locations vl
+            JOIN water_system_locations wsl ON wsl.id = vl.water_system_location_id
+            WHERE wsl.submission_year_quarter = %s AND wsl.latitude IS NOT NULL
+        """, (quarter,))
+        mapped = self.cursor.fetchone()[0]
+        print(f"📦 {quarter}: {mapped:,} mapped violations in "
+              f"{bounds[0]:.2f}..{bounds[1]:.2f} N, {bounds[2]:.2f}..{bounds[3]:.2f} E")
+
+        self.cursor.execute("DELETE FROM map_tile_cache WHERE submission_year_quarter = %s AND z = ANY(%s)",
+                            (quarter, list(zooms)))
+        self.conn.commit()
+
+        failures = 0
+        rows: Dict[int, list] = {}
+        try:
+            for z in zooms:
+                tiles, complete = self.tile_grid(z, bounds)
+                cold, bodies, _ = self.run_pass(quarter, z, tiles)
+                warm, _, warm_wall = self.run_pass(quarter, z, tiles)
+                rows[z] = [len(tiles), percentile(cold, 0.5), percentile(cold, 0.95), max(cold),
+                           percentile(warm, 0.5), percentile(warm, 0.95), len(tiles) / warm_wall]
+
+                if complete and self.sql == TILE_FUNCTIONS['clusters']:
+                    total = sum(cluster['violation_count'] for body in bodies.values() for cluster in body)
+                    if total == mapped:
+                        print(f"   ✅ Zoom {z}: clusters of {len(tiles)} tiles hold every mapped violation once")
+                    else:
+                        print(f"   ❌ Zoom {z}: clusters hold {total:,} violations, expected {mapped:,}")
+                        failures += 1
+            # Zoom 0 holds every location, so there is a cached tile to drop
+            self.run_pass(quarter, 0, [(0, 0)])
+            if not self.check_invalidation(quarter):
+                failures += 1
+        finally:
+            self.pool.shutdown()
+            for conn in self.connections:
+                conn.close()
+
+        print(f"\n⏱️  {self.workers} workers (ms):")
+        print("   " + "zoom".ljust(6) + "tiles".rjust(7) + "cold p50".rjust(10) + "cold p95".rjust(10)
+              + "cold max".rjust(10) + "warm p50".rjust(10) + "warm p95".rjust(10) + "warm tiles/s".rjust(14))
+        for z, (count, *latencies, rate) in rows.items():
+            print("   " + str(z).ljust(6) + f"{count:7d}" + "".join(f"{seconds * 1000:10.1f}" for seconds in latencies)
+                  + f"{rate:14.0f}")
+
+        if failures:
+            print(f"\n❌ {failures} check(s) failed")
+        else:
+            print("\n✅ Tiles are complete, cached and invalidated")
+        return not failures
+
+def main():
+    parser = argparse.ArgumentParser(description='Load test the map tile RPCs over a grid of tiles')
+    parser.add_argument('--quarter', help='Quarter to request (default: the latest)')
+    parser.add_argument('--zooms', type=int, nargs='+', default=[6, 8, 10, 12], help='Zoom levels to request')
+    parser.add_argument('--workers', type=int, default=4, help='Concurrent connections')
+    parser.add_argument('--max-tiles', type=int, default=256,
+                        help='Tiles per zoom; larger grids are thinned evenly and skip the count check')
+    parser.add_argument('--format', choices=sorted(TILE_FUNCTIONS), default='clusters',
+                        help='clusters (JSON rows) or mvt (vector tiles, needs PostGIS 3)')
+
+    args = parser.parse_args()
+
+    conn = connect()
+    try:
+        ok = MapTileLoadTest(conn, args.workers, args.max_tiles, args.format).run(args.quarter, args.zooms)
+    finally:
+        conn.close()
+    sys.exit(0 if ok else 1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+"""
+Reporting View Invariants and Benchmark
+
+Checks that the dashboard views and RPCs return each system and violation exactly
+once, then times them as the data grows. Growth is simulated by copying every loaded
+quarter into synthetic quarters (2025Q1 -> 2125Q1, 2225Q1, ...) inside a transaction
+that is rolled back, so a join that ignores the quarter shows up as superlinear time
+and as a broken count. Each copy is a newer quarter of the same systems, so the
+system lists, which show each system's latest quarter, must keep one row per system.
+Run it against a local database only: the copies hold locks on the tables until the
+run finishes.
+
+Usage:
+    python check_reporting_views.py [--import] [--data-dir ../data] [--scales 1 2 4] [--repeat 3] [--tolerance 1.5]
+"""
+
+import sys
+import argparse
+import time
+from typing import List, NamedTuple
+from db import connect
+from import_data import WaterDataImporter
+
+class Invariant(NamedTuple):
+    """Two scalar queries that must return the same number"""
+    name: str
+    actual: str
+    expected: str
+
+class Benchmark(NamedTuple):
+    """A query timed at every scale"""
+    name: str
+    sql: str
+
+# Each system's newest quarter, the one the system lists show
+LATEST_SYSTEMS = """(SELECT DISTINCT ON (pwsid) * FROM public_water_systems
+                     ORDER BY pwsid, submission_year_quarter DESC)"""
+
+ACTIVE_SYSTEMS = f"SELECT COUNT(*) FROM {LATEST_SYSTEMS} p WHERE pws_activity_code = 'A'"
+
+INVARIANTS = [
+    Invariant('system_primary_area has one row per system',
+              "SELECT COUNT(*) FROM system_primary_area",
+              "SELECT COUNT(*) FROM public_water_systems"),
+    Invariant('system_health_dashboard has one row per active system',
+              "SELECT COUNT(*) FROM system_health_dashboard",
+              ACTIVE_SYSTEMS),
+    Invariant('system_health_dashboard lists each system once across quarters',
+              "SELECT COUNT(DISTINCT pwsid) FROM system_health_dashboard",
+              "SELECT COUNT(*) FROM system_health_dashboard"),
+    Invariant('system_health_dashboard counts each critical violation of the latest quarter once',
+              "SELECT COALESCE(SUM(critical_violations), 0) FROM system_health_dashboard",
+              f"""SELECT COUNT(*) FROM violations_enforcement v
+                  JOIN {LATEST_SYSTEMS} p ON p.submission_year_quarter = v.submission_year_quarter AND p.pwsid = v.pwsid
+                  WHERE p.pws_activity_code = 'A' AND v.is_health_based_ind = 'Y' AND v.violation_status = 'Unaddressed'"""),
+    Invariant('current_violations_summary has one row per system',
+              "SELECT COUNT(*) FROM current_violations_summary",
+              "SELECT COUNT(DISTINCT pwsid) FROM public_water_systems"),
+    Invariant('current_violations_summary counts each violation of the latest quarter once',
+              "SELECT COALESCE(SUM(total_violations), 0) FROM current_violations_summary",
+              f"""SELECT COUNT(*) FROM violations_enforcement v
+                  JOIN {LATEST_SYSTEMS} p ON p.submission_year_quarter = v.submission_year_quarter AND p.pwsid = v.pwsid"""),
+    Invariant('county_summary counts each system once per county',
+              "SELECT COALESCE(SUM(total_systems), 0) FROM county_summary",
+              f"""SELECT COUNT(*) FROM (
+                      SELECT DISTINCT g.county_served, g.state_served, g.pwsid
+                      FROM geographic_areas g
+                      JOIN {LATEST_SYSTEMS} p ON p.submission_year_quarter = g.submission_year_quarter AND p.pwsid = g.pwsid
+                      WHERE g.area_type_code = 'CN') c"""),
+    Invariant('public_violation_explanations has one row per violation',
+              "SELECT COUNT(*) FROM public_violation_explanations",
+              "SELECT COUNT(*) FROM violations_enforcement"),
+    Invariant('health_violation_explanations has one row per health-based violation',
+              "SELECT COUNT(*) FROM health_violation_explanations",
+              "SELECT COUNT(*) FROM violations_enforcement WHERE is_health_based_ind = 'Y'"),
+    Invariant('public_violation_explanations shows each current explanation once',
+              "SELECT COUNT(explanation_text) FROM public_violation_explanations",
+              """SELECT COUNT(*) FROM violation_ai_explanations ai
+                 JOIN violations_enforcement v ON v.submission_year_quarter = ai.submission_year_quarter
+                     AND v.pwsid = ai.pwsid AND v.violation_id = ai.violation_id
+                 WHERE ai.is_current"""),
+    Invariant('violations_map_data has one row per mapped violation',
+              "SELECT COUNT(*) FROM violations_map_data",
+              """SELECT COUNT(*) FROM violation_locations vl
+                 JOIN water_system_locations wsl ON vl.water_system_location_id = wsl.id
+                 JOIN public_water_systems p ON p.submission_year_quarter = vl.submission_year_quarter AND p.pwsid = vl.pwsid
+                 WHERE COALESCE(vl.latitude, wsl.latitude) IS NOT NULL
+                   AND COALESCE(vl.longitude, wsl.longitude) IS NOT NULL
+                   AND p.pws_activity_code = 'A'"""),
+    Invariant('get_systems_sorted_after lists every active system',
+              "SELECT COUNT(DISTINCT pwsid) FROM get_systems_sorted_after(NULL, NULL, 2147483647)",
+              ACTIVE_SYSTEMS),
+    Invariant('get_systems_sorted_after lists each system once across quarters',
+              "SELECT COUNT(*) FROM get_systems_sorted_after(NULL, NULL, 2147483647)",
+              ACTIVE_SYSTEMS),
+    Invariant('get_systems_sorted lists each system once across quarters',
+              "SELECT COUNT(*) FROM get_systems_sorted(0, 2147483647)",
+              ACTIVE_SYSTEMS),
+    Invariant('violation_severity_scores scores each violation once',
+              "SELECT COUNT(*) FROM violation_severity_scores()",
+              "SELECT COUNT(*) FROM violations_enforcement"),
+]
+
+BENCHMARKS = [
+    Benchmark('system_health_dashboard', "SELECT * FROM system_health_dashboard"),
+    Benchmark('current_violations_summary', "SELECT * FROM current_violations_summary"),
+    Benchmark('county_summary', "SELECT * FROM county_summary"),
+    Benchmark('public_violation_explanations', "SELECT * FROM public_violation_explanations"),
+    Benchmark('violations_map_data', "SELECT * FROM violations_map_data"),
+    Benchmark('get_systems_sorted (page 50)', "SELECT * FROM get_systems_sorted(1000, 20)"),
+    Benchmark('get_systems_sorted_after (first page)', "SELECT * FROM get_systems_sorted_after(NULL, NULL, 20)"),
+    Benchmark('violation_severity_scores', "SELECT * FROM violation_severity_scores()"),
+    Benchmark('refresh_system_violation_summary', "SELECT refresh_system_violation_summary()"),
+]
+
+# Tables copied into each synthetic quarter, parents first
+SCALED_TABLES = ['public_water_systems', 'geographic_areas', 'violations_enforcement', 'violation_ai_explanations']
+
+# Timings below this are mostly fixed overhead and are not held to the linear bound
+MIN_BASELINE_SECONDS = 0.002
+
+class ReportingViewChecker:
+    def __init__(self, conn, repeat: int = 3, tolerance: float = 1.5):
+        self.conn = conn
+        self.cursor = conn.cursor()
+        self.repeat = repeat
+        self.tolerance = tolerance
+        self.base_quarters: List[str] = []
+
+    def scalar(self, sql):
+        self.cursor.execute(sql)
+        return self.cursor.fetchone()[0]
+
+    def check_invariants(self, scale):
+        """Print each invariant; returns the number that failed"""
+        failures = 0
+        for invariant in INVARIANTS:
+            actual, expected = self.scalar(invariant.actual), self.scalar(invariant.expected)
+            if actual == expected:
+                print(f"   ✅ {invariant.name} ({actual})")
+            else:
+                print(f"   ❌ {invariant.name}: got {actual}, expected {expected}")
+                failures += 1
+        return failures
+
+    def time_query(self, sql):
+        """Best of `repeat` runs, fetching every row"""
+        best = None
+        for _ in range(self.repeat):
+            started = time.perf_counter()
+            self.cursor.execute(sql)
+            self.cursor.fetchall()
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        return best
+
+    def table_columns(self, table):
+        self.cursor.execute("""
+            SELECT column_name FROM information_schema.columns
+            WHERE table_schema = 'public' AND table_name = %s AND column_name <> 'id' AND is_generated = 'NEVER'
+            ORDER BY ordinal_position
+        """, (table,))
+        return [row[0] for row in self.cursor.fetchall()]
+
+    def add_copy(self, copy_number):
+        """Copy the base quarters of every scaled table into synthetic quarters copy_number centuries later"""
+        self.cursor.execute(
+            "SELECT create_quarter_partitions((substr(quarter, 1, 4)::int + %(years)s)::text || substr(quarter, 5)) "
+            "FROM unnest(%(quarters)s::text[]) quarter",
+            {'years': 100 * copy_number, 'quarters': self.base_quarters})
+        for table in SCALED_TABLES:
+            columns = self.table_columns(table)
+            select = [
+                "((substr(submission_year_quarter, 1, 4)::int + %(years)s)::text || substr(submission_year_quarter, 5))"
+                if column == 'submission_year_quarter' else column
+                for column in columns
+            ]
+            self.cursor.execute(
+                f"INSERT INTO {table} ({', '.join(columns)}) SELECT {', '.join(select)} FROM {table} "
+                f"WHERE submission_year_quarter = ANY(%(quarters)s)",
+                {'years': 100 * copy_number, 'quarters': self.base_quarters})
+        self.cursor.execute("REFRESH MATERIALIZED VIEW system_violation_summary")
+        for table in SCALED_TABLES:
+            self.cursor.execute(f"ANALYZE {table}")
+
+    def run(self, scales):
+        self.cursor.execute("SELECT DISTINCT submission_year_quarter FROM public_water_systems ORDER BY 1")
+        self.base_quarters = [row[0] for row in self.cursor.fetchall()]
+        if not self.base_quarters:
+            print("❌ No systems loaded; run with --import or import_data.py first")
+            return False
+        print(f"📦 Base data: quarters {', '.join(self.base_quarters)}, "
+              f"{self.scalar('SELECT COUNT(*) FROM violations_enforcement'):,} violations")
+
+        failures = 0
+        timings = {}
+        copies = 1
+        try:
+            for scale in sorted(scales):
+                while copies < scale:
+                    self.add_copy(copies)
+                    copies += 1
+                print(f"\n🔍 Scale {scale}x")
+                failures += self.check_invariants(scale)
+                timings[scale] = {benchmark.name: self.time_query(benchmark.sql) for benchmark in BENCHMARKS}
+        finally:
+            # The copies only ever existed inside this transaction
+            self.conn.rollback()
+
+        scales = sorted(timings)
+        print("\n⏱️  Best of {} runs (ms):".format(self.repeat))
+        print("   " + "query".ljust(40) + "".join(f"{scale}x".rjust(10) for scale in scales))
+        base = scales[0]
+        for benchmark in BENCHMARKS:
+            row = [timings[scale][benchmark.name] for scale in scales]
+            line = "   " + benchmark.name.ljust(40) + "".join(f"{seconds * 1000:10.1f}" for seconds in row)
+            baseline = max(timings[base][benchmark.name], MIN_BASELINE_SECONDS)
+            superlinear = [scale for scale in scales[1:]
+                           if timings[scale][benchmark.name] > self.tolerance * (scale / base) * baseline]
+            if superlinear:
+                failures += 1
+                line += f"   ❌ grows faster than the data at {', '.join(f'{scale}x' for scale in superlinear)}"
+            print(line)
+
+        if failures:
+            print(f"\n❌ {failures} check(s) failed")
+        else:
+            print("\n✅ Counts are exact and query time grows at most linearly")
+        return not failures
+
+def main():
+    parser = argparse.ArgumentParser(description='Check reporting view row counts and how their cost scales')
+    parser.add_argument('--import', dest='run_import', action='store_true',
+                        help='Load the CSV files with import_data.py --bulk before checking')
+    parser.add_argument('--data-dir', default='../data', help='Directory containing CSV files (with --import)')
+    parser.add_argument('--scales', type=int, nargs='+', default=[1, 2, 4],
+                        help='Data sizes to check, as multiples of the loaded quarters')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per query; the fastest is kept')
+    parser.add_argument('--tolerance', type=float, default=1.5,
+                        help='Allowed slowdown beyond linear before a query fails')
+
+    args = parser.parse_args()
+    if min(args.scales) < 1:
+        parser.error('--scales must be 1 or more')
+
+    if args.run_import:
+        importer = WaterDataImporter(args.data_dir, bulk=True)
+        importer.connect()
+        try:
+            importer.import_all_data()
+        finally:
+            importer.disconnect()
+
+    conn = connect()
+    try:
+        ok = ReportingViewChecker(conn, args.repeat, args.tolerance).run(args.scales)
+    finally:
+        conn.close()
+    sys.exit(0 if ok else 1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+System Search Keystroke Benchmark
+
+Types the names of randomly chosen systems into search_systems() one keystroke at a
+time, the way a type-ahead box calls it, and reports the latency of every call. Then
+looks each system up by its full name, by its name with a typo, and by its PWSID,
+and reports how often it is among the results. Fails if the 99th percentile
+keystroke latency is above the target.
+
+Usage:
+    python check_system_search.py [--systems 200] [--limit 10] [--max-p99-ms 30] [--seed 1]
+"""
+
+import sys
+import time
+import random
+import argparse
+from typing import Dict, List
+from db import connect
+
+# Type-ahead stops helping after this many characters
+MAX_TYPED = 20
+
+def percentile(values: List[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+def with_typo(text: str, rng: random.Random) -> str:
+    """Drop, double or swap one letter of the longest word"""
+    words = text.split()
+    index = max(range(len(words)), key=lambda i: len(words[i]))
+    word = words[index]
+    if len(word) < 5:
+        return text
+    at = rng.randrange(1, len(word) - 1)
+    kind = rng.randrange(3)
+    if kind == 0:
+        word = word[:at] + word[at + 1:]
+    elif kind == 1:
+        word = word[:at] + word[at] + word[at:]
+    else:
+        word = word[:at] + word[at + 1] + word[at] + word[at + 2:]
+    words[index] = word
+    return ' '.join(words)
+
+class SystemSearchBenchmark:
+    def __init__(self, conn, limit: int = 10, seed: int = 1):
+        self.conn = conn
+        self.cursor = conn.cursor()
+        self.limit = limit
+        self.random = random.Random(seed)
+
+    def search(self, query):
+        started = time.perf_counter()
+        self.cursor.execute("SELECT pwsid FROM search_systems(%s, %s)", (query, self.limit))
+        pwsids = [row[0] for row in self.cursor.fetchall()]
+        return time.perf_counter() - started, pwsids
+
+    def run(self, count, max_p99_ms) -> bool:
+        self.cursor.execute("SELECT COUNT(*) FROM system_search")
+        total = self.cursor.fetchone()[0]
+        self.cursor.execute("""
+            SELECT pwsid, name_key FROM system_search
+            WHERE pws_activity_code = 'A' AND name_key <> ''
+            ORDER BY pwsid
+        """)
+        systems = self.cursor.fetchall()
+        if not systems:
+            print("❌ system_search is empty; import data or run SELECT refresh_system_search()")
+            return False
+        sample = self.random.sample(systems, min(count, len(systems)))
+        print(f"🔎 Typing the names of {len(sample)} of {total:,} systems")
+
+        keystrokes = []
+        found: Dict[str, List[bool]] = {'full name': [], 'name with a typo': [], 'pwsid': []}
+        for pwsid, name in sample:
+            for length in range(1, min(len(name), MAX_TYPED) + 1):
+                latency, _ = self.search(name[:length])
+                keystrokes.append(latency)
+            for kind, query in (('full name', name), ('name with a typo', with_typo(name, self.random)),
+                                ('pwsid', pwsid)):
+                _, pwsids = self.search(query)
+                found[kind].append(pwsid in pwsids)
+        self.conn.rollback()
+
+        p99 = percentile(keystrokes, 0.99) * 1000
+        print(f"⏱️  {len(keystrokes):,} keystrokes: p50 {percentile(keystrokes, 0.5) * 1000:.1f} ms, "
+              f"p95 {percentile(keystrokes, 0.95) * 1000:.1f} ms, p99 {p99:.1f} ms, max {max(keystrokes) * 1000:.1f} ms")
+        for kind, hits in found.items():
+            print(f"   • {kind}: in the top {self.limit} for {sum(hits) / len(hits):.0%} of systems")
+
+        if p99 > max_p99_ms:
+            print(f"❌ p99 keystroke latency is above {max_p99_ms:g} ms")
+            return False
+        print("✅ Keystroke latency is within the target")
+        return True
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark search_systems() as a type-ahead box uses it')
+    parser.add_argument('--systems', type=int, default=200, help='Number of system names to type')
+    parser.add_argument('--limit', type=int, default=10, help='Results per search')
+    parser.add_argument('--max-p99-ms', type=float, default=30, help='Fail above this 99th percentile keystroke latency')
+    parser.add_argument('--seed', type=int, default=1, help='Random seed for the systems and typos')
+
+    args = parser.parse_args()
+
+    conn = connect()
+    try:
+        ok = SystemSearchBenchmark(conn, args.limit, args.seed).run(args.systems, args.max_p99_ms)
+    finally:
+        conn.close()
+    sys.exit(0 if ok else 1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+"Systems Near Me" Latency Check
+
+Calls get_systems_near() for random points around the geocoded water systems, some
+with the ZIP code and county of a real system and some with only those, the way the
+app does. Checks that every answer lists each system once, nearest first within
+each kind of match, and fails if the 99th percentile latency is above the target.
+
+Usage:
+    python check_systems_near.py [--requests 2000] [--limit 10] [--max-p99-ms 20] [--seed 1]
+"""
+
+import sys
+import time
+import random
+import argparse
+from typing import List
+from db import connect
+
+MATCH_RANKS = {'distance': 1, 'zip': 2, 'county': 3}
+
+# About 5 km of jitter around a system, where a user looking it up would be
+JITTER_DEGREES = 0.05
+
+def percentile(values: List[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+class SystemsNearCheck:
+    def __init__(self, conn, limit: int = 10, seed: int = 1):
+        self.conn = conn
+        self.cursor = conn.cursor()
+        self.limit = limit
+        self.random = random.Random(seed)
+
+    def sample_requests(self, count):
+        """(lat, lng, zip_code, county) tuples: 70% location only, 20% location with ZIP and county, 10% without location"""
+        self.cursor.execute("""
+            SELECT wsl.latitude::float, wsl.longitude::float, left(wsl.zip_code, 5), a.county_served
+            FROM water_system_locations wsl
+            JOIN system_primary_area a ON a.submission_year_quarter = wsl.submission_year_quarter AND a.pwsid = wsl.pwsid
+            WHERE wsl.submission_year_quarter = (SELECT MAX(submission_year_quarter) FROM water_system_locations)
+              AND wsl.latitude IS NOT NULL
+        """)
+        systems = self.cursor.fetchall()
+        if not systems:
+            return []
+        requests = []
+        for _ in range(count):
+            lat, lng, zip_code, county = self.random.choice(systems)
+            lat += self.random.uniform(-JITTER_DEGREES, JITTER_DEGREES)
+            lng += self.random.uniform(-JITTER_DEGREES, JITTER_DEGREES)
+            kind = self.random.random()
+            if kind < 0.7:
+                requests.append((lat, lng, None, None))
+            elif kind < 0.9:
+                requests.append((lat, lng, zip_code, county))
+            else:
+                requests.append((None, None, zip_code, county))
+        return requests
+
+    def check_answer(self, rows) -> str:
+        """An empty string if the rows are a well-formed answer, else what is wrong"""
+        pwsids = [row[0] for row in rows]
+        if len(rows) > self.limit:
+            return f"{len(rows)} rows for a limit of {self.limit}"
+        if len(set(pwsids)) != len(pwsids):
+            return "a system is listed twice"
+        ranks = [MATCH_RANKS[row[-1]] for row in rows]
+        if ranks != sorted(ranks):
+            return "nearby systems are not listed before ZIP and county matches"
+        distances = [row[-2] for row in rows if row[-1] == 'distance']
+        if distances != sorted(distances):
+            return "nearby systems are not nearest first"
+        return ""
+
+    def run(self, count, max_p99_ms) -> bool:
+        requests = self.sample_requests(count)
+        if not requests:
+            print("❌ No geocoded locations; run sync_map_locations() and geocode_systems.py first")
+            return False
+
+        latencies = []
+        problems = 0
+        fallbacks = 0
+        for lat, lng, zip_code, county in requests:
+            started = time.perf_counter()
+            self.cursor.execute("SELECT * FROM get_systems_near(%s, %s, %s, %s, %s)",
+                                (lat, lng, self.limit, zip_code, county))
+            rows = self.cursor.fetchall()
+            latencies.append(time.perf_counter() - started)
+            problem = self.check_answer(rows)
+            if problem:
+                problems += 1
+                if problems <= 5:
+                    print(f"   ❌ ({lat}, {lng}, {zip_code}, {county}): {problem}")
+            fallbacks += any(row[-1] != 'distance' for row in rows)
+        self.conn.rollback()
+
+        print(f"📍 {len(requests):,} requests, {fallbacks:,} answered partly from ZIP or county")
+        print(f"⏱️  p50 {percentile(latencies, 0.5) * 1000:.1f} ms, p95 {percentile(latencies, 0.95) * 1000:.1f} ms, "
+              f"p99 {percentile(latencies, 0.99) * 1000:.1f} ms, max {max(latencies) * 1000:.1f} ms")
+        p99 = percentile(latencies, 0.99) * 1000
+        if problems:
+            print(f"❌ {problems} answer(s) were malformed")
+        if p99 > max_p99_ms:
+            print(f"❌ p99 latency is above {max_p99_ms:g} ms")
+        if problems or p99 > max_p99_ms:
+            return False
+        print("✅ Answers are well formed and within the latency target")
+        return True
+
+def main():
+    parser = argparse.ArgumentParser(description='Check get_systems_near() answers and latency')
+    parser.add_argument('--requests', type=int, default=2000, help='Number of lookups')
+    parser.add_argument('--limit', type=int, default=10, help='Systems per lookup')
+    parser.add_argument('--max-p99-ms', type=float, default=20, help='Fail above this 99th percentile latency')
+    parser.add_argument('--seed', type=int, default=1, help='Random seed for the lookup points')
+
+    args = parser.parse_args()
+
+    conn = connect()
+    try:
+        ok = SystemsNearCheck(conn, args.limit, args.seed).run(args.requests, args.max_p99_ms)
+    finally:
+        conn.close()
+    sys.exit(0 if ok else 1)
+
+if __name__ == '__main__':
+    main()
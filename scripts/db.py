@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+"""
+Shared Database Access
+
+How every script reaches Postgres: directly with psycopg2, never through
+PostgREST. Settings come from the environment or .env: DATABASE_URL when it is
+set, otherwise DB_HOST, DB_PORT, DB_NAME, DB_USER and DB_PASSWORD, which default
+to the local Supabase database.
+
+connect() opens a connection of its own. pooled() borrows one from a pool shared
+by the threads of a process (at most DB_POOL_SIZE connections), so hot loops pay
+for a connection once per run rather than once per call. A thread waits up to
+DB_POOL_TIMEOUT seconds for a free one. Connection.prepare()
+PREPAREs a statement once per session, and stream() reads a large result through
+a server-side cursor a batch at a time.
+
+Usage:
+    python db.py    # show the settings in use and check the connection
+"""
+
+import os
+import re
+import sys
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional
+import psycopg2
+import psycopg2.extensions
+import psycopg2.pool
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Connection settings when DATABASE_URL is not set
+DB_CONFIG = {
+    'host': os.getenv('DB_HOST', '127.0.0.1'),
+    'port': int(os.getenv('DB_PORT', 54322)),
+    'database': os.getenv('DB_NAME', 'postgres'),
+    'user': os.getenv('DB_USER', 'postgres'),
+    'password': os.getenv('DB_PASSWORD', 'postgres')
+}
+
+DATABASE_URL = os.getenv('DATABASE_URL')
+
+# Connections a process keeps open; more threads than this wait for a free one
+POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 8))
+
+# Seconds a thread waits for a free pooled connection before giving up
+POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', 60))
+
+# %s parameters become $1, $2, ...; %% is a literal percent sign
+PLACEHOLDER = re.compile(r'%([s%])')
+
+def connection_settings() -> Dict:
+    """Keyword arguments for psycopg2.connect()"""
+    return {'dsn': DATABASE_URL} if DATABASE_URL else dict(DB_CONFIG)
+
+def describe_settings() -> str:
+    """Where connections go, without the password"""
+    if DATABASE_URL:
+        return re.sub(r'://([^:/@]+):[^@]*@', r'://\1:***@', DATABASE_URL)
+    return f"{DB_CONFIG['user']}@{DB_CONFIG['host']}:{DB_CONFIG['port']}/{DB_CONFIG['database']}"
+
+class Connection(psycopg2.extensions.connection):
+    """psycopg2 connection that remembers the statements prepared in its session"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.prepared: Dict[str, str] = {}
+
+    def prepare(self, name: str, query: str) -> str:
+        """PREPARE query as name on first use in this session; returns the EXECUTE statement to run.
+
+        query uses %s parameters like any psycopg2 query, and so does the returned
+        EXECUTE name (%s, ...), so it can be passed to cursor.execute() or
+        execute_batch() in place of query. Postgres then parses and plans it once
+        per session instead of once per call. Prepared statements outlive
+        rollbacks, so this is safe to call inside a transaction that may fail.
+        """
+        execute = self.prepared.get(name)
+        if execute is None:
+            count = 0
+
+            def number(match):
+                nonlocal count
+                if match.group(1) == '%':
+                    return '%'
+                count += 1
+                return f'${count}'
+
+            statement = PLACEHOLDER.sub(number, query)
+            with self.cursor() as cur:
+                cur.execute(f"PREPARE {name} AS {statement}")
+            execute = f"EXECUTE {name} ({', '.join(['%s'] * count)})" if count else f"EXECUTE {name}"
+            self.prepared[name] = execute
+        return execute
+
+    def reset(self):
+        super().reset()
+        # reset() runs DISCARD ALL, which deallocates prepared statements
+        self.prepared.clear()
+
+def connect(**kwargs) -> Connection:
+    """A new connection of its own, e.g. for a long import or a separate worker"""
+    return psycopg2.connect(connection_factory=Connection, **connection_settings(), **kwargs)
+
+class ConnectionPool:
+    """Connections opened on demand, up to max_size, and kept open for reuse; thread-safe.
+
+    Unlike psycopg2.pool, connections beyond the first are kept too, and a
+    thread asking for one when all are in use waits for up to timeout seconds
+    instead of failing at once.
+    """
+
+    def __init__(self, max_size: int = POOL_SIZE, timeout: float = POOL_TIMEOUT):
+        self.max_size = max_size
+        self.timeout = timeout
+        self.idle: List[Connection] = []
+        self.slots = threading.BoundedSemaphore(max_size)
+        self.lock = threading.Lock()
+        self.pid = os.getpid()
+
+    def getconn(self) -> Connection:
+        if not self.slots.acquire(timeout=self.timeout):
+            # Rather than hang, e.g. when every thread holds a connection and asks for another
+            raise psycopg2.pool.PoolError(
+                f"No pooled connection free after {self.timeout:g}s: all {self.max_size} are in use. "
+                f"Raise DB_POOL_SIZE to at least the connections held at once "
+                f"(two per thread that borrows one while holding another)")
+        try:
+            with self.lock:
+                while self.idle:
+                    conn = self.idle.pop()
+                    if not conn.closed:
+                        return conn
+            return connect()
+        except BaseException:
+            self.slots.release()
+            raise
+
+    def putconn(self, conn: Connection):
+        """Return a connection, rolled back to a clean state, or drop it if it is broken"""
+        try:
+            if conn.closed:
+                return
+            status = conn.info.transaction_status
+            if status == psycopg2.extensions.TRANSACTION_STATUS_UNKNOWN:
+                conn.close()
+                return
+            if status != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                conn.rollback()
+            conn.autocommit = False
+            conn.cursor_factory = None
+            with self.lock:
+                self.idle.append(conn)
+        finally:
+            self.slots.release()
+
+    def closeall(self):
+        with self.lock:
+            idle, self.idle = self.idle, []
+        for conn in idle:
+            conn.close()
+
+_pool: Optional[ConnectionPool] = None
+_pool_lock = threading.Lock()
+# Pools of a parent process: a forked child must neither use nor close their connections
+_inherited: List[ConnectionPool] = []
+
+def pool() -> ConnectionPool:
+    """The pool of this process, created on first use"""
+    global _pool
+    with _pool_lock:
+        if _pool is not None and _pool.pid != os.getpid():
+            _inherited.append(_pool)
+            _pool = None
+        if _pool is None:
+            _pool = ConnectionPool()
+        return _pool
+
+@contextmanager
+def pooled(cursor_factory=None) -> Iterator[Connection]:
+    """Borrow a connection from the pool; an open transaction is rolled back when it is returned"""
+    connections = pool()
+    conn = connections.getconn()
+    conn.cursor_factory = cursor_factory
+    try:
+        yield conn
+    finally:
+        connections.putconn(conn)
+
+def stream(conn, query: str, params=None, batch_size: int = 2000, name: str = 'stream',
+           cursor_factory=None) -> Iterator[list]:
+    """Yield the rows of query a batch at a time through a server-side cursor.
+
+    Only one batch is held in memory however large the result is. The cursor
+    lives in the current transaction, so do not commit conn until it is exhausted.
+    """
+    with conn.cursor(name=name, cursor_factory=cursor_factory) as cur:
+        cur.itersize = batch_size
+        cur.execute(query, params)
+        while True:
+            rows = cur.fetchmany(batch_size)
+            if not rows:
+                return
+            yield rows
+
+def main():
+    print(f"🔌 {describe_settings()} (pool of up to {POOL_SIZE} connections per process, {POOL_TIMEOUT:g}s wait)")
+    try:
+        with pooled() as conn, conn.cursor() as cur:
+            cur.execute("SELECT current_database(), current_user, split_part(version(), ' ', 2)")
+            database, user, version = cur.fetchone()
+    except psycopg2.Error as e:
+        print(f"❌ Could not connect: {str(e).strip()}")
+        sys.exit(1)
+    print(f"✅ Connected to {database} as {user} (PostgreSQL {version})")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,487 @@
+#!/usr/bin/env python3
+"""
+Synthetic SDWIS Data Generator
+
+Writes a deterministic set of SDWA export files, laid out as import_data.py reads
+them, at a multiple of the Georgia export in data/. Every copy of Georgia holds each
+Georgia system once, in random order and under a new PWSID in another state, with
+all of its rows from the other files (areas, facilities, samples, visits, events and
+public notices), so key cardinalities, null rates, dates and the links between files
+are those of the real export. The violations export is not checked in; violations
+and their enforcement actions are drawn from a model of the codes in
+SDWA_REF_CODE_VALUES.csv, with dates, statuses and notice tiers that follow the
+violation's age and category. manifest.json records the settings and the rows and
+distinct keys of every file, which benchmark_import.py checks loads against.
+
+The same settings always write the same files.
+
+Usage:
+    python generate_sdwis_data.py --output-dir ../bench/ga-1x
+    python generate_sdwis_data.py --output-dir ../bench/ga-10x --scale 10
+    python generate_sdwis_data.py --output-dir ../bench/ga-100x --scale 100 [--seed 1] [--quarters 1]
+                                  [--violations-per-system 12] [--template-dir ../data]
+"""
+
+import csv
+import json
+import random
+import shutil
+import argparse
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from itertools import count
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional
+from import_data import TABLE_SPECS
+
+# EPA region of every primacy state; Georgia comes first, so a 1x copy is Georgia
+EPA_REGIONS = {
+    'GA': '04',
+    'AK': '10', 'AL': '04', 'AR': '06', 'AZ': '09', 'CA': '09', 'CO': '08', 'CT': '01', 'DE': '03',
+    'FL': '04', 'HI': '09', 'IA': '07', 'ID': '10', 'IL': '05', 'IN': '05', 'KS': '07', 'KY': '04',
+    'LA': '06', 'MA': '01', 'MD': '03', 'ME': '01', 'MI': '05', 'MN': '05', 'MO': '07', 'MS': '04',
+    'MT': '08', 'NC': '04', 'ND': '08', 'NE': '07', 'NH': '01', 'NJ': '02', 'NM': '06', 'NV': '09',
+    'NY': '02', 'OH': '05', 'OK': '06', 'OR': '10', 'PA': '03', 'PR': '02', 'RI': '01', 'SC': '04',
+    'SD': '08', 'TN': '04', 'TX': '06', 'UT': '08', 'VA': '03', 'VT': '01', 'WA': '10', 'WI': '05',
+    'WV': '03', 'WY': '08',
+}
+STATES = list(EPA_REGIONS)
+
+# Files copied system by system from the template, keyed like TABLE_SPECS
+SYSTEM_TABLES = [
+    'geographic_areas', 'facilities', 'service_areas', 'lcr_samples',
+    'site_visits', 'events_milestones', 'pn_violation_assoc',
+]
+
+# Violations are modelled rather than copied: about a third of systems have none,
+# the rest an exponentially distributed number around --violations-per-system
+NO_VIOLATION_SHARE = 0.35
+DEFAULT_VIOLATIONS_PER_SYSTEM = 12
+FIRST_VIOLATION_YEAR = 1990
+
+class Contaminant(NamedTuple):
+    code: str
+    rule_code: str
+    rule_group_code: str
+    rule_family_code: str
+    federal_mcl: Optional[float] = None
+    unit: Optional[str] = None
+
+CONTAMINANTS = {c.code: c for c in [
+    Contaminant('8000', '111', '100', '110'),           # Revised Total Coliform Rule
+    Contaminant('3014', '111', '100', '110'),           # E. coli
+    Contaminant('0200', '121', '100', '120'),           # Surface Water Treatment Rule
+    Contaminant('0700', '140', '100', '140'),           # Groundwater Rule
+    Contaminant('0999', '210', '200', '210', 4.0, 'MG/L'),    # Chlorine (MRDL)
+    Contaminant('2950', '220', '200', '220', 0.080, 'MG/L'),  # TTHM
+    Contaminant('2456', '220', '200', '220', 0.060, 'MG/L'),  # HAA5
+    Contaminant('2050', '320', '300', '320', 0.003, 'MG/L'),  # Atrazine
+    Contaminant('1040', '331', '300', '330', 10, 'MG/L'),     # Nitrate
+    Contaminant('1005', '332', '300', '330', 0.010, 'MG/L'),  # Arsenic
+    Contaminant('4000', '340', '300', '340', 15, 'PCI/L'),    # Gross alpha
+    Contaminant('4010', '340', '300', '340', 5, 'PCI/L'),     # Combined radium
+    Contaminant('5000', '350', '300', '350'),           # Lead and Copper Rule
+    Contaminant('7500', '410', '400', '400'),           # Public Notice
+    Contaminant('7000', '420', '400', '400'),           # Consumer Confidence Rule
+]}
+
+class ViolationType(NamedTuple):
+    code: str
+    category: str
+    health_based: str
+    notification_tier: int
+    contaminants: tuple
+    weight: float
+    period_months: tuple  # compliance period lengths, one drawn per violation
+
+# Monitoring and reporting dominate, health-based violations are about one in six
+VIOLATION_TYPES = [
+    ViolationType('03', 'MR', 'N', 3, ('1040', '1005', '2950', '2456', '4000', '4010', '2050'), 28, (3, 12, 36)),
+    ViolationType('3A', 'MR', 'N', 3, ('8000',), 16, (1, 3)),
+    ViolationType('27', 'MR', 'N', 3, ('2950', '2456', '0999'), 6, (3, 12)),
+    ViolationType('52', 'MR', 'N', 3, ('5000',), 7, (12, 36)),
+    ViolationType('34', 'MR', 'N', 3, ('0700',), 3, (1, 3)),
+    ViolationType('02', 'MCL', 'Y', 2, ('2950', '2456', '1040', '1005', '4000', '4010', '2050'), 9, (3,)),
+    ViolationType('1A', 'MCL', 'Y', 1, ('3014',), 1, (1,)),
+    ViolationType('2B', 'TT', 'Y', 2, ('8000',), 2, (1,)),
+    ViolationType('57', 'TT', 'Y', 2, ('5000',), 2, (12,)),
+    ViolationType('41', 'TT', 'Y', 2, ('0700', '0200'), 2, (1, 3)),
+    ViolationType('11', 'MRDL', 'Y', 2, ('0999',), 1, (3,)),
+    ViolationType('71', 'Other', 'N', 3, ('7000',), 12, (12,)),
+    ViolationType('75', 'Other', 'N', 3, ('7500',), 8, (3, 12)),
+]
+VIOLATION_WEIGHTS = [v.weight for v in VIOLATION_TYPES]
+
+# (action type, category, weight) of follow-up actions; resolved violations end with a resolving one
+ENFORCEMENT_ACTIONS = [
+    ('SIA', 'Informal', 30), ('SIE', 'Informal', 20), ('SIF', 'Informal', 15), ('SII', 'Informal', 5),
+    ('SFJ', 'Formal', 8), ('SFL', 'Formal', 4), ('SFO', 'Formal', 1),
+]
+RESOLVING_ACTIONS = [('SOX', 'Resolving', 8), ('SO6', 'Resolving', 2)]
+
+# Status weights by age of the violation in years; older violations are mostly closed
+STATUS_WEIGHTS = [
+    (2, {'Unaddressed': 30, 'Addressed': 30, 'Resolved': 40}),
+    (5, {'Unaddressed': 5, 'Addressed': 15, 'Resolved': 80}),
+    (None, {'Addressed': 5, 'Resolved': 35, 'Archived': 60}),
+]
+
+def parse_date(value: str) -> Optional[date]:
+    try:
+        return datetime.strptime(value, '%m/%d/%Y').date()
+    except ValueError:
+        return None
+
+def format_date(value: Optional[date]) -> str:
+    return value.strftime('%m/%d/%Y') if value else ''
+
+def add_months(day: date, months: int) -> date:
+    month = day.month - 1 + months
+    return date(day.year + month // 12, month % 12 + 1, 1)
+
+def previous_quarter(quarter: str) -> str:
+    year, q = int(quarter[:4]), int(quarter[5])
+    return f"{year - 1}Q4" if q == 1 else f"{year}Q{q - 1}"
+
+def weighted(rng: random.Random, choices):
+    """One item of (…, weight) tuples"""
+    return rng.choices(choices, weights=[choice[-1] for choice in choices])[0]
+
+class Template:
+    """The Georgia export, grouped by system"""
+
+    def __init__(self, template_dir: Path):
+        self.dir = template_dir
+        self.headers: Dict[str, List[str]] = {}
+        self.systems: List[List[str]] = []
+        self.rows: Dict[str, Dict[str, List[List[str]]]] = {}
+
+        spec = TABLE_SPECS['public_water_systems']
+        self.headers[spec.table], rows = self.read(spec.csv_file)
+        self.systems = rows
+        self.quarter = rows[0][0]
+        last_reported = self.headers[spec.table].index('LAST_REPORTED_DATE')
+        # The day the export was taken: nothing in it was reported later
+        self.snapshot = max(filter(None, (parse_date(row[last_reported]) for row in rows)))
+
+        for table in SYSTEM_TABLES:
+            self.headers[table], rows = self.read(TABLE_SPECS[table].csv_file)
+            by_system = defaultdict(list)
+            for row in rows:
+                by_system[row[1]].append(row)
+            self.rows[table] = by_system
+
+    def read(self, csv_file):
+        with open(self.dir / csv_file, newline='', encoding='utf-8') as f:
+            reader = csv.reader(f)
+            header = next(reader)
+            if header[:2] != ['SUBMISSIONYEARQUARTER', 'PWSID']:
+                raise ValueError(f"{csv_file} does not start with SUBMISSIONYEARQUARTER, PWSID")
+            return header, list(reader)
+
+class SyntheticExport:
+    def __init__(self, template: Template, output_dir: Path, scale: float = 1.0, seed: int = 1,
+                 quarters: int = 1, violations_per_system: float = DEFAULT_VIOLATIONS_PER_SYSTEM):
+        self.template = template
+        self.output_dir = output_dir
+        self.scale = scale
+        self.seed = seed
+        self.quarters = [template.quarter]
+        for _ in range(quarters - 1):
+            self.quarters.append(previous_quarter(self.quarters[-1]))
+        self.violations_per_system = violations_per_system
+        self.columns = {table: {name: i for i, name in enumerate(header)}
+                        for table, header in template.headers.items()}
+        self.violation_header = [field.source for field in TABLE_SPECS['violations_enforcement'].fields]
+        # Identifiers unique across the whole export, as in SDWIS
+        self.geo_ids = count(10000000)
+        self.sample_ids = count(100000)
+        self.sar_ids = count(20000000)
+        self.event_ids = count(100000)
+        self.violation_ids = count(1000)
+        self.enforcement_ids = count(1000)
+        self.rows = defaultdict(int)
+        self.keys = defaultdict(int)
+        self.key_indexes = {}
+
+    def copy_order(self, copy: int) -> List[int]:
+        """Template systems in the order copy number copy lists them"""
+        order = list(range(len(self.template.systems)))
+        random.Random(f"{self.seed}:copy:{copy}").shuffle(order)
+        return order
+
+    def pwsid_of(self, copy: int, position: int) -> str:
+        """PWSIDs run on within a state; after every state has a copy, states get a second one"""
+        serial = (copy // len(STATES)) * len(self.template.systems) + position + 1
+        return f"{STATES[copy % len(STATES)]}{serial:07d}"
+
+    def count_keys(self, table, header, rows):
+        """Distinct natural keys of the rows the importer loads (those with every required column set)"""
+        if table not in self.key_indexes:
+            spec = TABLE_SPECS[table]
+            source = {field.column: header.index(field.source) for field in spec.fields}
+            self.key_indexes[table] = ([source[column] for column in spec.conflict_columns],
+                                       [source[column] for column in spec.required_columns])
+        keys, required = self.key_indexes[table]
+        return len({tuple(row[i].strip() for i in keys) for row in rows if all(row[i].strip() for i in required)})
+
+    def write(self, writers, table, rows, header):
+        for quarter in self.quarters:
+            for row in rows:
+                row[0] = quarter
+                writers[table].writerow(row)
+        self.rows[table] += len(rows) * len(self.quarters)
+        self.keys[table] += self.count_keys(table, header, rows) * len(self.quarters)
+
+    def system_row(self, row, pwsid, state):
+        c = self.columns['public_water_systems']
+        row = list(row)
+        row[c['PWSID']] = pwsid
+        row[c['PRIMACY_AGENCY_CODE']] = state
+        row[c['EPA_REGION']] = EPA_REGIONS[state]
+        # Owners elsewhere keep their state
+        if row[c['STATE_CODE']] == 'GA':
+            row[c['STATE_CODE']] = state
+        return row
+
+    def system_rows(self, rng, template_pwsid, pwsid, state, sellers, violation_ids):
+        """Every row of one system in the copied files, under its new keys"""
+        out = {}
+        for table in SYSTEM_TABLES:
+            c = self.columns[table]
+            rows = [list(row) for row in self.template.rows[table].get(template_pwsid, [])]
+            for row in rows:
+                row[1] = pwsid
+            if table == 'geographic_areas':
+                for row in rows:
+                    row[c['GEO_ID']] = str(next(self.geo_ids))
+                    if row[c['STATE_SERVED']] == 'GA':
+                        row[c['STATE_SERVED']] = state
+            elif table == 'facilities':
+                for row in rows:
+                    seller = row[c['SELLER_PWSID']]
+                    if seller:
+                        # Wholesalers stay in the same copy; sellers outside the template keep their PWSID
+                        row[c['SELLER_PWSID']] = sellers.get(seller, seller)
+            elif table == 'lcr_samples':
+                for row in rows:
+                    row[c['SAMPLE_ID']] = f"{state}{next(self.sample_ids)}"
+                    row[c['SAR_ID']] = str(next(self.sar_ids))
+            elif table == 'events_milestones':
+                for row in rows:
+                    row[c['EVENT_SCHEDULE_ID']] = str(next(self.event_ids))
+            elif table == 'pn_violation_assoc':
+                # Notices point at this system's violations while there are any to point at
+                notices, related = {}, {}
+                unused = list(violation_ids)
+                rng.shuffle(unused)
+                for row in rows:
+                    old_notice, old_related = row[c['PN_VIOLATION_ID']], row[c['RELATED_VIOLATION_ID']]
+                    if old_notice not in notices:
+                        notices[old_notice] = str(next(self.violation_ids))
+                    if old_related not in related:
+                        related[old_related] = unused.pop() if unused else str(next(self.violation_ids))
+                    row[c['PN_VIOLATION_ID']] = notices[old_notice]
+                    row[c['RELATED_VIOLATION_ID']] = related[old_related]
+            out[table] = rows
+        return out
+
+    def violation_rows(self, rng, system, pwsid, facility_ids):
+        """Violations of one system, one row per enforcement action as in the export"""
+        c = self.columns['public_water_systems']
+        if rng.random() < NO_VIOLATION_SHARE:
+            return []
+        mean = self.violations_per_system / (1 - NO_VIOLATION_SHARE)
+        total = int(rng.expovariate(1 / mean)) + 1 if mean > 0 else 0
+        snapshot = self.template.snapshot
+        deactivated = parse_date(system[c['PWS_DEACTIVATION_DATE']])
+        latest = min(deactivated, snapshot) if deactivated else snapshot
+        # Systems closed before FIRST_VIOLATION_YEAR have violations in their last ten years
+        earliest = min(date(FIRST_VIOLATION_YEAR, 1, 1), latest - timedelta(days=3652))
+        span = max((latest - earliest).days, 1)
+
+        rows = []
+        for _ in range(total):
+            kind = rng.choices(VIOLATION_TYPES, weights=VIOLATION_WEIGHTS)[0]
+            contaminant = CONTAMINANTS[rng.choice(kind.contaminants)]
+            # Recent years report more violations
+            begin = earliest + timedelta(days=int(rng.triangular(0, span, span)))
+            begin = date(begin.year, begin.month, 1)
+            end = add_months(begin, rng.choice(kind.period_months)) - timedelta(days=1)
+            age = (snapshot - begin).days / 365.25
+            weights = next(w for limit, w in STATUS_WEIGHTS if limit is None or age < limit)
+            status = rng.choices(list(weights), weights=list(weights.values()))[0]
+            closed = status in ('Resolved', 'Archived')
+
+            first_reported = min(end + timedelta(days=rng.randint(15, 120)), snapshot)
+            last_reported = (min(first_reported + timedelta(days=rng.randint(0, 400)), snapshot)
+                             if closed else snapshot)
+            measure = federal_mcl = ''
+            if kind.category in ('MCL', 'MRDL') and contaminant.federal_mcl:
+                federal_mcl = f"{contaminant.federal_mcl:g}"
+                measure = f"{contaminant.federal_mcl * rng.uniform(1.05, 3.0):.4g}"
+            if closed:
+                non_compl_end = format_date(end)
+            else:
+                # Open violations are listed with an open end ('--->') or none at all
+                non_compl_end = rng.choice(['--->', ''])
+            base = {
+                'PWSID': pwsid,
+                'VIOLATION_ID': str(next(self.violation_ids)),
+                'FACILITY_ID': rng.choice(facility_ids) if facility_ids and rng.random() < 0.4 else '',
+                'COMPL_PER_BEGIN_DATE': format_date(begin),
+                'COMPL_PER_END_DATE': format_date(end) if rng.random() < 0.9 else '',
+                'NON_COMPL_PER_BEGIN_DATE': format_date(begin),
+                'NON_COMPL_PER_END_DATE': non_compl_end,
+                'PWS_DEACTIVATION_DATE': format_date(deactivated),
+                'VIOLATION_CODE': kind.code,
+                'VIOLATION_CATEGORY_CODE': kind.category,
+                'IS_HEALTH_BASED_IND': kind.health_based,
+                'CONTAMINANT_CODE': contaminant.code,
+                'VIOL_MEASURE': measure,
+                'UNIT_OF_MEASURE': contaminant.unit if measure else '',
+                'FEDERAL_MCL': federal_mcl,
+                'STATE_MCL': federal_mcl if federal_mcl and rng.random() < 0.1 else '',
+                'IS_MAJOR_VIOL_IND': ('Y' if rng.random() < 0.7 else 'N') if kind.category == 'MR' else '',
+                'CALCULATED_RTC_DATE': format_date(min(end + timedelta(days=rng.randint(0, 180)), snapshot))
+                                       if closed else '',
+                'VIOLATION_STATUS': status,
+                'PUBLIC_NOTIFICATION_TIER': str(kind.notification_tier),
+                'CALCULATED_PUB_NOTIF_TIER': str(kind.notification_tier),
+                'VIOL_ORIGINATOR_CODE': weighted(rng, [('S', 95), ('R', 4), ('F', 1)])[0],
+                'SAMPLE_RESULT_ID': str(next(self.sar_ids)) if measure else '',
+                'RULE_CODE': contaminant.rule_code,
+                'RULE_GROUP_CODE': contaminant.rule_group_code,
+                'RULE_FAMILY_CODE': contaminant.rule_family_code,
+                'VIOL_FIRST_REPORTED_DATE': format_date(first_reported),
+                'VIOL_LAST_REPORTED_DATE': format_date(last_reported),
+            }
+
+            # A quarter of violations have no enforcement action yet; the rest one or more
+            actions = []
+            if rng.random() >= 0.25:
+                actions = [weighted(rng, ENFORCEMENT_ACTIONS) for _ in range(1 + int(rng.expovariate(1.5)))]
+            if closed:
+                actions.append(weighted(rng, RESOLVING_ACTIONS))
+            if not actions:
+                rows.append(base)
+                continue
+            acted = first_reported
+            for action_type, category, _ in actions:
+                acted = min(acted + timedelta(days=rng.randint(0, 120)), snapshot)
+                reported = min(acted + timedelta(days=rng.randint(1, 60)), snapshot)
+                rows.append(dict(base, **{
+                    'ENFORCEMENT_ID': str(next(self.enforcement_ids)),
+                    'ENFORCEMENT_DATE': format_date(acted),
+                    'ENFORCEMENT_ACTION_TYPE_CODE': action_type,
+                    'ENF_ACTION_CATEGORY': category,
+                    'ENF_ORIGINATOR_CODE': 'S',
+                    'ENF_FIRST_REPORTED_DATE': format_date(reported),
+                    'ENF_LAST_REPORTED_DATE': format_date(reported if closed else snapshot),
+                }))
+        return [[row.get(name, '') for name in self.violation_header] for row in rows]
+
+    def manifest(self):
+        files = {}
+        for table in ['reference_codes', 'public_water_systems', 'violations_enforcement'] + SYSTEM_TABLES:
+            csv_file = TABLE_SPECS[table].csv_file
+            files[csv_file] = {
+                'table': table,
+                'rows': self.rows[table],
+                'keys': self.keys[table],
+                'bytes': (self.output_dir / csv_file).stat().st_size,
+            }
+        return {
+            'template_quarter': self.template.quarter,
+            'scale': self.scale,
+            'seed': self.seed,
+            'quarters': self.quarters,
+            'violations_per_system': self.violations_per_system,
+            'systems': self.rows['public_water_systems'] // len(self.quarters),
+            'rows': sum(f['rows'] for f in files.values()),
+            'bytes': sum(f['bytes'] for f in files.values()),
+            'files': files,
+        }
+
+    def generate(self):
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        ref = TABLE_SPECS['reference_codes']
+        shutil.copyfile(self.template.dir / ref.csv_file, self.output_dir / ref.csv_file)
+        with open(self.output_dir / ref.csv_file, newline='', encoding='utf-8') as f:
+            reader = csv.reader(f)
+            ref_header = next(reader)
+            ref_rows = list(reader)
+        self.rows['reference_codes'] = len(ref_rows)
+        self.keys['reference_codes'] = self.count_keys('reference_codes', ref_header, ref_rows)
+
+        headers = dict(self.template.headers, violations_enforcement=self.violation_header)
+        tables = ['public_water_systems', 'violations_enforcement'] + SYSTEM_TABLES
+        files = {table: open(self.output_dir / TABLE_SPECS[table].csv_file, 'w', newline='', encoding='utf-8')
+                 for table in tables}
+        try:
+            writers = {table: csv.writer(f, lineterminator='\n') for table, f in files.items()}
+            for table in tables:
+                writers[table].writerow(headers[table])
+
+            per_copy = len(self.template.systems)
+            total = round(self.scale * per_copy)
+            pwsid_column = self.columns['public_water_systems']['PWSID']
+            facility_column = self.columns['facilities']['FACILITY_ID']
+            for copy in range((total + per_copy - 1) // per_copy):
+                order = self.copy_order(copy)
+                state = STATES[copy % len(STATES)]
+                sellers = {self.template.systems[index][pwsid_column]: self.pwsid_of(copy, position)
+                           for position, index in enumerate(order)}
+                for position, index in enumerate(order[:total - copy * per_copy]):
+                    rng = random.Random(f"{self.seed}:system:{copy}:{position}")
+                    template_row = self.template.systems[index]
+                    pwsid = self.pwsid_of(copy, position)
+                    self.write(writers, 'public_water_systems', [self.system_row(template_row, pwsid, state)],
+                               headers['public_water_systems'])
+
+                    template_pwsid = template_row[pwsid_column]
+                    facility_ids = [row[facility_column]
+                                    for row in self.template.rows['facilities'].get(template_pwsid, [])]
+                    violations = self.violation_rows(rng, template_row, pwsid, facility_ids)
+                    self.write(writers, 'violations_enforcement', violations, self.violation_header)
+                    violation_ids = sorted({row[2] for row in violations})
+                    for table, rows in self.system_rows(rng, template_pwsid, pwsid, state,
+                                                        sellers, violation_ids).items():
+                        self.write(writers, table, rows, headers[table])
+                print(f"   • copy {copy + 1}: {min(total - copy * per_copy, per_copy):,} systems in {state}")
+        finally:
+            for f in files.values():
+                f.close()
+
+        manifest = self.manifest()
+        with open(self.output_dir / 'manifest.json', 'w') as f:
+            json.dump(manifest, f, indent=2)
+        return manifest
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate deterministic SDWA export files at a multiple of Georgia')
+    parser.add_argument('--output-dir', required=True, help='Directory for the CSV files and manifest.json')
+    parser.add_argument('--scale', type=float, default=1.0,
+                        help='Systems as a multiple of the template export (0.1 for a quick run, 100 for national scale)')
+    parser.add_argument('--seed', type=int, default=1, help='Random seed; the same settings write the same files')
+    parser.add_argument('--quarters', type=int, default=1,
+                        help='Quarterly snapshots to write, ending at the template quarter')
+    parser.add_argument('--violations-per-system', type=float, default=DEFAULT_VIOLATIONS_PER_SYSTEM,
+                        help='Mean number of violations per system')
+    parser.add_argument('--template-dir', default='../data', help='Directory of the export the data is modelled on')
+
+    args = parser.parse_args()
+    if args.scale <= 0 or args.quarters < 1:
+        parser.error('--scale must be positive and --quarters at least 1')
+
+    template = Template(Path(args.template_dir))
+    print(f"🧪 Generating {args.scale:g}x {template.quarter} ({len(template.systems):,} systems per copy), "
+          f"{args.quarters} quarter(s), seed {args.seed}")
+    manifest = SyntheticExport(template, Path(args.output_dir), args.scale, args.seed,
+                               args.quarters, args.violations_per_system).generate()
+    for csv_file, info in manifest['files'].items():
+        print(f"   {csv_file}: {info['rows']:,} rows, {info['keys']:,} keys, {info['bytes'] / 1e6:.1f} MB")
+    print(f"✅ {manifest['rows']:,} rows ({manifest['bytes'] / 1e6:.1f} MB) in {args.output_dir}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,372 @@
+#!/usr/bin/env python3
+"""
+Batch Geocoder for Water System Locations
+
+Fills the coordinates of water_system_locations rows that have none. Pending rows
+are grouped by normalized address, so each distinct address is resolved once. Each
+backend in turn first answers from the geocoding_cache table, then resolves its
+cache misses in bulk. Results go back to the table in a single UPDATE.
+
+Backends:
+    gazetteer  ZIP code, then city, centroids from the Census gazetteer (offline;
+               load the files once with --load-gazetteer)
+    census     Census Bureau batch geocoder, street-level, 10,000 addresses per request
+
+Usage:
+    python geocode_systems.py --load-gazetteer 2020_Gaz_zcta_national.txt 2020_Gaz_place_national.txt
+    python geocode_systems.py                                  # offline, gazetteer only
+    python geocode_systems.py --backend census --backend gazetteer
+    python geocode_systems.py --quarter 2025Q1 --limit 500 --dry-run
+"""
+
+import re
+import io
+import csv
+import sys
+import uuid
+import argparse
+import time
+import urllib.request
+import urllib.error
+from typing import Dict, List, NamedTuple, Optional, Sequence
+from psycopg2.extras import execute_values
+from db import connect
+
+class AddressQuery(NamedTuple):
+    """A normalized address; key identifies it in the cache"""
+    key: str
+    street: Optional[str]  # None for P.O. boxes, which only centroid backends can place
+    city: str
+    state: str
+    zip5: str
+
+class GeocodeResult(NamedTuple):
+    latitude: float
+    longitude: float
+    accuracy: str  # ROOFTOP, RANGE_INTERPOLATED, GEOMETRIC_CENTER or APPROXIMATE
+    source: str
+    confidence: float
+
+# Spellings that vary between SDWIS addresses and gazetteer names
+ABBREVIATIONS = {
+    'STREET': 'ST', 'AVENUE': 'AVE', 'ROAD': 'RD', 'DRIVE': 'DR', 'BOULEVARD': 'BLVD',
+    'LANE': 'LN', 'COURT': 'CT', 'CIRCLE': 'CIR', 'PLACE': 'PL', 'PARKWAY': 'PKWY',
+    'HIGHWAY': 'HWY', 'HWY.': 'HWY', 'TRAIL': 'TRL', 'TERRACE': 'TER', 'SUITE': 'STE',
+    'NORTH': 'N', 'SOUTH': 'S', 'EAST': 'E', 'WEST': 'W',
+    'NORTHEAST': 'NE', 'NORTHWEST': 'NW', 'SOUTHEAST': 'SE', 'SOUTHWEST': 'SW',
+    'SAINT': 'ST', 'MOUNT': 'MT', 'FORT': 'FT',
+}
+
+PO_BOX = re.compile(r'^(P\s*O|POST\s+OFFICE)\s*BOX\b')
+PUNCTUATION = re.compile(r'[.,;:"\']')
+
+# Census place names end in a lowercase legal description ("Atlanta city",
+# "Athens-Clarke County unified government (balance)") or CDP
+PLACE_SUFFIX = re.compile(r'(\s+[a-z][a-z ]*|\s+CDP)?(\s+\(balance\))?$')
+
+def normalize_text(value: Optional[str]) -> str:
+    """Upper case, no punctuation, single spaces, common words abbreviated"""
+    words = PUNCTUATION.sub(' ', (value or '').upper()).split()
+    return ' '.join(ABBREVIATIONS.get(word, word) for word in words)
+
+def normalize_address(line1, line2, city, state, zip_code) -> AddressQuery:
+    """The address of a location row as a query; equal addresses get equal keys"""
+    street = normalize_text(line1)
+    if PO_BOX.match(street):
+        # A street in the second line is more useful than the box
+        second = normalize_text(line2)
+        street = second if second and not PO_BOX.match(second) else None
+    city = normalize_text(city)
+    state = normalize_text(state)[:2]
+    zip5 = re.sub(r'\D', '', zip_code or '')[:5]
+    return AddressQuery(f"{street or 'PO BOX'}|{city}|{state}|{zip5}", street, city, state, zip5)
+
+def place_key(city: str, state: str) -> str:
+    return f"{city}|{state}"
+
+class GazetteerBackend:
+    """ZIP code centroid, or failing that the centroid of the city, from geocoding_gazetteer"""
+
+    name = 'gazetteer'
+
+    def __init__(self, conn, **_):
+        self.conn = conn
+        self.failed_batches = 0
+
+    def geocode(self, queries: Sequence[AddressQuery]) -> Dict[str, Optional[GeocodeResult]]:
+        zips = sorted({query.zip5 for query in queries if len(query.zip5) == 5})
+        places = sorted({place_key(query.city, query.state) for query in queries if query.city})
+        with self.conn.cursor() as cur:
+            cur.execute("""
+                SELECT kind, place_key, latitude, longitude FROM geocoding_gazetteer
+                WHERE (kind = 'zip' AND place_key = ANY(%s)) OR (kind = 'place' AND place_key = ANY(%s))
+            """, (zips, places))
+            centroids = {(kind, key): (float(lat), float(lng)) for kind, key, lat, lng in cur.fetchall()}
+
+        results = {}
+        for query in queries:
+            if ('zip', query.zip5) in centroids:
+                lat, lng = centroids[('zip', query.zip5)]
+                results[query.key] = GeocodeResult(lat, lng, 'APPROXIMATE', 'census_gazetteer_zcta', 0.5)
+            elif ('place', place_key(query.city, query.state)) in centroids:
+                lat, lng = centroids[('place', place_key(query.city, query.state))]
+                results[query.key] = GeocodeResult(lat, lng, 'APPROXIMATE', 'census_gazetteer_place', 0.3)
+            else:
+                results[query.key] = None
+        return results
+
+class CensusBatchBackend:
+    """Street addresses through the Census Bureau batch geocoder (no API key needed)"""
+
+    name = 'census'
+    URL = 'https://geocoding.geo.census.gov/geocoder/locations/addressbatch'
+    BATCH_LIMIT = 10000
+
+    def __init__(self, conn=None, timeout: float = 600, url: Optional[str] = None, **_):
+        self.timeout = timeout
+        self.url = url or self.URL
+        self.failed_batches = 0
+
+    def geocode(self, queries: Sequence[AddressQuery]) -> Dict[str, Optional[GeocodeResult]]:
+        results: Dict[str, Optional[GeocodeResult]] = {}
+        # P.O. boxes have no street to match
+        results.update({query.key: None for query in queries if not query.street})
+        streets = [query for query in queries if query.street]
+        for start in range(0, len(streets), self.BATCH_LIMIT):
+            batch = streets[start:start + self.BATCH_LIMIT]
+            try:
+                results.update(self.geocode_batch(batch))
+            except (urllib.error.URLError, OSError) as e:
+                # Left out of the results, so they are neither cached nor written
+                print(f"⚠️  Census batch of {len(batch)} failed: {e}")
+                self.failed_batches += 1
+        return results
+
+    def geocode_batch(self, batch: Sequence[AddressQuery]) -> Dict[str, Optional[GeocodeResult]]:
+        lines = io.StringIO()
+        writer = csv.writer(lines)
+        for number, query in enumerate(batch):
+            writer.writerow([number, query.street, query.city, query.state, query.zip5])
+
+        boundary = uuid.uuid4().hex
+        body = (
+            f'--{boundary}\r\nContent-Disposition: form-data; name="benchmark"\r\n\r\nPublic_AR_Current\r\n'
+            f'--{boundary}\r\nContent-Disposition: form-data; name="addressFile"; filename="addresses.csv"\r\n'
+            f'Content-Type: text/csv\r\n\r\n{lines.getvalue()}\r\n--{boundary}--\r\n'
+        ).encode('utf-8')
+        request = urllib.request.Request(self.url, data=body, headers={
+            'Content-Type': f'multipart/form-data; boundary={boundary}'})
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            text = response.read().decode('utf-8', errors='replace')
+
+        # id, input address, Match/No_Match/Tie, Exact/Non_Exact, matched address, "lon,lat", ...
+        results = {}
+        for row in csv.reader(io.StringIO(text)):
+            if len(row) < 3 or not row[0].isdigit() or int(row[0]) >= len(batch):
+                continue
+            key = batch[int(row[0])].key
+            if row[2] == 'Match' and len(row) >= 6 and ',' in row[5]:
+                lng, lat = (float(value) for value in row[5].split(','))
+                exact = row[3] == 'Exact'
+                results[key] = GeocodeResult(lat, lng, 'RANGE_INTERPOLATED', 'census_geocoder', 0.9 if exact else 0.7)
+            else:
+                results[key] = None
+        return results
+
+BACKENDS = {
+    'gazetteer': GazetteerBackend,
+    'census': CensusBatchBackend,
+}
+
+class BatchGeocoder:
+    def __init__(self, conn, backends, retry_misses: bool = False, dry_run: bool = False):
+        self.conn = conn
+        self.backends = backends
+        self.retry_misses = retry_misses
+        self.dry_run = dry_run
+
+    def pending_rows(self, quarter: Optional[str], limit: Optional[int]):
+        """Location rows without coordinates, largest systems first"""
+        with self.conn.cursor() as cur:
+            cur.execute("""
+                SELECT wsl.id, wsl.address_line1, wsl.address_line2, wsl.city_name, wsl.state_code, wsl.zip_code
+                FROM water_system_locations wsl
+                LEFT JOIN public_water_systems p ON p.submission_year_quarter = wsl.submission_year_quarter
+                    AND p.pwsid = wsl.pwsid
+                WHERE wsl.latitude IS NULL
+                  AND wsl.full_address IS NOT NULL
+                  AND (%(quarter)s::varchar IS NULL OR wsl.submission_year_quarter = %(quarter)s)
+                ORDER BY p.population_served_count DESC NULLS LAST, wsl.id
+                LIMIT %(limit)s
+            """, {'quarter': quarter, 'limit': limit})
+            return cur.fetchall()
+
+    def cached(self, backend: str, keys: List[str]) -> Dict[str, Optional[GeocodeResult]]:
+        with self.conn.cursor() as cur:
+            cur.execute("""
+                SELECT address_key, latitude, longitude, geocoding_accuracy, geocoding_source, geocoding_confidence
+                FROM geocoding_cache
+                WHERE backend = %s AND address_key = ANY(%s)
+            """, (backend, keys))
+            return {
+                key: GeocodeResult(float(lat), float(lng), accuracy, source, float(confidence)) if lat is not None else None
+                for key, lat, lng, accuracy, source, confidence in cur.fetchall()
+            }
+
+    def store(self, backend: str, results: Dict[str, Optional[GeocodeResult]]):
+        rows = [
+            (key, backend) + (tuple(result) if result else (None, None, None, None, None))
+            for key, result in results.items()
+        ]
+        if not rows or self.dry_run:
+            return
+        with self.conn.cursor() as cur:
+            execute_values(cur, """
+                INSERT INTO geocoding_cache (address_key, backend, latitude, longitude,
+                    geocoding_accuracy, geocoding_source, geocoding_confidence)
+                VALUES %s
+                ON CONFLICT (address_key, backend) DO UPDATE SET
+                    latitude = EXCLUDED.latitude,
+                    longitude = EXCLUDED.longitude,
+                    geocoding_accuracy = EXCLUDED.geocoding_accuracy,
+                    geocoding_source = EXCLUDED.geocoding_source,
+                    geocoding_confidence = EXCLUDED.geocoding_confidence,
+                    created_at = NOW()
+            """, rows, page_size=1000)
+        self.conn.commit()
+
+    def write_back(self, rows) -> int:
+        """Set the coordinates of every location row in one statement"""
+        if not rows or self.dry_run:
+            return 0
+        with self.conn.cursor() as cur:
+            execute_values(cur, """
+                UPDATE water_system_locations wsl SET
+                    latitude = c.latitude,
+                    longitude = c.longitude,
+                    geocoded_at = NOW(),
+                    geocoding_accuracy = c.accuracy,
+                    geocoding_source = c.source,
+                    geocoding_confidence = c.confidence
+                FROM (VALUES %s) AS c(id, latitude, longitude, accuracy, source, confidence)
+                WHERE wsl.id = c.id AND wsl.latitude IS NULL
+            """, rows, template='(%s::uuid, %s::numeric, %s::numeric, %s, %s, %s::numeric)', page_size=len(rows))
+            updated = cur.rowcount
+        self.conn.commit()
+        return updated
+
+    def run(self, quarter: Optional[str] = None, limit: Optional[int] = None) -> bool:
+        """Geocode the pending rows; False if a backend batch failed or no pending address resolved"""
+        started = time.perf_counter()
+        pending = self.pending_rows(quarter, limit)
+        by_key: Dict[str, List[str]] = {}
+        queries: Dict[str, AddressQuery] = {}
+        for row_id, *address in pending:
+            query = normalize_address(*address)
+            queries[query.key] = query
+            by_key.setdefault(query.key, []).append(row_id)
+        print(f"📍 {len(pending):,} locations without coordinates, {len(queries):,} distinct addresses")
+
+        resolved: Dict[str, GeocodeResult] = {}
+        for backend in self.backends:
+            remaining = [key for key in queries if key not in resolved]
+            if not remaining:
+                break
+            cached = self.cached(backend.name, remaining)
+            hits = {key: result for key, result in cached.items() if result is not None}
+            known_misses = 0 if self.retry_misses else len(cached) - len(hits)
+            resolved.update(hits)
+            to_ask = [queries[key] for key in remaining
+                      if key not in hits and (self.retry_misses or key not in cached)]
+
+            backend_started = time.perf_counter()
+            answers = backend.geocode(to_ask) if to_ask else {}
+            self.store(backend.name, answers)
+            found = {key: result for key, result in answers.items() if result is not None}
+            resolved.update(found)
+            print(f"   • {backend.name}: {len(hits):,} cache hits, {known_misses:,} cached misses, "
+                  f"{len(found):,} of {len(to_ask):,} resolved in {time.perf_counter() - backend_started:.2f}s")
+
+        rows = [
+            (row_id, result.latitude, result.longitude, result.accuracy, result.source, result.confidence)
+            for key, result in resolved.items()
+            for row_id in by_key[key]
+        ]
+        updated = self.write_back(rows)
+        unresolved = len(queries) - len(resolved)
+        action = "Would update" if self.dry_run else "Updated"
+        print(f"✅ {action} {len(rows) if self.dry_run else updated:,} locations in "
+              f"{time.perf_counter() - started:.2f}s; {unresolved:,} addresses unresolved")
+
+        failed_batches = sum(backend.failed_batches for backend in self.backends)
+        if failed_batches:
+            print(f"❌ {failed_batches} backend batch(es) failed; run again to retry their addresses")
+        if queries and not resolved:
+            print("❌ No address resolved; load the gazetteer (--load-gazetteer) or add a backend")
+        return not failed_batches and bool(resolved or not queries)
+
+def load_gazetteer(conn, paths: Sequence[str]):
+    """Load Census gazetteer ZCTA and place files (tab-separated) into geocoding_gazetteer"""
+    for path in paths:
+        with open(path, newline='', encoding='utf-8', errors='replace') as f:
+            reader = csv.reader(f, delimiter='\t')
+            # The last header name carries trailing spaces
+            header = [name.strip() for name in next(reader)]
+            column = {name: index for index, name in enumerate(header)}
+            if 'INTPTLAT' not in column or 'INTPTLONG' not in column:
+                print(f"❌ {path}: no INTPTLAT/INTPTLONG columns, not a gazetteer file")
+                continue
+            is_place = 'NAME' in column and 'USPS' in column
+
+            rows = {}
+            for record in reader:
+                record = [value.strip() for value in record]
+                if is_place:
+                    city = normalize_text(PLACE_SUFFIX.sub('', record[column['NAME']]))
+                    key, name = place_key(city, record[column['USPS']]), record[column['NAME']]
+                else:
+                    key = name = record[column['GEOID']]
+                # Several places can share a name within a state; the first one is kept
+                rows.setdefault(key, (key, name[:150], record[column['INTPTLAT']], record[column['INTPTLONG']]))
+
+        kind = 'place' if is_place else 'zip'
+        with conn.cursor() as cur:
+            execute_values(cur, """
+                INSERT INTO geocoding_gazetteer (kind, place_key, name, latitude, longitude)
+                VALUES %s
+                ON CONFLICT (kind, place_key) DO UPDATE SET
+                    name = EXCLUDED.name,
+                    latitude = EXCLUDED.latitude,
+                    longitude = EXCLUDED.longitude
+            """, list(rows.values()), template=f"('{kind}', %s, %s, %s::numeric, %s::numeric)", page_size=1000)
+        conn.commit()
+        print(f"✅ Loaded {len(rows):,} {kind} centroids from {path}")
+
+def main():
+    parser = argparse.ArgumentParser(description='Geocode water system locations in bulk')
+    parser.add_argument('--backend', action='append', choices=sorted(BACKENDS), dest='backends',
+                        help='Backend to try, in order; repeat for a fallback chain (default: gazetteer)')
+    parser.add_argument('--quarter', help='Only locations of this quarter (default: every quarter)')
+    parser.add_argument('--limit', type=int, help='At most this many locations, largest systems first')
+    parser.add_argument('--retry-misses', action='store_true',
+                        help='Ask backends again about addresses they previously could not match')
+    parser.add_argument('--dry-run', action='store_true', help='Resolve addresses but write nothing')
+    parser.add_argument('--census-timeout', type=float, default=600, help='Seconds to wait for each census batch')
+    parser.add_argument('--load-gazetteer', nargs='+', metavar='FILE',
+                        help='Load Census gazetteer ZCTA and place files, then exit')
+
+    args = parser.parse_args()
+
+    conn = connect()
+    try:
+        if args.load_gazetteer:
+            load_gazetteer(conn, args.load_gazetteer)
+            return
+        backends = [BACKENDS[name](conn, timeout=args.census_timeout) for name in (args.backends or ['gazetteer'])]
+        geocoder = BatchGeocoder(conn, backends, retry_misses=args.retry_misses, dry_run=args.dry_run)
+        sys.exit(0 if geocoder.run(args.quarter, args.limit) else 1)
+    finally:
+        conn.close()
+
+if __name__ == '__main__':
+    main()
@@ -4,41 +4,563 @@ Georgia Water Quality Data Import Script
 Imports CSV files from the data directory into Supabase database
 """
 
-import os
 import sys
 import csv
+import io
+import time
 import psycopg2
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
 from psycopg2.extras import execute_batch
 from datetime import datetime
+from itertools import islice
 import argparse
+from dataclasses import dataclass, replace
 from pathlib import Path
-from dotenv import load_dotenv
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Set
+from db import connect
+from pipeline_metrics import PipelineMetrics, profiled
 
 # Add the parent directory to the path so we can import from the project
 sys.path.append(str(Path(__file__).parent.parent))
 
-# Load environment variables from .env file
-load_dotenv()
+# Rows cleaned and written per chunk; bounds importer memory regardless of file size
+DEFAULT_CHUNK_SIZE = 1000
 
-# Database configuration from environment variables
-DB_CONFIG = {
-    'host': os.getenv('DB_HOST', '127.0.0.1'),
-    'port': int(os.getenv('DB_PORT', 54322)),
-    'database': os.getenv('DB_NAME', 'postgres'),
-    'user': os.getenv('DB_USER', 'postgres'),
-    'password': os.getenv('DB_PASSWORD', 'postgres')
+class DerivedRefresh(NamedTuple):
+    """A database function that rebuilds data derived from imported tables"""
+    name: str
+    function: str
+    sources: frozenset
+
+class Field(NamedTuple):
+    """One CSV column mapped to a table column"""
+    column: str
+    source: str
+    kind: str = 'str'  # str, date, int or float
+    max_length: Optional[int] = None
+
+@dataclass
+class TableSpec:
+    """Source file, column mapping and ON CONFLICT behaviour for one import"""
+    table: str
+    csv_file: str
+    label: str
+    fields: List[Field]
+    conflict_columns: List[str]
+    update_columns: List[str]
+    touch_updated_at: bool = True
+    page_size: int = 1000
+    required_columns: tuple = ()
+    stop_on_error: bool = False
+    # Partitioned by submission_year_quarter: new quarters get partitions before their rows are written
+    quarter_partitions: bool = False
+
+    @property
+    def columns(self):
+        return [field.column for field in self.fields]
+
+    def update_clause(self):
+        """SET list applied when a row already exists"""
+        assignments = [f"{col} = EXCLUDED.{col}" for col in self.update_columns]
+        # A row that shows up again in an export is no longer removed
+        assignments.append("removed_at = NULL")
+        if self.touch_updated_at:
+            assignments.append("updated_at = NOW()")
+        return ",\n            ".join(assignments)
+
+    def upsert_query(self):
+        """Row-at-a-time INSERT ... ON CONFLICT used with execute_batch"""
+        placeholders = ", ".join(["%s"] * len(self.columns))
+        return f"""
+        INSERT INTO {self.table} ({", ".join(self.columns)})
+        VALUES ({placeholders})
+        ON CONFLICT ({", ".join(self.conflict_columns)}) DO UPDATE SET
+            {self.update_clause()}
+        """
+
+    def staged_rows(self, staging_table):
+        """FROM clause pairing the first and last staged row of every natural key"""
+        keys = ", ".join(self.conflict_columns)
+        return f"""
+        WITH first_rows AS (
+            SELECT DISTINCT ON ({keys}) * FROM {staging_table} ORDER BY {keys}, _stage_ord
+        ), last_rows AS (
+            SELECT DISTINCT ON ({keys}) * FROM {staging_table} ORDER BY {keys}, _stage_ord DESC
+        )
+        SELECT {{select_list}}
+        FROM first_rows f
+        JOIN last_rows l USING ({keys})
+        LEFT JOIN {self.table} t ON {" AND ".join(f"t.{col} = l.{col}" for col in self.conflict_columns)}
+        """
+
+    def changed_condition(self):
+        """True when staged row l differs from stored row t in what an upsert would write.
+
+        Only the update columns are compared: the stored values of the other
+        columns are never overwritten, so a difference there is not a change.
+        """
+        if not self.update_columns:
+            return "t.removed_at IS NOT NULL"
+        stored = ", ".join(f"t.{col}" for col in self.update_columns)
+        staged = ", ".join(f"l.{col}" for col in self.update_columns)
+        return f"(t.removed_at IS NOT NULL OR ROW({stored}) IS DISTINCT FROM ROW({staged}))"
+
+    def merge_query(self, staging_table, only_changed=False):
+        """Set-based upsert from a staging table filled by COPY.
+
+        The row-at-a-time path inserts the first occurrence of a key and then
+        applies the update columns of every later occurrence, so a key that
+        appears more than once in a file takes its insert columns from the
+        first staged row and its update columns from the last one. With
+        only_changed, keys whose stored row already matches are left alone.
+        """
+        select_list = ", ".join(
+            f"l.{col}" if col in self.update_columns else f"f.{col}"
+            for col in self.columns
+        )
+        query = self.staged_rows(staging_table).format(select_list=select_list)
+        if only_changed:
+            query += f"WHERE t.{self.conflict_columns[0]} IS NULL OR {self.changed_condition()}\n"
+        return f"""
+        INSERT INTO {self.table} ({", ".join(self.columns)})
+        {query}
+        ON CONFLICT ({", ".join(self.conflict_columns)}) DO UPDATE SET
+            {self.update_clause()}
+        """
+
+    def delta_summary_query(self, staging_table):
+        """Count staged keys that are new, changed and unchanged against spec.table"""
+        is_new = f"t.{self.conflict_columns[0]} IS NULL"
+        return self.staged_rows(staging_table).format(select_list=f"""
+            COUNT(*) FILTER (WHERE {is_new}),
+            COUNT(*) FILTER (WHERE NOT {is_new} AND {self.changed_condition()}),
+            COUNT(*) FILTER (WHERE NOT {is_new} AND NOT {self.changed_condition()})""")
+
+    def removed_query(self, staging_table, mark=False):
+        """Count, or mark with removed_at, stored rows whose key is absent from the staging table.
+
+        Exports are per quarter, so only quarters present in the file are
+        considered; loading 2025Q2 does not retire 2025Q1.
+        """
+        missing = f"""
+            t.removed_at IS NULL
+            AND NOT EXISTS (
+                SELECT 1 FROM {staging_table} s
+                WHERE {" AND ".join(f"s.{col} = t.{col}" for col in self.conflict_columns)}
+            )"""
+        if 'submission_year_quarter' in self.columns:
+            missing += f"""
+            AND t.submission_year_quarter IN (SELECT DISTINCT submission_year_quarter FROM {staging_table})"""
+        if mark:
+            return f"UPDATE {self.table} t SET removed_at = NOW() WHERE {missing}"
+        return f"SELECT COUNT(*) FROM {self.table} t WHERE {missing}"
+
+TABLE_SPECS = {
+    'reference_codes': TableSpec(
+        table='reference_codes',
+        csv_file='SDWA_REF_CODE_VALUES.csv',
+        label='reference codes',
+        fields=[
+            Field('value_type', 'VALUE_TYPE', 'str', 40),
+            Field('value_code', 'VALUE_CODE', 'str', 40),
+            Field('value_description', 'VALUE_DESCRIPTION', 'str', 250)
+        ],
+        conflict_columns=['value_type', 'value_code'],
+        update_columns=['value_description'],
+        page_size=1000
+    ),
+    'public_water_systems': TableSpec(
+        table='public_water_systems',
+        csv_file='SDWA_PUB_WATER_SYSTEMS.csv',
+        label='public water systems',
+        fields=[
+            Field('submission_year_quarter', 'SUBMISSIONYEARQUARTER', 'str', 7),
+            Field('pwsid', 'PWSID', 'str', 9),
+            Field('pws_name', 'PWS_NAME', 'str', 100),
+            Field('primacy_agency_code', 'PRIMACY_AGENCY_CODE', 'str', 2),
+            Field('epa_region', 'EPA_REGION', 'str', 2),
+            Field('season_begin_date', 'SEASON_BEGIN_DATE', 'str', 5),
+            Field('season_end_date', 'SEASON_END_DATE', 'str', 5),
+            Field('pws_activity_code', 'PWS_ACTIVITY_CODE', 'str', 1),
+            Field('pws_deactivation_date', 'PWS_DEACTIVATION_DATE', 'date'),
+            Field('pws_type_code', 'PWS_TYPE_CODE', 'str', 6),
+            Field('dbpr_schedule_cat_code', 'DBPR_SCHEDULE_CAT_CODE', 'str', 6),
+            Field('cds_id', 'CDS_ID', 'str', 100),
+            Field('gw_sw_code', 'GW_SW_CODE', 'str', 2),
+            Field('lt2_schedule_cat_code', 'LT2_SCHEDULE_CAT_CODE', 'str', 6),
+            Field('owner_type_code', 'OWNER_TYPE_CODE', 'str', 1),
+            Field('population_served_count', 'POPULATION_SERVED_COUNT', 'int'),
+            Field('pop_cat_2_code', 'POP_CAT_2_CODE', 'str', 2),
+            Field('pop_cat_3_code', 'POP_CAT_3_CODE', 'str', 2),
+            Field('pop_cat_4_code', 'POP_CAT_4_CODE', 'str', 2),
+            Field('pop_cat_5_code', 'POP_CAT_5_CODE', 'str', 2),
+            Field('pop_cat_11_code', 'POP_CAT_11_CODE', 'str', 2),
+            Field('primacy_type', 'PRIMACY_TYPE', 'str', 20),
+            Field('primary_source_code', 'PRIMARY_SOURCE_CODE', 'str', 4),
+            Field('is_grant_eligible_ind', 'IS_GRANT_ELIGIBLE_IND', 'str', 1),
+            Field('is_wholesaler_ind', 'IS_WHOLESALER_IND', 'str', 1),
+            Field('is_school_or_daycare_ind', 'IS_SCHOOL_OR_DAYCARE_IND', 'str', 1),
+            Field('service_connections_count', 'SERVICE_CONNECTIONS_COUNT', 'int'),
+            Field('submission_status_code', 'SUBMISSION_STATUS_CODE', 'str', 1),
+            Field('org_name', 'ORG_NAME', 'str', 100),
+            Field('admin_name', 'ADMIN_NAME', 'str', 100),
+            Field('email_addr', 'EMAIL_ADDR', 'str', 100),
+            Field('phone_number', 'PHONE_NUMBER', 'str', 15),
+            Field('phone_ext_number', 'PHONE_EXT_NUMBER', 'str', 5),
+            Field('fax_number', 'FAX_NUMBER', 'str', 15),
+            Field('alt_phone_number', 'ALT_PHONE_NUMBER', 'str', 15),
+            Field('address_line1', 'ADDRESS_LINE1', 'str', 200),
+            Field('address_line2', 'ADDRESS_LINE2', 'str', 200),
+            Field('city_name', 'CITY_NAME', 'str', 40),
+            Field('zip_code', 'ZIP_CODE', 'str', 14),
+            Field('country_code', 'COUNTRY_CODE', 'str', 2),
+            Field('first_reported_date', 'FIRST_REPORTED_DATE', 'date'),
+            Field('last_reported_date', 'LAST_REPORTED_DATE', 'date'),
+            Field('state_code', 'STATE_CODE', 'str', 2),
+            Field('source_water_protection_code', 'SOURCE_WATER_PROTECTION_CODE', 'str', 2),
+            Field('source_protection_begin_date', 'SOURCE_PROTECTION_BEGIN_DATE', 'date'),
+            Field('outstanding_performer', 'OUTSTANDING_PERFORMER', 'str', 2),
+            Field('outstanding_perform_begin_date', 'OUTSTANDING_PERFORM_BEGIN_DATE', 'date'),
+            Field('reduced_rtcr_monitoring', 'REDUCED_RTCR_MONITORING', 'str', 20),
+            Field('reduced_monitoring_begin_date', 'REDUCED_MONITORING_BEGIN_DATE', 'date'),
+            Field('reduced_monitoring_end_date', 'REDUCED_MONITORING_END_DATE', 'date'),
+            Field('seasonal_startup_system', 'SEASONAL_STARTUP_SYSTEM', 'str', 40)
+        ],
+        conflict_columns=['submission_year_quarter', 'pwsid'],
+        update_columns=['pws_name', 'population_served_count'],
+        page_size=500
+    ),
+    'violations_enforcement': TableSpec(
+        table='violations_enforcement',
+        csv_file='SDWA_VIOLATIONS_ENFORCEMENT.csv',
+        label='violations and enforcement records',
+        fields=[
+            Field('submission_year_quarter', 'SUBMISSIONYEARQUARTER', 'str', 7),
+            Field('pwsid', 'PWSID', 'str', 9),
+            Field('violation_id', 'VIOLATION_ID', 'str', 20),
+            Field('facility_id', 'FACILITY_ID', 'str', 12),
+            Field('compl_per_begin_date', 'COMPL_PER_BEGIN_DATE', 'date'),
+            Field('compl_per_end_date', 'COMPL_PER_END_DATE', 'date'),
+            Field('non_compl_per_begin_date', 'NON_COMPL_PER_BEGIN_DATE', 'date'),
+            Field('non_compl_per_end_date', 'NON_COMPL_PER_END_DATE', 'date'),
+            Field('pws_deactivation_date', 'PWS_DEACTIVATION_DATE', 'date'),
+            Field('violation_code', 'VIOLATION_CODE', 'str', 4),
+            Field('violation_category_code', 'VIOLATION_CATEGORY_CODE', 'str', 5),
+            Field('is_health_based_ind', 'IS_HEALTH_BASED_IND', 'str', 1),
+            Field('contaminant_code', 'CONTAMINANT_CODE', 'str', 4),
+            Field('viol_measure', 'VIOL_MEASURE', 'float'),
+            Field('unit_of_measure', 'UNIT_OF_MEASURE', 'str', 9),
+            Field('federal_mcl', 'FEDERAL_MCL', 'str', 31),
+            Field('state_mcl', 'STATE_MCL', 'float'),
+            Field('is_major_viol_ind', 'IS_MAJOR_VIOL_IND', 'str', 1),
+            Field('severity_ind_cnt', 'SEVERITY_IND_CNT', 'int'),
+            Field('calculated_rtc_date', 'CALCULATED_RTC_DATE', 'date'),
+            Field('violation_status', 'VIOLATION_STATUS', 'str', 11),
+            Field('public_notification_tier', 'PUBLIC_NOTIFICATION_TIER', 'int'),
+            Field('calculated_pub_notif_tier', 'CALCULATED_PUB_NOTIF_TIER', 'int'),
+            Field('viol_originator_code', 'VIOL_ORIGINATOR_CODE', 'str', 4),
+            Field('sample_result_id', 'SAMPLE_RESULT_ID', 'str', 40),
+            Field('corrective_action_id', 'CORRECTIVE_ACTION_ID', 'str', 40),
+            Field('rule_code', 'RULE_CODE', 'str', 3),
+            Field('rule_group_code', 'RULE_GROUP_CODE', 'str', 3),
+            Field('rule_family_code', 'RULE_FAMILY_CODE', 'str', 3),
+            Field('viol_first_reported_date', 'VIOL_FIRST_REPORTED_DATE', 'date'),
+            Field('viol_last_reported_date', 'VIOL_LAST_REPORTED_DATE', 'date'),
+            Field('enforcement_id', 'ENFORCEMENT_ID', 'str', 20),
+            Field('enforcement_date', 'ENFORCEMENT_DATE', 'date'),
+            Field('enforcement_action_type_code', 'ENFORCEMENT_ACTION_TYPE_CODE', 'str', 4),
+            Field('enf_action_category', 'ENF_ACTION_CATEGORY', 'str', 4000),
+            Field('enf_originator_code', 'ENF_ORIGINATOR_CODE', 'str', 4),
+            Field('enf_first_reported_date', 'ENF_FIRST_REPORTED_DATE', 'date'),
+            Field('enf_last_reported_date', 'ENF_LAST_REPORTED_DATE', 'date')
+        ],
+        conflict_columns=['submission_year_quarter', 'pwsid', 'violation_id'],
+        update_columns=['violation_status'],
+        page_size=500,
+        # Skip rows with empty/null violation_id since it's required
+        required_columns=('violation_id',),
+        stop_on_error=True,
+        quarter_partitions=True
+    ),
+    'geographic_areas': TableSpec(
+        table='geographic_areas',
+        csv_file='SDWA_GEOGRAPHIC_AREAS.csv',
+        label='geographic areas',
+        fields=[
+            Field('submission_year_quarter', 'SUBMISSIONYEARQUARTER', 'str', 7),
+            Field('pwsid', 'PWSID', 'str', 9),
+            Field('geo_id', 'GEO_ID', 'str', 20),
+            Field('area_type_code', 'AREA_TYPE_CODE', 'str', 4),
+            Field('tribal_code', 'TRIBAL_CODE', 'str', 10),
+            Field('state_served', 'STATE_SERVED', 'str', 4),
+            Field('ansi_entity_code', 'ANSI_ENTITY_CODE', 'str', 4),
+            Field('zip_code_served', 'ZIP_CODE_SERVED', 'str', 5),
+            Field('city_served', 'CITY_SERVED', 'str', 40),
+            Field('county_served', 'COUNTY_SERVED', 'str', 40),
+            Field('last_reported_date', 'LAST_REPORTED_DATE', 'date')
+        ],
+        conflict_columns=['submission_year_quarter', 'pwsid', 'geo_id'],
+        update_columns=['county_served', 'city_served'],
+        touch_updated_at=False,
+        page_size=1000
+    ),
+    'facilities': TableSpec(
+        table='facilities',
+        csv_file='SDWA_FACILITIES.csv',
+        label='facilities',
+        fields=[
+            Field('submission_year_quarter', 'SUBMISSIONYEARQUARTER', 'str', 7),
+            Field('pwsid', 'PWSID', 'str', 9),
+            Field('facility_id', 'FACILITY_ID', 'str', 12),
+            Field('facility_name', 'FACILITY_NAME', 'str', 100),
+            Field('state_facility_id', 'STATE_FACILITY_ID', 'str', 40),
+            Field('facility_activity_code', 'FACILITY_ACTIVITY_CODE', 'str', 1),
+            Field('facility_deactivation_date', 'FACILITY_DEACTIVATION_DATE', 'date'),
+            Field('facility_type_code', 'FACILITY_TYPE_CODE', 'str', 4),
+            Field('submission_status_code', 'SUBMISSION_STATUS_CODE', 'str', 4),
+            Field('is_source_ind', 'IS_SOURCE_IND', 'str', 1),
+            Field('water_type_code', 'WATER_TYPE_CODE', 'str', 4),
+            Field('availability_code', 'AVAILABILITY_CODE', 'str', 4),
+            Field('seller_treatment_code', 'SELLER_TREATMENT_CODE', 'str', 4),
+            Field('seller_pwsid', 'SELLER_PWSID', 'str', 9),
+            Field('seller_pws_name', 'SELLER_PWS_NAME', 'str', 100),
+            Field('filtration_status_code', 'FILTRATION_STATUS_CODE', 'str', 4),
+            Field('is_source_treated_ind', 'IS_SOURCE_TREATED_IND', 'str', 1),
+            Field('first_reported_date', 'FIRST_REPORTED_DATE', 'date'),
+            Field('last_reported_date', 'LAST_REPORTED_DATE', 'date')
+        ],
+        conflict_columns=['submission_year_quarter', 'pwsid', 'facility_id'],
+        update_columns=[
+            'facility_name', 'state_facility_id', 'facility_activity_code', 'facility_deactivation_date',
+            'facility_type_code', 'submission_status_code', 'is_source_ind', 'water_type_code',
+            'availability_code', 'seller_treatment_code', 'seller_pwsid', 'seller_pws_name',
+            'filtration_status_code', 'is_source_treated_ind', 'first_reported_date', 'last_reported_date'
+        ],
+        required_columns=('facility_id',)
+    ),
+    'service_areas': TableSpec(
+        table='service_areas',
+        csv_file='SDWA_SERVICE_AREAS.csv',
+        label='service areas',
+        fields=[
+            Field('submission_year_quarter', 'SUBMISSIONYEARQUARTER', 'str', 7),
+            Field('pwsid', 'PWSID', 'str', 9),
+            Field('service_area_type_code', 'SERVICE_AREA_TYPE_CODE', 'str', 4),
+            Field('is_primary_service_area_code', 'IS_PRIMARY_SERVICE_AREA_CODE', 'str', 1),
+            Field('first_reported_date', 'FIRST_REPORTED_DATE', 'date'),
+            Field('last_reported_date', 'LAST_REPORTED_DATE', 'date')
+        ],
+        conflict_columns=['submission_year_quarter', 'pwsid', 'service_area_type_code'],
+        update_columns=['is_primary_service_area_code', 'first_reported_date', 'last_reported_date'],
+        touch_updated_at=False,
+        required_columns=('service_area_type_code',)
+    ),
+    'lcr_samples': TableSpec(
+        table='lcr_samples',
+        csv_file='SDWA_LCR_SAMPLES.csv',
+        label='lead and copper samples',
+        fields=[
+            Field('submission_year_quarter', 'SUBMISSIONYEARQUARTER', 'str', 7),
+            Field('pwsid', 'PWSID', 'str', 9),
+            Field('sample_id', 'SAMPLE_ID', 'str', 20),
+            Field('sampling_end_date', 'SAMPLING_END_DATE', 'date'),
+            Field('sampling_start_date', 'SAMPLING_START_DATE', 'date'),
+            Field('reconciliation_id', 'RECONCILIATION_ID', 'str', 40),
+            Field('sample_first_reported_date', 'SAMPLE_FIRST_REPORTED_DATE', 'date'),
+            Field('sample_last_reported_date', 'SAMPLE_LAST_REPORTED_DATE', 'date'),
+            Field('sar_id', 'SAR_ID', 'int'),
+            Field('contaminant_code', 'CONTAMINANT_CODE', 'str', 4),
+            Field('result_sign_code', 'RESULT_SIGN_CODE', 'str', 1),
+            Field('sample_measure', 'SAMPLE_MEASURE', 'float'),
+            Field('unit_of_measure', 'UNIT_OF_MEASURE', 'str', 4),
+            Field('sar_first_reported_date', 'SAR_FIRST_REPORTED_DATE', 'date'),
+            Field('sar_last_reported_date', 'SAR_LAST_REPORTED_DATE', 'date')
+        ],
+        conflict_columns=['submission_year_quarter', 'pwsid', 'sample_id'],
+        update_columns=[
+            'sampling_end_date', 'sampling_start_date', 'reconciliation_id',
+            'sample_first_reported_date', 'sample_last_reported_date', 'sar_id', 'contaminant_code',
+            'result_sign_code', 'sample_measure', 'unit_of_measure',
+            'sar_first_reported_date', 'sar_last_reported_date'
+        ],
+        touch_updated_at=False,
+        page_size=1000,
+        required_columns=('sample_id',)
+    ),
+    'site_visits': TableSpec(
+        table='site_visits',
+        csv_file='SDWA_SITE_VISITS.csv',
+        label='site visits',
+        fields=[
+            Field('submission_year_quarter', 'SUBMISSIONYEARQUARTER', 'str', 7),
+            Field('pwsid', 'PWSID', 'str', 9),
+            Field('visit_id', 'VISIT_ID', 'str', 20),
+            Field('visit_date', 'VISIT_DATE', 'date'),
+            Field('agency_type_code', 'AGENCY_TYPE_CODE', 'str', 2),
+            Field('visit_reason_code', 'VISIT_REASON_CODE', 'str', 4),
+            Field('management_ops_eval_code', 'MANAGEMENT_OPS_EVAL_CODE', 'str', 1),
+            Field('source_water_eval_code', 'SOURCE_WATER_EVAL_CODE', 'str', 1),
+            Field('security_eval_code', 'SECURITY_EVAL_CODE', 'str', 1),
+            Field('pumps_eval_code', 'PUMPS_EVAL_CODE', 'str', 1),
+            Field('other_eval_code', 'OTHER_EVAL_CODE', 'str', 1),
+            Field('compliance_eval_code', 'COMPLIANCE_EVAL_CODE', 'str', 1),
+            Field('data_verification_eval_code', 'DATA_VERIFICATION_EVAL_CODE', 'str', 1),
+            Field('treatment_eval_code', 'TREATMENT_EVAL_CODE', 'str', 1),
+            Field('finished_water_stor_eval_code', 'FINISHED_WATER_STOR_EVAL_CODE', 'str', 1),
+            Field('distribution_eval_code', 'DISTRIBUTION_EVAL_CODE', 'str', 1),
+            Field('financial_eval_code', 'FINANCIAL_EVAL_CODE', 'str', 1),
+            Field('visit_comments', 'VISIT_COMMENTS', 'str'),
+            Field('first_reported_date', 'FIRST_REPORTED_DATE', 'date'),
+            Field('last_reported_date', 'LAST_REPORTED_DATE', 'date')
+        ],
+        conflict_columns=['submission_year_quarter', 'pwsid', 'visit_id'],
+        update_columns=[
+            'visit_date', 'agency_type_code', 'visit_reason_code', 'management_ops_eval_code',
+            'source_water_eval_code', 'security_eval_code', 'pumps_eval_code', 'other_eval_code',
+            'compliance_eval_code', 'data_verification_eval_code', 'treatment_eval_code',
+            'finished_water_stor_eval_code', 'distribution_eval_code', 'financial_eval_code',
+            'visit_comments', 'first_reported_date', 'last_reported_date'
+        ],
+        touch_updated_at=False,
+        page_size=500,
+        required_columns=('visit_id',)
+    ),
+    'events_milestones': TableSpec(
+        table='events_milestones',
+        csv_file='SDWA_EVENTS_MILESTONES.csv',
+        label='events and milestones',
+        fields=[
+            Field('submission_year_quarter', 'SUBMISSIONYEARQUARTER', 'str', 7),
+            Field('pwsid', 'PWSID', 'str', 9),
+            Field('event_schedule_id', 'EVENT_SCHEDULE_ID', 'str', 20),
+            Field('event_end_date', 'EVENT_END_DATE', 'date'),
+            Field('event_actual_date', 'EVENT_ACTUAL_DATE', 'date'),
+            Field('event_comments_text', 'EVENT_COMMENTS_TEXT', 'str'),
+            Field('event_milestone_code', 'EVENT_MILESTONE_CODE', 'str', 4),
+            Field('event_reason_code', 'EVENT_REASON_CODE', 'str', 4),
+            Field('first_reported_date', 'FIRST_REPORTED_DATE', 'date'),
+            Field('last_reported_date', 'LAST_REPORTED_DATE', 'date')
+        ],
+        conflict_columns=['submission_year_quarter', 'pwsid', 'event_schedule_id'],
+        update_columns=[
+            'event_end_date', 'event_actual_date', 'event_comments_text', 'event_milestone_code',
+            'event_reason_code', 'first_reported_date', 'last_reported_date'
+        ],
+        touch_updated_at=False,
+        required_columns=('event_schedule_id',)
+    ),
+    'pn_violation_assoc': TableSpec(
+        table='pn_violation_assoc',
+        csv_file='SDWA_PN_VIOLATION_ASSOC.csv',
+        label='public notice violation links',
+        fields=[
+            Field('submission_year_quarter', 'SUBMISSIONYEARQUARTER', 'str', 7),
+            Field('pwsid', 'PWSID', 'str', 9),
+            Field('pn_violation_id', 'PN_VIOLATION_ID', 'str', 20),
+            Field('related_violation_id', 'RELATED_VIOLATION_ID', 'str', 20),
+            Field('non_compl_per_begin_date', 'NON_COMPL_PER_BEGIN_DATE', 'date'),
+            Field('non_compl_per_end_date', 'NON_COMPL_PER_END_DATE', 'date'),
+            Field('violation_code', 'VIOLATION_CODE', 'str', 4),
+            # The export names this CONTAMINANT_CODE; the schema follows the data dictionary
+            Field('contamination_code', 'CONTAMINANT_CODE', 'str', 4),
+            Field('first_reported_date', 'FIRST_REPORTED_DATE', 'date'),
+            Field('last_reported_date', 'LAST_REPORTED_DATE', 'date')
+        ],
+        conflict_columns=['submission_year_quarter', 'pwsid', 'pn_violation_id', 'related_violation_id'],
+        update_columns=[
+            'non_compl_per_begin_date', 'non_compl_per_end_date', 'violation_code',
+            'contamination_code', 'first_reported_date', 'last_reported_date'
+        ],
+        touch_updated_at=False,
+        required_columns=('pn_violation_id', 'related_violation_id')
+    ),
+}
+
+# Load order: reference codes first, then systems, then everything keyed to a system
+IMPORT_ORDER = [
+    'reference_codes',
+    'public_water_systems',
+    'geographic_areas',
+    'violations_enforcement',
+    'facilities',
+    'service_areas',
+    'lcr_samples',
+    'site_visits',
+    'events_milestones',
+    'pn_violation_assoc',
+]
+
+# Run after an import that loaded any of their source tables, in this order
+DERIVED_REFRESHES = [
+    DerivedRefresh('system_violation_summary', 'refresh_system_violation_summary',
+                   frozenset({'public_water_systems', 'violations_enforcement', 'geographic_areas'})),
+    # Reads system_violation_summary for health status
+    DerivedRefresh('system_search', 'refresh_system_search',
+                   frozenset({'public_water_systems', 'violations_enforcement', 'geographic_areas'})),
+    # Applies only the systems and violations changed since each quarter's last sync
+    DerivedRefresh('map locations', 'sync_map_locations',
+                   frozenset({'public_water_systems', 'violations_enforcement'})),
+]
+
+# --tables choices mapped to TABLE_SPECS keys
+TABLE_CHOICES = {
+    'ref': 'reference_codes',
+    'systems': 'public_water_systems',
+    'geo': 'geographic_areas',
+    'violations': 'violations_enforcement',
+    'facilities': 'facilities',
+    'service-areas': 'service_areas',
+    'lcr': 'lcr_samples',
+    'visits': 'site_visits',
+    'events': 'events_milestones',
+    'pn': 'pn_violation_assoc',
 }
 
+def import_table_worker(data_dir, options, table):
+    """Import one table on its own connection; runs inside a worker process.
+
+    Returns the seconds taken and the worker's phase metrics for the parent to merge.
+    Raises if the table fails, so the parent skips the tables that depend on it.
+    """
+    importer = WaterDataImporter(data_dir, **options)
+    started = time.perf_counter()
+    try:
+        importer.connect()
+        importer.import_table(replace(TABLE_SPECS[table], stop_on_error=True))
+    except Exception as e:
+        # psycopg2 errors do not always survive pickling back to the parent
+        raise RuntimeError(f"{type(e).__name__}: {e}") from None
+    finally:
+        importer.disconnect()
+    return time.perf_counter() - started, importer.metrics.snapshot()
+
 class WaterDataImporter:
-    def __init__(self, data_dir='../data'):
+    def __init__(self, data_dir='../data', bulk=False, chunk_size=DEFAULT_CHUNK_SIZE, jobs=1,
+                 parser='scalar', parse_only=False, delta=False, mark_removed=False,
+                 resume=False, quarantine_dir='quarantine'):
         self.data_dir = Path(data_dir)
+        self.bulk = bulk
+        self.delta = delta
+        self.mark_removed = mark_removed
+        # Delta loads compare against the table from a staging table, as bulk loads merge from one
+        self.staged = bulk or delta
+        self.resume = resume
+        self.quarantine_dir = Path(quarantine_dir)
+        self.chunk_size = chunk_size
+        self.jobs = jobs
+        self.parser = parser
+        self.parse_only = parse_only
         self.conn = None
         self.cursor = None
+        # Quarters whose partitions are known to exist, per table
+        self.partitioned_quarters: Dict[str, Set[str]] = {}
+        # Time per phase and table: read, clean, execute, merge (staged loads), commit; then analyze, refresh
+        self.metrics = PipelineMetrics('import')
         
     def connect(self):
         """Connect to the Supabase database"""
         try:
-            self.conn = psycopg2.connect(**DB_CONFIG)
+            self.conn = connect()
             self.conn.autocommit = False
             self.cursor = self.conn.cursor()
             print("✅ Connected to Supabase database")
@@ -92,322 +614,512 @@ class WaterDataImporter:
             cleaned = cleaned[:max_length]
         return cleaned
 
-    def import_reference_codes(self):
-        """Import reference codes from SDWA_REF_CODE_VALUES.csv"""
-        file_path = self.data_dir / 'SDWA_REF_CODE_VALUES.csv'
+    def staging_table_name(self, spec):
+        """Name of the temporary COPY target for a table"""
+        return f"_stage_{spec.table}"
+
+    def create_staging_table(self, spec):
+        """Create an empty temporary table with the import columns of spec.table"""
+        staging = self.staging_table_name(spec)
+        self.cursor.execute(f"DROP TABLE IF EXISTS {staging}")
+        self.cursor.execute(f"""
+            CREATE TEMP TABLE {staging} ON COMMIT DROP AS
+            SELECT {", ".join(spec.columns)} FROM {spec.table} WITH NO DATA
+        """)
+        # Remember file order so duplicate keys resolve like the row-at-a-time path
+        self.cursor.execute(f"ALTER TABLE {staging} ADD COLUMN _stage_ord BIGSERIAL")
+        return staging
+
+    def copy_to_staging(self, spec, rows):
+        """Stream cleaned row tuples into the staging table with COPY FROM STDIN"""
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for row in rows:
+            # clean_string never returns '', so an empty unquoted field is always NULL
+            writer.writerow(['' if value is None else value for value in row])
+        buffer.seek(0)
+        self.cursor.copy_expert(
+            f"COPY {self.staging_table_name(spec)} ({', '.join(spec.columns)}) FROM STDIN WITH (FORMAT csv)",
+            buffer
+        )
+
+    def merge_staging(self, spec):
+        """Upsert everything in the staging table into spec.table in one statement"""
+        self.cursor.execute(spec.merge_query(self.staging_table_name(spec)))
+        return self.cursor.rowcount
+
+    def merge_staging_delta(self, spec):
+        """Write only new and changed keys from the staging table; print the delta summary"""
+        staging = self.staging_table_name(spec)
+        # Temp tables are never auto-analyzed; the anti-joins below need row estimates
+        self.cursor.execute(f"ANALYZE {staging}")
+        self.cursor.execute(spec.delta_summary_query(staging))
+        inserted, updated, unchanged = self.cursor.fetchone()
         
-        if not file_path.exists():
-            print(f"⚠️  Reference codes file not found: {file_path}")
-            return
-            
-        print(f"📥 Importing reference codes from {file_path}")
+        self.cursor.execute(spec.merge_query(staging, only_changed=True))
         
-        with open(file_path, 'r', encoding='utf-8') as f:
-            reader = csv.DictReader(f)
-            batch_data = []
-            
-            for row in reader:
-                batch_data.append((
-                    self.clean_string(row['VALUE_TYPE'], 40),
-                    self.clean_string(row['VALUE_CODE'], 40),
-                    self.clean_string(row['VALUE_DESCRIPTION'], 250)
-                ))
-                
-        query = """
-        INSERT INTO reference_codes (value_type, value_code, value_description)
-        VALUES (%s, %s, %s)
-        ON CONFLICT (value_type, value_code) DO UPDATE SET
-            value_description = EXCLUDED.value_description,
-            updated_at = NOW()
+        self.cursor.execute(spec.removed_query(staging, mark=self.mark_removed))
+        removed = self.cursor.rowcount if self.mark_removed else self.cursor.fetchone()[0]
+        
+        removed_note = "marked removed" if self.mark_removed else "missing from file"
+        print(f"🔁 {spec.table}: {inserted} inserted, {updated} updated, {unchanged} unchanged, "
+              f"{removed} {removed_note}")
+        return inserted + updated
+
+    def write_chunk(self, spec, chunk):
+        """Write one chunk of cleaned rows using the configured load mode.
+
+        Batch inserts are committed per chunk by import_table together with
+        the checkpoint; in bulk mode the chunk is only staged and import_table
+        commits after the final merge. Returns the number of quarantined rows.
         """
+        if spec.quarter_partitions:
+            self.create_partitions(spec, chunk)
+        if self.staged:
+            self.copy_to_staging(spec, chunk)
+            return 0
         
         try:
-            execute_batch(self.cursor, query, batch_data, page_size=1000)
-            self.conn.commit()
-            print(f"✅ Imported {len(batch_data)} reference codes")
-        except Exception as e:
+            execute_batch(self.cursor, self.upsert_statement(spec), chunk, page_size=spec.page_size)
+            return 0
+        except psycopg2.Error as e:
+            # Earlier chunks are already committed, so only this one is lost
             self.conn.rollback()
-            print(f"❌ Error importing reference codes: {e}")
+            print(f"⚠️  Batch failed ({str(e).strip().splitlines()[0]}); retrying {len(chunk)} rows one at a time")
+            return self.write_rows_individually(spec, chunk)
 
-    def import_public_water_systems(self):
-        """Import public water systems from SDWA_PUB_WATER_SYSTEMS.csv"""
-        file_path = self.data_dir / 'SDWA_PUB_WATER_SYSTEMS.csv'
+    def create_partitions(self, spec, chunk):
+        """Create the partitions of quarters first seen in this chunk with create_quarter_partitions()"""
+        position = spec.columns.index('submission_year_quarter')
+        known = self.partitioned_quarters.setdefault(spec.table, set())
+        quarters = {row[position] for row in chunk if row[position] is not None} - known
+        for quarter in sorted(quarters):
+            self.cursor.execute("SELECT create_quarter_partitions(%s)", (quarter,))
+            if self.cursor.fetchone()[0]:
+                print(f"🧩 Created partitions for {quarter}")
+        if quarters and not self.staged:
+            # Committed on their own, so a failed batch retried row by row still finds them
+            self.conn.commit()
+        known |= quarters
+
+    def upsert_statement(self, spec):
+        """The upsert of spec.table, prepared once per connection so each batch skips parsing and planning"""
+        return self.conn.prepare(f"import_upsert_{spec.table}", spec.upsert_query())
+
+    def write_rows_individually(self, spec, chunk):
+        """Upsert rows one by one under a savepoint, quarantining the ones the database rejects"""
+        query = self.upsert_statement(spec)
+        rejected = 0
+        for row in chunk:
+            self.cursor.execute("SAVEPOINT import_row")
+            try:
+                self.cursor.execute(query, row)
+            except psycopg2.Error as e:
+                self.cursor.execute("ROLLBACK TO SAVEPOINT import_row")
+                self.quarantine_row(spec, row, e)
+                rejected += 1
+            else:
+                self.cursor.execute("RELEASE SAVEPOINT import_row")
+        return rejected
+
+    def quarantine_path(self, spec):
+        """CSV file collecting rows of spec.table that the database rejected"""
+        return self.quarantine_dir / f"{spec.table}.csv"
+
+    def quarantine_row(self, spec, row, error):
+        """Append a rejected row and the database error to the quarantine file"""
+        path = self.quarantine_path(spec)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        is_new = not path.exists()
+        with open(path, 'a', encoding='utf-8', newline='') as f:
+            writer = csv.writer(f)
+            if is_new:
+                writer.writerow(spec.columns + ['error'])
+            writer.writerow(['' if value is None else value for value in row] +
+                            [str(error).strip().splitlines()[0]])
+
+    def file_fingerprint(self, file_path):
+        """Size and modification time identifying the CSV file a checkpoint belongs to"""
+        stat = file_path.stat()
+        return stat.st_size, stat.st_mtime_ns
+
+    def load_checkpoint(self, spec, file_path):
+        """Return (rows_committed, completed) recorded for this exact file, or (0, False)"""
+        file_size, file_mtime_ns = self.file_fingerprint(file_path)
+        self.cursor.execute("""
+            SELECT rows_committed, completed FROM import_checkpoints
+            WHERE table_name = %s AND csv_file = %s AND file_size = %s AND file_mtime_ns = %s
+        """, (spec.table, spec.csv_file, file_size, file_mtime_ns))
+        row = self.cursor.fetchone()
+        self.conn.commit()
+        return (row[0], row[1]) if row else (0, False)
+
+    def save_checkpoint(self, spec, file_path, rows_committed, completed=False):
+        """Record how many CSV rows are committed; runs inside the transaction it describes"""
+        file_size, file_mtime_ns = self.file_fingerprint(file_path)
+        self.cursor.execute("""
+            INSERT INTO import_checkpoints
+                (table_name, csv_file, file_size, file_mtime_ns, rows_committed, completed)
+            VALUES (%s, %s, %s, %s, %s, %s)
+            ON CONFLICT (table_name) DO UPDATE SET
+                csv_file = EXCLUDED.csv_file,
+                file_size = EXCLUDED.file_size,
+                file_mtime_ns = EXCLUDED.file_mtime_ns,
+                rows_committed = EXCLUDED.rows_committed,
+                completed = EXCLUDED.completed,
+                updated_at = NOW()
+        """, (spec.table, spec.csv_file, file_size, file_mtime_ns, rows_committed, completed))
+
+    def count_rows(self, spec, stats, written, rejected, skip):
+        """Add the rows of a finished table import to the run's counters"""
+        self.metrics.count('rows_read', stats['read'] - skip, table=spec.table)
+        self.metrics.count('rows_skipped', stats['skipped'], table=spec.table)
+        self.metrics.count('rows_written', written, table=spec.table)
+        self.metrics.count('rows_rejected', rejected, table=spec.table)
+
+    def report_rate(self, label, count, started):
+        """Print throughput for a finished table import"""
+        elapsed = time.perf_counter() - started
+        rate = count / elapsed if elapsed > 0 else 0
+        if self.parse_only:
+            mode = f"{self.parser} parse only"
+        elif self.delta:
+            mode = "delta"
+        else:
+            mode = "bulk COPY" if self.bulk else "batch insert"
+        print(f"⏱️  {label}: {count} rows in {elapsed:.2f}s ({rate:,.0f} rows/sec, {mode})")
+
+    def read_rows(self, file_path, skip=0):
+        """Yield raw CSV rows one at a time, after the first skip records"""
+        with open(file_path, 'r', encoding='utf-8') as f:
+            yield from islice(csv.DictReader(f), skip, None)
+
+    def field_cleaners(self):
+        """Scalar cleaning helper for each Field.kind, all called as clean(value, max_length)"""
+        return {
+            'str': self.clean_string,
+            'date': lambda value, max_length: self.safe_date(value),
+            'int': lambda value, max_length: self.safe_int(value),
+            'float': lambda value, max_length: self.safe_float(value),
+        }
+
+    def clean_rows(self, spec, rows, stats):
+        """Yield cleaned row tuples, dropping rows missing a required column"""
+        cleaners = self.field_cleaners()
+        plan = [(field.source, cleaners[field.kind], field.max_length) for field in spec.fields]
+        required = [spec.columns.index(column) for column in spec.required_columns]
         
-        if not file_path.exists():
-            print(f"⚠️  Water systems file not found: {file_path}")
-            return
-            
-        print(f"📥 Importing public water systems from {file_path}")
+        for row in rows:
+            stats['read'] += 1
+            cleaned = tuple(clean(row[source], max_length) for source, clean, max_length in plan)
+            if any(cleaned[i] is None for i in required):
+                stats['skipped'] += 1
+                continue
+            yield cleaned
+
+    def clean_chunks_scalar(self, spec, file_path, stats, skip=0):
+        """Yield cleaned chunks, reading a chunk of raw rows and then cleaning it a row at a time"""
+        raw_chunks = self.chunked(self.read_rows(file_path, skip=skip))
+        while True:
+            with self.metrics.timer('read', table=spec.table):
+                raw_rows = next(raw_chunks, None)
+            if raw_rows is None:
+                return
+            with self.metrics.timer('clean', table=spec.table):
+                chunk = list(self.clean_rows(spec, raw_rows, stats))
+            if chunk:
+                yield chunk
+
+    def clean_chunks_columnar(self, spec, file_path, stats, skip=0):
+        """Yield cleaned chunks, coercing one column of a chunk at a time.
+
+        Dates, integers and floats repeat heavily within an SDWIS export, so each
+        distinct raw value in a column is parsed once by the scalar helper and the
+        result reused for every row holding it. Values and NULL handling are
+        therefore identical to clean_rows; only the number of strptime/int/float
+        calls changes.
+        """
+        cleaners = self.field_cleaners()
+        required = [spec.columns.index(column) for column in spec.required_columns]
         
         with open(file_path, 'r', encoding='utf-8') as f:
-            reader = csv.DictReader(f)
-            batch_data = []
+            reader = csv.reader(f)
+            header = next(reader, [])
+            positions = [header.index(field.source) for field in spec.fields]
+            width = len(header)
+            # Same treatment as csv.DictReader: blank lines are not records
+            records = (row for row in reader if row)
+            for _ in islice(records, skip):
+                pass
             
-            for row in reader:
-                batch_data.append((
-                    self.clean_string(row['SUBMISSIONYEARQUARTER'], 7),
-                    self.clean_string(row['PWSID'], 9),
-                    self.clean_string(row['PWS_NAME'], 100),
-                    self.clean_string(row['PRIMACY_AGENCY_CODE'], 2),
-                    self.clean_string(row['EPA_REGION'], 2),
-                    self.clean_string(row['SEASON_BEGIN_DATE'], 5),
-                    self.clean_string(row['SEASON_END_DATE'], 5),
-                    self.clean_string(row['PWS_ACTIVITY_CODE'], 1),
-                    self.safe_date(row['PWS_DEACTIVATION_DATE']),
-                    self.clean_string(row['PWS_TYPE_CODE'], 6),
-                    self.clean_string(row['DBPR_SCHEDULE_CAT_CODE'], 6),
-                    self.clean_string(row['CDS_ID'], 100),
-                    self.clean_string(row['GW_SW_CODE'], 2),
-                    self.clean_string(row['LT2_SCHEDULE_CAT_CODE'], 6),
-                    self.clean_string(row['OWNER_TYPE_CODE'], 1),
-                    self.safe_int(row['POPULATION_SERVED_COUNT']),
-                    self.clean_string(row['POP_CAT_2_CODE'], 2),
-                    self.clean_string(row['POP_CAT_3_CODE'], 2),
-                    self.clean_string(row['POP_CAT_4_CODE'], 2),
-                    self.clean_string(row['POP_CAT_5_CODE'], 2),
-                    self.clean_string(row['POP_CAT_11_CODE'], 2),
-                    self.clean_string(row['PRIMACY_TYPE'], 20),
-                    self.clean_string(row['PRIMARY_SOURCE_CODE'], 4),
-                    self.clean_string(row['IS_GRANT_ELIGIBLE_IND'], 1),
-                    self.clean_string(row['IS_WHOLESALER_IND'], 1),
-                    self.clean_string(row['IS_SCHOOL_OR_DAYCARE_IND'], 1),
-                    self.safe_int(row['SERVICE_CONNECTIONS_COUNT']),
-                    self.clean_string(row['SUBMISSION_STATUS_CODE'], 1),
-                    self.clean_string(row['ORG_NAME'], 100),
-                    self.clean_string(row['ADMIN_NAME'], 100),
-                    self.clean_string(row['EMAIL_ADDR'], 100),
-                    self.clean_string(row['PHONE_NUMBER'], 15),
-                    self.clean_string(row['PHONE_EXT_NUMBER'], 5),
-                    self.clean_string(row['FAX_NUMBER'], 15),
-                    self.clean_string(row['ALT_PHONE_NUMBER'], 15),
-                    self.clean_string(row['ADDRESS_LINE1'], 200),
-                    self.clean_string(row['ADDRESS_LINE2'], 200),
-                    self.clean_string(row['CITY_NAME'], 40),
-                    self.clean_string(row['ZIP_CODE'], 14),
-                    self.clean_string(row['COUNTRY_CODE'], 2),
-                    self.safe_date(row['FIRST_REPORTED_DATE']),
-                    self.safe_date(row['LAST_REPORTED_DATE']),
-                    self.clean_string(row['STATE_CODE'], 2),
-                    self.clean_string(row['SOURCE_WATER_PROTECTION_CODE'], 2),
-                    self.safe_date(row['SOURCE_PROTECTION_BEGIN_DATE']),
-                    self.clean_string(row['OUTSTANDING_PERFORMER'], 2),
-                    self.safe_date(row['OUTSTANDING_PERFORM_BEGIN_DATE']),
-                    self.clean_string(row['REDUCED_RTCR_MONITORING'], 20),
-                    self.safe_date(row['REDUCED_MONITORING_BEGIN_DATE']),
-                    self.safe_date(row['REDUCED_MONITORING_END_DATE']),
-                    self.clean_string(row['SEASONAL_STARTUP_SYSTEM'], 40)
-                ))
+            while True:
+                raw_rows = []
+                with self.metrics.timer('read', table=spec.table):
+                    for row in islice(records, self.chunk_size):
+                        # Short rows read as NULL for the missing trailing fields
+                        if len(row) < width:
+                            row = row + [None] * (width - len(row))
+                        raw_rows.append(row)
+                if not raw_rows:
+                    return
+                stats['read'] += len(raw_rows)
                 
-        query = """
-        INSERT INTO public_water_systems (
-            submission_year_quarter, pwsid, pws_name, primacy_agency_code, epa_region,
-            season_begin_date, season_end_date, pws_activity_code, pws_deactivation_date,
-            pws_type_code, dbpr_schedule_cat_code, cds_id, gw_sw_code, lt2_schedule_cat_code,
-            owner_type_code, population_served_count, pop_cat_2_code, pop_cat_3_code,
-            pop_cat_4_code, pop_cat_5_code, pop_cat_11_code, primacy_type, primary_source_code,
-            is_grant_eligible_ind, is_wholesaler_ind, is_school_or_daycare_ind,
-            service_connections_count, submission_status_code, org_name, admin_name,
-            email_addr, phone_number, phone_ext_number, fax_number, alt_phone_number,
-            address_line1, address_line2, city_name, zip_code, country_code,
-            first_reported_date, last_reported_date, state_code, source_water_protection_code,
-            source_protection_begin_date, outstanding_performer, outstanding_perform_begin_date,
-            reduced_rtcr_monitoring, reduced_monitoring_begin_date, reduced_monitoring_end_date,
-            seasonal_startup_system
-        ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-        ON CONFLICT (submission_year_quarter, pwsid) DO UPDATE SET
-            pws_name = EXCLUDED.pws_name,
-            population_served_count = EXCLUDED.population_served_count,
-            updated_at = NOW()
-        """
-        
-        try:
-            execute_batch(self.cursor, query, batch_data, page_size=500)
-            self.conn.commit()
-            print(f"✅ Imported {len(batch_data)} public water systems")
-        except Exception as e:
-            self.conn.rollback()
-            print(f"❌ Error importing public water systems: {e}")
+                with self.metrics.timer('clean', table=spec.table):
+                    columns = []
+                    for field, position in zip(spec.fields, positions):
+                        clean = cleaners[field.kind]
+                        raw = [row[position] for row in raw_rows]
+                        if field.kind == 'str':
+                            columns.append([clean(value, field.max_length) for value in raw])
+                        else:
+                            parsed = {value: clean(value, field.max_length) for value in set(raw)}
+                            columns.append([parsed[value] for value in raw])
+                    
+                    chunk = list(zip(*columns))
+                    if required:
+                        kept = [row for row in chunk if all(row[i] is not None for i in required)]
+                        stats['skipped'] += len(chunk) - len(kept)
+                        chunk = kept
+                if chunk:
+                    yield chunk
 
-    def import_violations_enforcement(self):
-        """Import violations from SDWA_VIOLATIONS_ENFORCEMENT.csv"""
-        file_path = self.data_dir / 'SDWA_VIOLATIONS_ENFORCEMENT.csv'
+    def chunked(self, rows: Iterable[tuple]) -> Iterator[List[tuple]]:
+        """Group a row stream into lists of at most chunk_size rows"""
+        rows = iter(rows)
+        while True:
+            chunk = list(islice(rows, self.chunk_size))
+            if not chunk:
+                return
+            yield chunk
+
+    def import_table(self, spec):
+        """Stream one CSV file into its table: read, clean, write fixed-size chunks"""
+        file_path = self.data_dir / spec.csv_file
         
         if not file_path.exists():
-            print(f"⚠️  Violations file not found: {file_path}")
+            print(f"⚠️  {spec.label.capitalize()} file not found: {file_path}")
             return
             
-        print(f"📥 Importing violations and enforcement from {file_path}")
+        print(f"📥 Importing {spec.label} from {file_path}")
+        started = time.perf_counter()
         
-        with open(file_path, 'r', encoding='utf-8') as f:
-            reader = csv.DictReader(f)
-            batch_data = []
-            count = 0
-            skipped = 0
-            
-            for row in reader:
-                count += 1
-                
-                # Skip rows with empty/null violation_id since it's required
-                violation_id = self.clean_string(row['VIOLATION_ID'], 20)
-                if violation_id is None or violation_id == '':
-                    skipped += 1
-                    continue
-                    
-                batch_data.append((
-                    self.clean_string(row['SUBMISSIONYEARQUARTER'], 7),
-                    self.clean_string(row['PWSID'], 9),
-                    violation_id,
-                    self.clean_string(row['FACILITY_ID'], 12),
-                    self.safe_date(row['COMPL_PER_BEGIN_DATE']),
-                    self.safe_date(row['COMPL_PER_END_DATE']),
-                    self.safe_date(row['NON_COMPL_PER_BEGIN_DATE']),
-                    self.safe_date(row['NON_COMPL_PER_END_DATE']),
-                    self.safe_date(row['PWS_DEACTIVATION_DATE']),
-                    self.clean_string(row['VIOLATION_CODE'], 4),
-                    self.clean_string(row['VIOLATION_CATEGORY_CODE'], 5),
-                    self.clean_string(row['IS_HEALTH_BASED_IND'], 1),
-                    self.clean_string(row['CONTAMINANT_CODE'], 4),
-                    self.safe_float(row['VIOL_MEASURE']),
-                    self.clean_string(row['UNIT_OF_MEASURE'], 9),
-                    self.clean_string(row['FEDERAL_MCL'], 31),
-                    self.safe_float(row['STATE_MCL']),
-                    self.clean_string(row['IS_MAJOR_VIOL_IND'], 1),
-                    self.safe_int(row['SEVERITY_IND_CNT']),
-                    self.safe_date(row['CALCULATED_RTC_DATE']),
-                    self.clean_string(row['VIOLATION_STATUS'], 11),
-                    self.safe_int(row['PUBLIC_NOTIFICATION_TIER']),
-                    self.safe_int(row['CALCULATED_PUB_NOTIF_TIER']),
-                    self.clean_string(row['VIOL_ORIGINATOR_CODE'], 4),
-                    self.clean_string(row['SAMPLE_RESULT_ID'], 40),
-                    self.clean_string(row['CORRECTIVE_ACTION_ID'], 40),
-                    self.clean_string(row['RULE_CODE'], 3),
-                    self.clean_string(row['RULE_GROUP_CODE'], 3),
-                    self.clean_string(row['RULE_FAMILY_CODE'], 3),
-                    self.safe_date(row['VIOL_FIRST_REPORTED_DATE']),
-                    self.safe_date(row['VIOL_LAST_REPORTED_DATE']),
-                    self.clean_string(row['ENFORCEMENT_ID'], 20),
-                    self.safe_date(row['ENFORCEMENT_DATE']),
-                    self.clean_string(row['ENFORCEMENT_ACTION_TYPE_CODE'], 4),
-                    self.clean_string(row['ENF_ACTION_CATEGORY'], 4000),
-                    self.clean_string(row['ENF_ORIGINATOR_CODE'], 4),
-                    self.safe_date(row['ENF_FIRST_REPORTED_DATE']),
-                    self.safe_date(row['ENF_LAST_REPORTED_DATE'])
-                ))
-                
-                # Process in batches to avoid memory issues
-                if len(batch_data) >= 1000:
-                    self.process_violations_batch(batch_data)
-                    batch_data = []
-                    print(f"  Processed {count} violations...")
-                    
-            # Process remaining batch
-            if batch_data:
-                self.process_violations_batch(batch_data)
-                
-            print(f"✅ Imported {count - skipped} violations and enforcement records")
-            if skipped > 0:
-                print(f"⚠️  Skipped {skipped} rows with missing violation_id")
-
-    def process_violations_batch(self, batch_data):
-        """Process a batch of violations data"""
-        query = """
-        INSERT INTO violations_enforcement (
-            submission_year_quarter, pwsid, violation_id, facility_id,
-            compl_per_begin_date, compl_per_end_date, non_compl_per_begin_date,
-            non_compl_per_end_date, pws_deactivation_date, violation_code,
-            violation_category_code, is_health_based_ind, contaminant_code,
-            viol_measure, unit_of_measure, federal_mcl, state_mcl,
-            is_major_viol_ind, severity_ind_cnt, calculated_rtc_date,
-            violation_status, public_notification_tier, calculated_pub_notif_tier,
-            viol_originator_code, sample_result_id, corrective_action_id,
-            rule_code, rule_group_code, rule_family_code,
-            viol_first_reported_date, viol_last_reported_date,
-            enforcement_id, enforcement_date, enforcement_action_type_code,
-            enf_action_category, enf_originator_code,
-            enf_first_reported_date, enf_last_reported_date
-        ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-        ON CONFLICT (submission_year_quarter, pwsid, violation_id) DO UPDATE SET
-            violation_status = EXCLUDED.violation_status,
-            updated_at = NOW()
-        """
+        skip = 0
+        if self.resume and not self.parse_only:
+            skip, completed = self.load_checkpoint(spec, file_path)
+            if completed:
+                print(f"⏭️  {spec.label.capitalize()} already imported from this file ({skip} rows)")
+                return 0
+            if self.staged:
+                # A staged load commits all or nothing, so a partial checkpoint cannot be resumed from
+                skip = 0
+            elif skip:
+                print(f"↪️  Resuming {spec.label} after {skip} committed rows")
+        
+        stats = {'read': skip, 'skipped': 0}
+        written = 0
+        rejected = 0
+        
+        if self.parser == 'columnar':
+            chunks = self.clean_chunks_columnar(spec, file_path, stats, skip=skip)
+        else:
+            chunks = self.clean_chunks_scalar(spec, file_path, stats, skip=skip)
+        
+        if self.parse_only:
+            # Read and clean without touching the database, to compare parsers
+            for chunk in chunks:
+                written += len(chunk)
+            self.count_rows(spec, stats, written, rejected, skip)
+            self.report_rate(spec.table, written, started)
+            return written
         
         try:
-            execute_batch(self.cursor, query, batch_data, page_size=500)
-            self.conn.commit()
+            if self.staged:
+                # All chunks go into one staging table and are merged once at the end
+                self.create_staging_table(spec)
+            
+            for chunk in chunks:
+                with self.metrics.timer('execute', table=spec.table):
+                    chunk_rejected = self.write_chunk(spec, chunk)
+                    rejected += chunk_rejected
+                    written += len(chunk) - chunk_rejected
+                    if not self.staged:
+                        # The checkpoint commits with the rows it covers, so a crash never loses or repeats a chunk
+                        self.save_checkpoint(spec, file_path, stats['read'])
+                if not self.staged:
+                    with self.metrics.timer('commit', table=spec.table):
+                        self.conn.commit()
+                print(f"  Processed {stats['read']} {spec.label}...")
+            
+            if self.staged:
+                with self.metrics.timer('merge', table=spec.table):
+                    if self.delta:
+                        self.merge_staging_delta(spec)
+                    else:
+                        self.merge_staging(spec)
+            with self.metrics.timer('execute', table=spec.table):
+                self.save_checkpoint(spec, file_path, stats['read'], completed=True)
+            with self.metrics.timer('commit', table=spec.table):
+                self.conn.commit()
         except Exception as e:
             self.conn.rollback()
-            print(f"❌ Error processing violations batch: {e}")
-            raise
+            # A staged load created its partitions in the transaction just rolled back
+            self.partitioned_quarters.pop(spec.table, None)
+            print(f"❌ Error importing {spec.label}: {e}")
+            self.metrics.count('tables_failed', table=spec.table)
+            if spec.stop_on_error:
+                raise
+            return
+        
+        self.count_rows(spec, stats, written, rejected, skip)
+        print(f"✅ Imported {written} {spec.label}")
+        if stats['skipped'] > 0:
+            print(f"⚠️  Skipped {stats['skipped']} rows with missing {', '.join(spec.required_columns)}")
+        if rejected > 0:
+            print(f"⚠️  Quarantined {rejected} rejected rows to {self.quarantine_path(spec)}")
+        self.report_rate(spec.table, written, started)
+        return written
+
+    def import_reference_codes(self):
+        """Import reference codes from SDWA_REF_CODE_VALUES.csv"""
+        self.import_table(TABLE_SPECS['reference_codes'])
+
+    def import_public_water_systems(self):
+        """Import public water systems from SDWA_PUB_WATER_SYSTEMS.csv"""
+        self.import_table(TABLE_SPECS['public_water_systems'])
+
+    def import_violations_enforcement(self):
+        """Import violations from SDWA_VIOLATIONS_ENFORCEMENT.csv"""
+        self.import_table(TABLE_SPECS['violations_enforcement'])
 
     def import_geographic_areas(self):
         """Import geographic areas from SDWA_GEOGRAPHIC_AREAS.csv"""
-        file_path = self.data_dir / 'SDWA_GEOGRAPHIC_AREAS.csv'
-        
-        if not file_path.exists():
-            print(f"⚠️  Geographic areas file not found: {file_path}")
-            return
-            
-        print(f"📥 Importing geographic areas from {file_path}")
-        
-        with open(file_path, 'r', encoding='utf-8') as f:
-            reader = csv.DictReader(f)
-            batch_data = []
-            
-            for row in reader:
-                batch_data.append((
-                    self.clean_string(row['SUBMISSIONYEARQUARTER'], 7),
-                    self.clean_string(row['PWSID'], 9),
-                    self.clean_string(row['GEO_ID'], 20),
-                    self.clean_string(row['AREA_TYPE_CODE'], 4),
-                    self.clean_string(row['TRIBAL_CODE'], 10),
-                    self.clean_string(row['STATE_SERVED'], 4),
-                    self.clean_string(row['ANSI_ENTITY_CODE'], 4),
-                    self.clean_string(row['ZIP_CODE_SERVED'], 5),
-                    self.clean_string(row['CITY_SERVED'], 40),
-                    self.clean_string(row['COUNTY_SERVED'], 40),
-                    self.safe_date(row['LAST_REPORTED_DATE'])
-                ))
-                
-        query = """
-        INSERT INTO geographic_areas (
-            submission_year_quarter, pwsid, geo_id, area_type_code,
-            tribal_code, state_served, ansi_entity_code, zip_code_served,
-            city_served, county_served, last_reported_date
-        ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-        ON CONFLICT (submission_year_quarter, pwsid, geo_id) DO UPDATE SET
-            county_served = EXCLUDED.county_served,
-            city_served = EXCLUDED.city_served
-        """
-        
+        self.import_table(TABLE_SPECS['geographic_areas'])
+
+    def import_tables(self, tables):
+        """Import the given TABLE_SPECS keys in dependency order"""
+        started = time.perf_counter()
+        if self.jobs > 1:
+            self.import_tables_parallel(tables)
+        else:
+            for table in IMPORT_ORDER:
+                if table in tables:
+                    self.import_table(TABLE_SPECS[table])
+        print(f"⏱️  Wall clock: {time.perf_counter() - started:.2f}s ({self.jobs} job(s))")
+        self.analyze_tables(tables)
+        self.refresh_derived(tables)
+
+    def analyze_tables(self, tables):
+        """Update planner statistics for the imported tables before anything queries them"""
+        print("📊 Running database analysis for optimization...")
         try:
-            execute_batch(self.cursor, query, batch_data, page_size=1000)
+            for table in IMPORT_ORDER:
+                if table in tables:
+                    with self.metrics.timer('analyze', table=table):
+                        self.cursor.execute(f"ANALYZE {table};")
             self.conn.commit()
-            print(f"✅ Imported {len(batch_data)} geographic areas")
+            print("✅ Database analysis complete")
         except Exception as e:
             self.conn.rollback()
-            print(f"❌ Error importing geographic areas: {e}")
+            print(f"⚠️  Warning: Could not run analysis: {e}")
+
+    def refresh_derived(self, tables):
+        """Rebuild summaries and other data derived from the imported tables"""
+        for refresh in DERIVED_REFRESHES:
+            if not refresh.sources & set(tables):
+                continue
+            started = time.perf_counter()
+            try:
+                with self.metrics.timer('refresh', derived=refresh.name):
+                    self.cursor.execute(f"SELECT {refresh.function}()")
+                    self.conn.commit()
+                print(f"🔄 Refreshed {refresh.name} in {time.perf_counter() - started:.2f}s")
+            except Exception as e:
+                self.conn.rollback()
+                print(f"⚠️  Warning: Could not refresh {refresh.name}: {e}")
+
+    def worker_options(self):
+        """Constructor arguments a worker process needs to import one table like this importer"""
+        return {
+            'bulk': self.bulk,
+            'chunk_size': self.chunk_size,
+            'parser': self.parser,
+            'delta': self.delta,
+            'mark_removed': self.mark_removed,
+            'resume': self.resume,
+            'quarantine_dir': str(self.quarantine_dir),
+        }
+
+    def load_dependency_graph(self, tables):
+        """Map each table to the tables it references, read from the schema's foreign keys"""
+        self.cursor.execute("""
+            SELECT DISTINCT con.conrelid::regclass::text, con.confrelid::regclass::text
+            FROM pg_constraint con
+            WHERE con.contype = 'f'
+              AND con.conrelid::regclass::text = ANY(%s)
+              AND con.confrelid::regclass::text = ANY(%s)
+              AND con.conrelid <> con.confrelid
+        """, (list(tables), list(tables)))
+        graph = {table: set() for table in tables}
+        for table, referenced in self.cursor.fetchall():
+            graph[table].add(referenced)
+        self.conn.commit()
+        return graph
+
+    def import_tables_parallel(self, tables):
+        """Import tables across worker processes as soon as their parents are loaded.
+
+        With the SDWA schema this loads reference_codes and public_water_systems
+        first, then fans every table keyed to a system out across the pool.
+        """
+        tables = [table for table in IMPORT_ORDER if table in tables]
+        graph = self.load_dependency_graph(tables)
+        pending = dict(graph)
+        done, failed, skipped, timings = set(), set(), set(), {}
+        running = {}
+        
+        print(f"🔀 Importing {len(tables)} tables with {self.jobs} worker processes")
+        with ProcessPoolExecutor(max_workers=self.jobs) as pool:
+            while pending or running:
+                for table in list(pending):
+                    parents = pending[table]
+                    if parents & failed:
+                        print(f"⏭️  Skipping {table}: depends on failed {', '.join(sorted(parents & failed))}")
+                        failed.add(table)
+                        skipped.add(table)
+                        del pending[table]
+                    elif parents <= done:
+                        future = pool.submit(import_table_worker, str(self.data_dir), self.worker_options(), table)
+                        running[future] = table
+                        del pending[table]
+                
+                if not running:
+                    break
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    table = running.pop(future)
+                    try:
+                        timings[table], metrics = future.result()
+                        self.metrics.merge(metrics)
+                        done.add(table)
+                    except BaseException as e:
+                        print(f"❌ {table} failed in worker: {e}")
+                        self.metrics.count('tables_failed', table=table)
+                        failed.add(table)
+        
+        print("📋 Per-table timings:")
+        for table in tables:
+            if table in timings:
+                print(f"   • {table}: {timings[table]:.2f}s")
+            else:
+                print(f"   • {table}: {'skipped' if table in skipped else 'failed'}")
+        print(f"   Sum of table times: {sum(timings.values()):.2f}s")
 
     def import_all_data(self):
         """Import all CSV files in the correct order"""
         print("🚀 Starting Georgia Water Quality data import...")
         
-        # Import in order of dependencies
-        self.import_reference_codes()
-        self.import_public_water_systems()
-        self.import_geographic_areas()
-        self.import_violations_enforcement()
-        
-        # Run analysis for query optimization
-        print("📊 Running database analysis for optimization...")
-        try:
-            self.cursor.execute("ANALYZE public_water_systems;")
-            self.cursor.execute("ANALYZE violations_enforcement;")
-            self.cursor.execute("ANALYZE geographic_areas;")
-            self.cursor.execute("ANALYZE reference_codes;")
-            self.conn.commit()
-            print("✅ Database analysis complete")
-        except Exception as e:
-            print(f"⚠️  Warning: Could not run analysis: {e}")
+        # Import in order of dependencies (analyzes and refreshes derived data too)
+        self.import_tables(IMPORT_ORDER)
         
         print("\n🎉 Data import complete!")
         print("\nNext steps:")
@@ -418,34 +1130,69 @@ class WaterDataImporter:
 def main():
     parser = argparse.ArgumentParser(description='Import Georgia water quality CSV data into Supabase')
     parser.add_argument('--data-dir', default='../data', help='Directory containing CSV files')
-    parser.add_argument('--tables', nargs='+', choices=['ref', 'systems', 'violations', 'geo', 'all'], 
+    parser.add_argument('--tables', nargs='+', choices=list(TABLE_CHOICES) + ['all'], 
                        default=['all'], help='Which tables to import')
+    parser.add_argument('--bulk', action='store_true',
+                       help='Load through a COPY staging table with one set-based upsert per table')
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE,
+                       help='Rows cleaned and written per chunk (bounds peak memory)')
+    parser.add_argument('--jobs', type=int, default=1,
+                       help='Worker processes; tables whose parents are loaded import concurrently')
+    parser.add_argument('--parser', choices=['scalar', 'columnar'], default='scalar',
+                       help='Row-at-a-time cleaning, or column-at-a-time with each distinct value parsed once')
+    parser.add_argument('--parse-only', action='store_true',
+                       help='Read and clean the CSV files without writing, reporting rows/sec per table')
+    parser.add_argument('--delta', action='store_true',
+                       help='Only write rows that are new or changed; print inserted/updated/unchanged/removed')
+    parser.add_argument('--mark-removed', action='store_true',
+                       help='With --delta, set removed_at on rows of the loaded quarters missing from the file')
+    parser.add_argument('--resume', action='store_true',
+                       help='Continue each table after the rows its last run committed (see import_checkpoints)')
+    parser.add_argument('--quarantine-dir', default='quarantine',
+                       help='Directory for CSV files of rows the database rejected')
+    parser.add_argument('--metrics-json', metavar='PATH',
+                       help='Write the time per phase and table and the row counts as JSON')
+    parser.add_argument('--prometheus-textfile', metavar='PATH',
+                       help='Write the same metrics for the node_exporter textfile collector (*.prom)')
+    parser.add_argument('--profile', action='store_true',
+                       help='Run under cProfile and print the top functions by own time (not --jobs workers)')
+    parser.add_argument('--profile-top', type=int, default=25, help='Functions listed by --profile')
     
     args = parser.parse_args()
+    if args.mark_removed and not args.delta:
+        parser.error('--mark-removed requires --delta')
     
-    importer = WaterDataImporter(args.data_dir)
+    importer = WaterDataImporter(args.data_dir, bulk=args.bulk, chunk_size=args.chunk_size, jobs=args.jobs,
+                                 parser=args.parser, parse_only=args.parse_only,
+                                 delta=args.delta, mark_removed=args.mark_removed,
+                                 resume=args.resume, quarantine_dir=args.quarantine_dir)
     
-    try:
+    def run():
+        if args.parse_only:
+            tables = IMPORT_ORDER if 'all' in args.tables else [TABLE_CHOICES[choice] for choice in args.tables]
+            for table in tables:
+                importer.import_table(TABLE_SPECS[table])
+            return
+        
         importer.connect()
         
         if 'all' in args.tables:
             importer.import_all_data()
         else:
-            if 'ref' in args.tables:
-                importer.import_reference_codes()
-            if 'systems' in args.tables:
-                importer.import_public_water_systems()
-            if 'geo' in args.tables:
-                importer.import_geographic_areas()
-            if 'violations' in args.tables:
-                importer.import_violations_enforcement()
-                
+            importer.import_tables([TABLE_CHOICES[choice] for choice in args.tables])
+    
+    try:
+        if args.profile:
+            profiled(run, args.profile_top)
+        else:
+            run()
     except KeyboardInterrupt:
         print("\n⏹️  Import interrupted by user")
     except Exception as e:
         print(f"❌ Import failed: {e}")
     finally:
         importer.disconnect()
+        importer.metrics.report(args.metrics_json, args.prometheus_textfile)
 
 if __name__ == '__main__':
     main() 
\ No newline at end of file
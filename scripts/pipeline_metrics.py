@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+"""
+Pipeline Phase Metrics
+
+Timers and counters for the phases of a run of import_data.py or
+generate_ai_explanations.py (reading, cleaning, writing and committing rows;
+building prompts, waiting for the API, parsing and saving explanations). A
+summary is printed at the end of the run and can be written as JSON and as a
+Prometheus textfile for the node_exporter textfile collector. profiled() runs a
+function under cProfile and prints its hot spots.
+
+Phase times are exclusive: a timer started inside another one pauses the outer
+phase, so the phases of one thread add up to no more than its wall time. Phases
+timed on several threads at once (API calls with --concurrency) can add up to
+more than the wall time of the run.
+
+Usage:
+    python pipeline_metrics.py --show ../bench/import-metrics.json
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import cProfile
+import pstats
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, Optional, Tuple, TypeVar
+
+T = TypeVar('T')
+
+# Metric name and label values, e.g. ('read', (('table', 'violations_enforcement'),))
+MetricKey = Tuple[str, Tuple[Tuple[str, str], ...]]
+
+def metric_key(name: str, labels: Dict[str, Optional[str]]) -> MetricKey:
+    return name, tuple(sorted((label, str(value)) for label, value in labels.items() if value is not None))
+
+class PipelineMetrics:
+    """Thread-safe phase timers and counters for one run of a pipeline"""
+
+    def __init__(self, pipeline: str):
+        self.pipeline = pipeline
+        self.started_at = datetime.now(timezone.utc)
+        self.started = time.perf_counter()
+        # (seconds, calls) per phase and labels
+        self.phases: Dict[MetricKey, Tuple[float, int]] = {}
+        self.counters: Dict[MetricKey, float] = {}
+        self.lock = threading.Lock()
+        self.local = threading.local()
+
+    def add_time(self, phase: str, seconds: float, calls: int = 1, **labels):
+        key = metric_key(phase, labels)
+        with self.lock:
+            total, count = self.phases.get(key, (0.0, 0))
+            self.phases[key] = (total + seconds, count + calls)
+
+    def count(self, name: str, amount: float = 1, **labels):
+        key = metric_key(name, labels)
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    @contextmanager
+    def timer(self, phase: str, **labels):
+        """Time the block as phase, excluding the time of timers nested in it"""
+        stack = self.local.__dict__.setdefault('stack', [])
+        stack.append(0.0)
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            nested = stack.pop()
+            if stack:
+                stack[-1] += elapsed
+            self.add_time(phase, elapsed - nested, **labels)
+
+    def timed(self, phase: str, items: Iterable[T], **labels) -> Iterator[T]:
+        """Yield from items, timing the work of producing each one as phase"""
+        items = iter(items)
+        while True:
+            with self.timer(phase, **labels):
+                item = next(items, StopIteration)
+            if item is StopIteration:
+                return
+            yield item
+
+    def wall_seconds(self) -> float:
+        return time.perf_counter() - self.started
+
+    def snapshot(self) -> Dict:
+        """Phases and counters as JSON-ready lists; merge() accepts the result"""
+        with self.lock:
+            phases = [{'phase': name, 'labels': dict(labels), 'seconds': round(seconds, 6), 'calls': calls}
+                      for (name, labels), (seconds, calls) in sorted(self.phases.items())]
+            counters = [{'counter': name, 'labels': dict(labels), 'value': value}
+                        for (name, labels), value in sorted(self.counters.items())]
+        return {'phases': phases, 'counters': counters}
+
+    def merge(self, snapshot: Dict):
+        """Add the phases and counters of another process's snapshot, e.g. an import worker's"""
+        for phase in snapshot['phases']:
+            self.add_time(phase['phase'], phase['seconds'], phase['calls'], **phase['labels'])
+        for counter in snapshot['counters']:
+            self.count(counter['counter'], counter['value'], **counter['labels'])
+
+    def phase_totals(self) -> Dict[str, Tuple[float, int]]:
+        """(seconds, calls) per phase, summed over labels"""
+        totals: Dict[str, Tuple[float, int]] = {}
+        with self.lock:
+            for (name, _), (seconds, calls) in self.phases.items():
+                total, count = totals.get(name, (0.0, 0))
+                totals[name] = (total + seconds, count + calls)
+        return totals
+
+    def counter_totals(self) -> Dict[str, float]:
+        totals: Dict[str, float] = {}
+        with self.lock:
+            for (name, _), value in self.counters.items():
+                totals[name] = totals.get(name, 0) + value
+        return totals
+
+    def summary(self) -> Dict:
+        wall = self.wall_seconds()
+        return {
+            'pipeline': self.pipeline,
+            'started_at': self.started_at.isoformat(timespec='seconds'),
+            'wall_seconds': round(wall, 3),
+            'phase_totals': {name: {'seconds': round(seconds, 3), 'calls': calls,
+                              'share_of_wall': round(seconds / wall, 4) if wall > 0 else None}
+                       for name, (seconds, calls) in sorted(self.phase_totals().items())},
+            'counter_totals': self.counter_totals(),
+            **self.snapshot(),
+        }
+
+    def print_summary(self):
+        wall = self.wall_seconds()
+        totals = sorted(self.phase_totals().items(), key=lambda item: item[1][0], reverse=True)
+        print(f"\n⏱️  {self.pipeline} phases ({wall:.2f}s wall clock):")
+        for name, (seconds, calls) in totals:
+            share = f"{seconds / wall:6.1%}" if wall > 0 else ""
+            print(f"   • {name.ljust(16)}{seconds:10.2f}s {share}  {calls:,} calls")
+        accounted = sum(seconds for _, (seconds, _) in totals)
+        if wall > accounted:
+            print(f"   • {'(untimed)'.ljust(16)}{wall - accounted:10.2f}s {(wall - accounted) / wall:6.1%}")
+        for name, value in sorted(self.counter_totals().items()):
+            print(f"   # {name}: {value:,.0f}")
+
+    def write_json(self, path: str):
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.summary(), f, indent=2)
+            f.write('\n')
+        print(f"💾 Wrote metrics to {path}")
+
+    def prometheus_text(self) -> str:
+        """Exposition format: one gauge family for phase seconds, one for calls, one per counter"""
+        prefix = f"water_{self.pipeline}"
+
+        def sample(name: str, labels: Tuple[Tuple[str, str], ...], value: float) -> str:
+            escaped = ','.join(f'{label}="{value_escape(text)}"' for label, text in labels)
+            # repr keeps every digit of large counts, where :g would round them
+            return f"{name}{{{escaped}}} {float(value)!r}" if escaped else f"{name} {float(value)!r}"
+
+        def value_escape(text: str) -> str:
+            return text.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+        snapshot = self.snapshot()
+        lines = [
+            f"# HELP {prefix}_last_run_timestamp_seconds Start of the last run, in seconds since the epoch",
+            f"# TYPE {prefix}_last_run_timestamp_seconds gauge",
+            f"{prefix}_last_run_timestamp_seconds {self.started_at.timestamp():.0f}",
+            f"# HELP {prefix}_wall_seconds Wall time of the last run",
+            f"# TYPE {prefix}_wall_seconds gauge",
+            f"{prefix}_wall_seconds {self.wall_seconds():.3f}",
+            f"# HELP {prefix}_phase_seconds Time spent in each phase during the last run",
+            f"# TYPE {prefix}_phase_seconds gauge",
+        ]
+        for phase in snapshot['phases']:
+            labels = (('phase', phase['phase']),) + tuple(sorted(phase['labels'].items()))
+            lines.append(sample(f"{prefix}_phase_seconds", labels, phase['seconds']))
+        lines += [
+            f"# HELP {prefix}_phase_calls Times each phase was entered during the last run",
+            f"# TYPE {prefix}_phase_calls gauge",
+        ]
+        for phase in snapshot['phases']:
+            labels = (('phase', phase['phase']),) + tuple(sorted(phase['labels'].items()))
+            lines.append(sample(f"{prefix}_phase_calls", labels, phase['calls']))
+        families: Dict[str, list] = {}
+        for counter in snapshot['counters']:
+            families.setdefault(counter['counter'], []).append(counter)
+        for name, counters in families.items():
+            lines += [f"# HELP {prefix}_{name} Total {name.replace('_', ' ')} during the last run",
+                      f"# TYPE {prefix}_{name} gauge"]
+            for counter in counters:
+                lines.append(sample(f"{prefix}_{name}", tuple(sorted(counter['labels'].items())), counter['value']))
+        return '\n'.join(lines) + '\n'
+
+    def write_prometheus(self, path: str):
+        """Write the textfile atomically, so the collector never reads a partial file"""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temporary = path.with_name(f".{path.name}.{os.getpid()}")
+        with open(temporary, 'w', encoding='utf-8') as f:
+            f.write(self.prometheus_text())
+        os.replace(temporary, path)
+        print(f"💾 Wrote Prometheus metrics to {path}")
+
+    def report(self, json_path: Optional[str] = None, prometheus_path: Optional[str] = None):
+        """Print the summary and write the requested files; a failed write never fails the run"""
+        self.print_summary()
+        for write, path in ((self.write_json, json_path), (self.write_prometheus, prometheus_path)):
+            if not path:
+                continue
+            try:
+                write(path)
+            except OSError as e:
+                print(f"⚠️  Warning: Could not write metrics to {path}: {e}")
+
+def profiled(run: Callable[[], T], top: int = 25) -> T:
+    """Call run() under cProfile and print the functions with the most time of their own"""
+    profiler = cProfile.Profile()
+    try:
+        return profiler.runcall(run)
+    finally:
+        print(f"\n🧪 Top {top} functions by own time:")
+        stats = pstats.Stats(profiler, stream=sys.stdout)
+        stats.sort_stats(pstats.SortKey.TIME).print_stats(top)
+
+def main():
+    parser = argparse.ArgumentParser(description='Print the phase summary of a metrics JSON file')
+    parser.add_argument('--show', required=True, metavar='METRICS.json',
+                        help='File written by --metrics-json of import_data.py or generate_ai_explanations.py')
+    parser.add_argument('--by-label', action='store_true', help='List every phase per table or other label')
+
+    args = parser.parse_args()
+    with open(args.show, encoding='utf-8') as f:
+        summary = json.load(f)
+
+    wall = summary['wall_seconds']
+    print(f"⏱️  {summary['pipeline']} run of {summary['started_at']} ({wall:.2f}s wall clock):")
+    rows = summary['phases'] if args.by_label else [
+        {'phase': name, 'labels': {}, **total} for name, total in summary['phase_totals'].items()]
+    for row in sorted(rows, key=lambda row: row['seconds'], reverse=True):
+        labels = ', '.join(f"{label}={value}" for label, value in row['labels'].items())
+        name = f"{row['phase']} ({labels})" if labels else row['phase']
+        share = f"{row['seconds'] / wall:6.1%}" if wall > 0 else ""
+        print(f"   • {name.ljust(48)}{row['seconds']:10.2f}s {share}  {row['calls']:,} calls")
+    for name, value in sorted(summary['counter_totals'].items()):
+        print(f"   # {name}: {value:,.0f}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+Violation Severity Scoring
+
+Python side of the data-driven severity score. The weights live in the
+severity_scoring_rules and severity_risk_levels tables; violation_severity_scores()
+applies them in SQL and SeverityScorer applies them to whole batches in Python, a
+column at a time. generate_ai_explanations.py scores its candidates with this module.
+
+Usage:
+    python severity_scoring.py --check     # score every violation both ways and compare
+    python severity_scoring.py --rescore   # apply the current rules to explanations and map markers
+"""
+
+import re
+import sys
+import argparse
+import time
+from bisect import bisect_left
+from decimal import Decimal
+from typing import Dict, List, Optional, Sequence, Tuple
+from psycopg2.extras import RealDictCursor
+from db import connect, stream
+
+MIN_SCORE = 1
+MAX_SCORE = 10
+
+EXACT_FACTORS = ('contaminant', 'status', 'health_based', 'school', 'notification_tier')
+BAND_FACTORS = ('population', 'mcl_ratio')
+
+# federal_mcl is free text; only plain decimals count (same pattern as violation_severity_scores())
+MCL_PATTERN = re.compile(r'^[0-9]*\.?[0-9]+$')
+
+def parse_mcl(value: Optional[str]) -> Optional[Decimal]:
+    """federal_mcl as a number, or None when it is not a plain decimal"""
+    if value is None:
+        return None
+    value = value.strip(' ')
+    return Decimal(value) if MCL_PATTERN.match(value) else None
+
+class SeverityScorer:
+    """Severity scores from severity_scoring_rules, computed for a batch of violations at once"""
+
+    def __init__(self, rules: Sequence[Dict], risk_levels: Sequence[Dict]):
+        self.base = sum(rule['points'] for rule in rules if rule['factor'] == 'base')
+        self.exact: Dict[str, Dict[str, int]] = {
+            factor: {rule['match_value']: rule['points'] for rule in rules if rule['factor'] == factor}
+            for factor in EXACT_FACTORS
+        }
+        self.bands: Dict[str, Tuple[List[Decimal], List[int]]] = {}
+        for factor in BAND_FACTORS:
+            bands = sorted((Decimal(rule['min_value']), rule['points']) for rule in rules if rule['factor'] == factor)
+            self.bands[factor] = ([threshold for threshold, _ in bands], [points for _, points in bands])
+        # Highest threshold first, so the first level a score reaches is its level
+        self.risk_levels = sorted(risk_levels, key=lambda level: level['min_score'], reverse=True)
+
+    @classmethod
+    def load(cls, conn) -> 'SeverityScorer':
+        """Read the scoring rules and risk levels"""
+        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+            cur.execute("SELECT factor, match_value, min_value, points FROM severity_scoring_rules")
+            rules = cur.fetchall()
+            cur.execute("SELECT min_score, health_risk_level FROM severity_risk_levels")
+            risk_levels = cur.fetchall()
+        return cls(rules, risk_levels)
+
+    def match(self, factor: str, values: Sequence[Optional[str]]) -> List[int]:
+        """Points of the exact-match rule for each value"""
+        points = self.exact[factor]
+        return [points.get(value, 0) for value in values]
+
+    def band(self, factor: str, values: Sequence) -> List[int]:
+        """Points of the highest band each value exceeds"""
+        thresholds, points = self.bands[factor]
+        result = []
+        for value in values:
+            # bisect_left counts the thresholds strictly below value
+            index = bisect_left(thresholds, value) if value is not None else 0
+            result.append(points[index - 1] if index else 0)
+        return result
+
+    def mcl_bands(self, viol_measure: Sequence, federal_mcl: Sequence[Optional[str]]) -> List[int]:
+        """Points of the highest MCL multiple each measurement exceeds"""
+        thresholds, points = self.bands['mcl_ratio']
+        result = []
+        for measure, mcl in zip(viol_measure, map(parse_mcl, federal_mcl)):
+            earned = 0
+            if measure is not None and mcl is not None and mcl > 0:
+                # Compare measure > mcl * threshold exactly as SQL does; a float ratio can round across a band edge
+                measure = Decimal(str(measure))
+                for threshold, threshold_points in zip(reversed(thresholds), reversed(points)):
+                    if measure > mcl * threshold:
+                        earned = threshold_points
+                        break
+            result.append(earned)
+        return result
+
+    def score_columns(self, contaminant_code: Sequence[Optional[str]], violation_status: Sequence[Optional[str]],
+                      is_health_based_ind: Sequence[Optional[str]], population_served: Sequence[int],
+                      is_school_or_daycare: Sequence[bool], public_notification_tier: Sequence[Optional[int]],
+                      viol_measure: Sequence, federal_mcl: Sequence[Optional[str]]) -> List[int]:
+        """Severity score for each position of the given columns"""
+        factors = [
+            self.match('contaminant', contaminant_code),
+            self.match('status', violation_status),
+            self.match('health_based', is_health_based_ind),
+            self.match('school', ['Y' if school else 'N' for school in is_school_or_daycare]),
+            self.match('notification_tier', [None if tier is None else str(tier) for tier in public_notification_tier]),
+            self.band('population', population_served),
+            self.mcl_bands(viol_measure, federal_mcl),
+        ]
+        return [min(max(self.base + sum(points), MIN_SCORE), MAX_SCORE) for points in zip(*factors)]
+
+    def score_rows(self, rows: Sequence) -> List[int]:
+        """Severity score for each row; rows are mappings or objects with the violation_severity_facts fields"""
+        def column(name):
+            if rows and isinstance(rows[0], dict):
+                return [row[name] for row in rows]
+            return [getattr(row, name) for row in rows]
+        return self.score_columns(
+            column('contaminant_code'), column('violation_status'), column('is_health_based_ind'),
+            column('population_served'), column('is_school_or_daycare'), column('public_notification_tier'),
+            column('viol_measure'), column('federal_mcl'))
+
+    def risk_level(self, score: int) -> Optional[Dict]:
+        """The severity_risk_levels row a score falls in"""
+        for level in self.risk_levels:
+            if score >= level['min_score']:
+                return level
+        return None
+
+def check(conn, batch_size: int = 10000) -> bool:
+    """Score every violation in Python and in SQL; report any that differ"""
+    scorer = SeverityScorer.load(conn)
+
+    started = time.monotonic()
+    with conn.cursor(cursor_factory=RealDictCursor) as cur:
+        cur.execute("SELECT COUNT(*) AS scored FROM violation_severity_scores()")
+        total = cur.fetchone()['scored']
+    sql_seconds = time.monotonic() - started
+
+    checked = 0
+    python_seconds = 0.0
+    mismatches = []
+    batches = stream(conn, """
+        SELECT f.*, s.severity_score, s.health_risk_level
+        FROM violation_severity_facts f
+        JOIN violation_severity_scores() s USING (submission_year_quarter, pwsid, violation_id)
+    """, batch_size=batch_size, name='severity_check', cursor_factory=RealDictCursor)
+    for rows in batches:
+        started = time.monotonic()
+        scores = scorer.score_rows(rows)
+        levels = [scorer.risk_level(score)['health_risk_level'] for score in scores]
+        python_seconds += time.monotonic() - started
+        checked += len(rows)
+        for row, score, level in zip(rows, scores, levels):
+            if (score, level) != (row['severity_score'], row['health_risk_level']):
+                mismatches.append((row, score, level))
+
+    print(f"Scored {total} violations in SQL in {sql_seconds:.2f}s and {checked} in Python in {python_seconds:.2f}s")
+    for row, score, level in mismatches[:20]:
+        print(f"❌ {row['submission_year_quarter']} {row['pwsid']} {row['violation_id']}: "
+              f"SQL {row['severity_score']} {row['health_risk_level']}, Python {score} {level}")
+    if mismatches:
+        print(f"❌ {len(mismatches)} violations scored differently")
+    else:
+        print("✅ Python and SQL scores are identical")
+    return not mismatches
+
+def rescore(conn):
+    """Apply the current rules to current explanations and violation_locations"""
+    started = time.monotonic()
+    with conn.cursor(cursor_factory=RealDictCursor) as cur:
+        cur.execute("SELECT * FROM rescore_violations()")
+        result = cur.fetchone()
+    conn.commit()
+    print(f"✅ Rescored in {time.monotonic() - started:.2f}s: {result['explanations_updated']} explanations "
+          f"and {result['locations_updated']} map markers changed")
+
+def main():
+    parser = argparse.ArgumentParser(description="Check or apply the violation severity scoring rules")
+    action = parser.add_mutually_exclusive_group(required=True)
+    action.add_argument('--check', action='store_true',
+                        help='Score every violation in Python and SQL and exit non-zero if any differ')
+    action.add_argument('--rescore', action='store_true',
+                        help='Update current explanations and map markers from the scoring rules')
+
+    args = parser.parse_args()
+
+    conn = connect()
+    try:
+        if args.check:
+            sys.exit(0 if check(conn) else 1)
+        rescore(conn)
+    finally:
+        conn.close()
+
+if __name__ == '__main__':
+    main()
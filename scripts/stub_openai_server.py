@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+Stub OpenAI Chat Completions Server
+
+Stands in for the OpenAI API so generate_ai_explanations.py can be run offline to
+measure throughput and exercise rate limiting and backoff. It answers
+POST /v1/chat/completions with a canned explanation after a simulated latency, and
+can enforce a requests-per-minute limit (429 with Retry-After) and inject 5xx errors.
+With --answer-batch it instead answers a Batch API request file offline, writing a
+results file for generate_ai_explanations.py --batch-import.
+
+Usage:
+    python stub_openai_server.py [--port 8089] [--latency 0.8] [--rpm 300] [--error-rate 0.05]
+    OPENAI_API_KEY=stub python generate_ai_explanations.py --api-base http://localhost:8089/v1 --concurrency 16
+    python stub_openai_server.py --answer-batch requests.jsonl --output results.jsonl [--error-rate 0.05]
+"""
+
+import argparse
+import json
+import random
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+CANNED_EXPLANATION = {
+    "explanation_text": "Testing found this contaminant above the federal limit in the water system. The system is required to notify customers and correct the problem.",
+    "health_impact": "Long-term exposure above the limit can increase the risk of health problems.",
+    "recommended_actions": "Follow notices from your water system and consider a certified filter.",
+    "timeline_context": "The violation is being tracked until the system returns to compliance.",
+    "vulnerable_groups": "Infants, pregnant women, the elderly and people with weakened immune systems.",
+    "contaminant_explanation": "A substance that can enter drinking water from natural deposits or human activity."
+}
+
+def completion_body(request):
+    """Chat completion response for a request body, carrying the canned explanation"""
+    prompt = ''.join(message.get('content', '') for message in request.get('messages', []))
+    content = json.dumps(CANNED_EXPLANATION)
+    return {
+        'id': f"chatcmpl-stub-{time.time_ns()}",
+        'object': 'chat.completion',
+        'created': int(time.time()),
+        'model': request.get('model', 'gpt-4o-mini'),
+        'choices': [{
+            'index': 0,
+            'message': {'role': 'assistant', 'content': content},
+            'finish_reason': 'stop'
+        }],
+        'usage': {
+            'prompt_tokens': len(prompt) // 4,
+            'completion_tokens': len(content) // 4,
+            'total_tokens': (len(prompt) + len(content)) // 4
+        }
+    }
+
+def answer_batch(requests_path, output_path, error_rate):
+    """Write a Batch API results line for every request line"""
+    counts = {'ok': 0, 'server_error': 0}
+    with open(requests_path, 'r', encoding='utf-8') as requests, open(output_path, 'w', encoding='utf-8') as output:
+        for line in requests:
+            if not line.strip():
+                continue
+            request = json.loads(line)
+            if random.random() < error_rate:
+                counts['server_error'] += 1
+                response = {'status_code': 500, 'body': {'error': {'message': 'Stub server error', 'type': 'server_error'}}}
+            else:
+                counts['ok'] += 1
+                response = {'status_code': 200, 'body': completion_body(request['body'])}
+            response['request_id'] = f"req-stub-{time.time_ns()}"
+            output.write(json.dumps({
+                'id': f"batch_req_stub_{time.time_ns()}",
+                'custom_id': request['custom_id'],
+                'response': response,
+                'error': None
+            }) + '\n')
+    print(f"📦 Answered {sum(counts.values())} batch requests into {output_path}: {counts}")
+
+class StubState:
+    """Counters and the sliding request window shared by all handler threads"""
+
+    def __init__(self, rpm, error_rate, latency):
+        self.rpm = rpm
+        self.error_rate = error_rate
+        self.latency = latency
+        self.window = deque()
+        self.lock = threading.Lock()
+        self.counts = {'ok': 0, 'rate_limited': 0, 'server_error': 0}
+
+    def admit(self):
+        """Return seconds until a request slot frees up, or 0 if this request is admitted"""
+        if not self.rpm:
+            return 0
+        with self.lock:
+            now = time.monotonic()
+            while self.window and now - self.window[0] >= 60:
+                self.window.popleft()
+            if len(self.window) >= self.rpm:
+                return 60 - (now - self.window[0])
+            self.window.append(now)
+            return 0
+
+    def count(self, outcome):
+        with self.lock:
+            self.counts[outcome] += 1
+            total = sum(self.counts.values())
+        if total % 100 == 0:
+            print(f"📊 {total} requests: {self.counts}")
+
+class StubHandler(BaseHTTPRequestHandler):
+    state = None
+
+    def send_json(self, status, body, headers=None):
+        payload = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_POST(self):
+        if not self.path.rstrip('/').endswith('/chat/completions'):
+            self.send_json(404, {'error': {'message': f'Unknown path {self.path}'}})
+            return
+
+        request = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+
+        retry_after = self.state.admit()
+        if retry_after:
+            self.state.count('rate_limited')
+            self.send_json(429, {'error': {'message': 'Rate limit reached for requests', 'type': 'requests'}},
+                           {'Retry-After': f"{retry_after:.2f}"})
+            return
+
+        time.sleep(random.uniform(0.5, 1.5) * self.state.latency)
+
+        if random.random() < self.state.error_rate:
+            self.state.count('server_error')
+            self.send_json(random.choice([500, 502, 503]), {'error': {'message': 'Stub server error', 'type': 'server_error'}})
+            return
+
+        self.state.count('ok')
+        self.send_json(200, completion_body(request))
+
+    def log_message(self, format, *args):
+        # Per-request access logs would drown out the periodic summary
+        pass
+
+def main():
+    parser = argparse.ArgumentParser(description='Local stand-in for the OpenAI chat completions API')
+    parser.add_argument('--port', type=int, default=8089, help='Port to listen on')
+    parser.add_argument('--latency', type=float, default=0.8, help='Mean response time in seconds')
+    parser.add_argument('--rpm', type=int, default=0, help='Requests per minute before answering 429 (0 = unlimited)')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Fraction of requests answered with a 5xx')
+    parser.add_argument('--answer-batch', metavar='REQUESTS.jsonl', help='Answer a Batch API request file and exit')
+    parser.add_argument('--output', default='results.jsonl', help='Results file written by --answer-batch')
+
+    args = parser.parse_args()
+
+    if args.answer_batch:
+        answer_batch(args.answer_batch, args.output, args.error_rate)
+        return
+
+    StubHandler.state = StubState(args.rpm, args.error_rate, args.latency)
+    server = ThreadingHTTPServer(('127.0.0.1', args.port), StubHandler)
+    print(f"🧪 Stub OpenAI API on http://127.0.0.1:{args.port}/v1 "
+          f"(latency {args.latency}s, rpm {args.rpm or 'unlimited'}, error rate {args.error_rate:.0%})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(f"📊 Final: {StubHandler.state.counts}")
+        server.server_close()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,41 @@
+-- Natural keys for the SDWA tables loaded by scripts/import_data.py
+-- Lets a re-import upsert these tables instead of failing or duplicating rows
+
+-- ============================================================================
+-- PUBLIC NOTICE VIOLATION ASSOCIATIONS
+-- ============================================================================
+
+-- One public notice can cover several violations, so the association is keyed
+-- by both IDs (the original key kept only one related violation per notice)
+ALTER TABLE pn_violation_assoc
+    DROP CONSTRAINT IF EXISTS pn_violation_assoc_submission_year_quarter_pwsid_pn_violati_key;
+
+ALTER TABLE pn_violation_assoc ALTER COLUMN related_violation_id SET NOT NULL;
+
+ALTER TABLE pn_violation_assoc
+    ADD CONSTRAINT pn_violation_assoc_natural_key
+    UNIQUE (submission_year_quarter, pwsid, pn_violation_id, related_violation_id);
+
+-- ============================================================================
+-- SERVICE AREAS
+-- ============================================================================
+
+-- A system reports each service area type once per quarter
+ALTER TABLE service_areas ALTER COLUMN service_area_type_code SET NOT NULL;
+
+ALTER TABLE service_areas
+    ADD CONSTRAINT service_areas_natural_key
+    UNIQUE (submission_year_quarter, pwsid, service_area_type_code);
+
+-- ============================================================================
+-- INDEXES FOR PER-SYSTEM LOOKUPS
+-- ============================================================================
+
+CREATE INDEX IF NOT EXISTS idx_facilities_pwsid ON facilities(pwsid);
+CREATE INDEX IF NOT EXISTS idx_lcr_samples_pwsid ON lcr_samples(pwsid);
+CREATE INDEX IF NOT EXISTS idx_lcr_samples_contaminant ON lcr_samples(contaminant_code);
+CREATE INDEX IF NOT EXISTS idx_events_milestones_pwsid ON events_milestones(pwsid);
+CREATE INDEX IF NOT EXISTS idx_pn_violation_assoc_related ON pn_violation_assoc(pwsid, related_violation_id);
+
+COMMENT ON CONSTRAINT pn_violation_assoc_natural_key ON pn_violation_assoc IS 'A public notice row per related violation';
+COMMENT ON CONSTRAINT service_areas_natural_key ON service_areas IS 'One row per service area type per system and quarter';
@@ -0,0 +1,20 @@
+-- Removal marker for rows that disappear from a later SDWIS export
+-- Set by `scripts/import_data.py --delta --mark-removed`, cleared when the row reappears
+
+-- ============================================================================
+-- REMOVED_AT ON IMPORTED TABLES
+-- ============================================================================
+
+ALTER TABLE reference_codes ADD COLUMN IF NOT EXISTS removed_at TIMESTAMPTZ;
+ALTER TABLE public_water_systems ADD COLUMN IF NOT EXISTS removed_at TIMESTAMPTZ;
+ALTER TABLE violations_enforcement ADD COLUMN IF NOT EXISTS removed_at TIMESTAMPTZ;
+ALTER TABLE geographic_areas ADD COLUMN IF NOT EXISTS removed_at TIMESTAMPTZ;
+ALTER TABLE facilities ADD COLUMN IF NOT EXISTS removed_at TIMESTAMPTZ;
+ALTER TABLE service_areas ADD COLUMN IF NOT EXISTS removed_at TIMESTAMPTZ;
+ALTER TABLE lcr_samples ADD COLUMN IF NOT EXISTS removed_at TIMESTAMPTZ;
+ALTER TABLE site_visits ADD COLUMN IF NOT EXISTS removed_at TIMESTAMPTZ;
+ALTER TABLE events_milestones ADD COLUMN IF NOT EXISTS removed_at TIMESTAMPTZ;
+ALTER TABLE pn_violation_assoc ADD COLUMN IF NOT EXISTS removed_at TIMESTAMPTZ;
+
+COMMENT ON COLUMN public_water_systems.removed_at IS 'Set when a delta import of this quarter no longer contains the system';
+COMMENT ON COLUMN violations_enforcement.removed_at IS 'Set when a delta import of this quarter no longer contains the violation';
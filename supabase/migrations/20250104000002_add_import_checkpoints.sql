@@ -0,0 +1,19 @@
+-- Import progress per table for `scripts/import_data.py --resume`
+-- Written in the same transaction as the rows it counts, so it never runs ahead of the data
+
+-- ============================================================================
+-- IMPORT CHECKPOINTS
+-- ============================================================================
+
+CREATE TABLE IF NOT EXISTS import_checkpoints (
+    table_name VARCHAR(63) PRIMARY KEY,
+    csv_file VARCHAR(255) NOT NULL,
+    file_size BIGINT NOT NULL,
+    file_mtime_ns BIGINT NOT NULL,
+    rows_committed BIGINT NOT NULL DEFAULT 0,
+    completed BOOLEAN NOT NULL DEFAULT FALSE,
+    updated_at TIMESTAMPTZ DEFAULT NOW()
+);
+
+COMMENT ON TABLE import_checkpoints IS 'Last committed CSV row per imported table; a changed file (size or mtime) restarts from row one';
+COMMENT ON COLUMN import_checkpoints.rows_committed IS 'CSV records (header and blank lines excluded) already written, including rows skipped or quarantined';
@@ -0,0 +1,56 @@
+-- Response cache for scripts/generate_ai_explanations.py
+-- Violations that share contaminant, violation code, status class, population band and
+-- notification tier get the same prompt, so one API response can serve all of them
+
+-- ============================================================================
+-- EXPLANATION CACHE
+-- ============================================================================
+
+CREATE TABLE IF NOT EXISTS ai_explanation_cache (
+    cache_key CHAR(64) PRIMARY KEY, -- sha256 of model_version + the normalized context
+    model_version VARCHAR(50) NOT NULL,
+    context JSONB NOT NULL,
+    response JSONB NOT NULL,
+    hit_count INTEGER NOT NULL DEFAULT 0,
+    created_at TIMESTAMPTZ DEFAULT NOW(),
+    last_used_at TIMESTAMPTZ DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_ai_explanation_cache_last_used ON ai_explanation_cache(last_used_at);
+CREATE INDEX IF NOT EXISTS idx_ai_explanation_cache_created ON ai_explanation_cache(created_at);
+
+COMMENT ON TABLE ai_explanation_cache IS 'Model responses keyed by the violation fields the prompt was built from; expired by TTL and trimmed least-recently-used first';
+COMMENT ON COLUMN ai_explanation_cache.context IS 'Normalized prompt fields hashed into cache_key';
+
+-- ============================================================================
+-- ONE CURRENT EXPLANATION PER VIOLATION
+-- ============================================================================
+
+-- The old key was UNIQUE (submission_year_quarter, violation_id) over all rows, so
+-- --regenerate could never add a second version, and violation IDs (unique only per
+-- system) from two systems collided. Only current rows are now exclusive, per system.
+ALTER TABLE violation_ai_explanations
+    DROP CONSTRAINT IF EXISTS unique_current_explanation_per_violation;
+
+ALTER TABLE violation_ai_explanations
+    ADD CONSTRAINT unique_current_explanation_per_violation
+    EXCLUDE USING btree (submission_year_quarter WITH =, pwsid WITH =, violation_id WITH =)
+    WHERE (is_current)
+    DEFERRABLE INITIALLY DEFERRED;
+
+CREATE OR REPLACE FUNCTION archive_old_explanations()
+RETURNS TRIGGER AS $$
+BEGIN
+    -- Mark old explanations as not current
+    UPDATE violation_ai_explanations
+    SET is_current = FALSE,
+        updated_at = NOW()
+    WHERE submission_year_quarter = NEW.submission_year_quarter
+      AND pwsid = NEW.pwsid
+      AND violation_id = NEW.violation_id
+      AND id != NEW.id
+      AND is_current = TRUE;
+
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
@@ -0,0 +1,29 @@
+-- Indexes behind the explanation candidate query in scripts/generate_ai_explanations.py
+-- The query streams through a server-side cursor; these keep it an ordered index walk
+-- instead of a scan and full sort of every health-based violation
+
+-- ============================================================================
+-- CANDIDATE ORDER
+-- ============================================================================
+
+-- Same expressions as the first two ORDER BY keys of the candidate query, so health-based
+-- violations come out current-first and newest-first without sorting; the remaining
+-- tie-breakers only need an Incremental Sort within equal dates
+CREATE INDEX IF NOT EXISTS idx_violations_explanation_priority ON violations_enforcement (
+    (CASE WHEN violation_status IN ('Unaddressed', 'Addressed') THEN 1 ELSE 2 END),
+    (COALESCE(non_compl_per_begin_date, '1900-01-01'::date)) DESC
+) WHERE is_health_based_ind = 'Y';
+
+-- ============================================================================
+-- JOIN LOOKUPS
+-- ============================================================================
+
+-- First county of a system, read from the index alone
+CREATE INDEX IF NOT EXISTS idx_geo_areas_system_county
+    ON geographic_areas(submission_year_quarter, pwsid, area_type_code, county_served);
+
+-- The NOT EXISTS check uses the index of unique_current_explanation_per_violation
+-- (submission_year_quarter, pwsid, violation_id WHERE is_current); the system and
+-- reference code joins use the existing UNIQUE constraints
+
+COMMENT ON INDEX idx_violations_explanation_priority IS 'Priority order of generate_ai_explanations.py candidates; must match its ORDER BY';
@@ -0,0 +1,257 @@
+-- Data-driven violation severity scoring
+-- The weights scripts/generate_ai_explanations.py used to hard-code and the map's
+-- severity_level CASE now both come from these tables. violation_severity_scores()
+-- is the set-based scorer; scripts/severity_scoring.py is the same engine in Python
+-- and --check compares the two over every violation.
+
+-- ============================================================================
+-- SCORING RULES
+-- ============================================================================
+
+-- Score = base + one rule per factor, clamped to 1..10 (the range allowed by
+-- violation_ai_explanations.severity_score). Exact-match factors add the points of
+-- the row whose match_value equals the violation's value. Band factors add the
+-- points of the highest band whose min_value the value exceeds.
+CREATE TABLE IF NOT EXISTS severity_scoring_rules (
+    id SERIAL PRIMARY KEY,
+    factor VARCHAR(30) NOT NULL CHECK (factor IN (
+        'base',              -- starting score, no match_value or min_value
+        'contaminant',       -- match_value = contaminant_code
+        'status',            -- match_value = violation_status
+        'health_based',      -- match_value = is_health_based_ind
+        'school',            -- match_value = 'Y' for schools and daycares, otherwise 'N'
+        'notification_tier', -- match_value = public_notification_tier
+        'population',        -- band: population_served_count > min_value
+        'mcl_ratio'          -- band: viol_measure > federal_mcl * min_value
+    )),
+    match_value VARCHAR(30),
+    min_value NUMERIC,
+    points INTEGER NOT NULL,
+    description TEXT,
+    UNIQUE NULLS NOT DISTINCT (factor, match_value, min_value)
+);
+
+-- Score thresholds for the explanation risk level and the map marker
+CREATE TABLE IF NOT EXISTS severity_risk_levels (
+    min_score INTEGER PRIMARY KEY CHECK (min_score BETWEEN 1 AND 10),
+    health_risk_level VARCHAR(20) NOT NULL,
+    map_severity_level VARCHAR(20) NOT NULL,
+    map_color VARCHAR(7) NOT NULL
+);
+
+INSERT INTO severity_scoring_rules (factor, match_value, min_value, points, description) VALUES
+    ('base', NULL, NULL, 5, 'Starting score'),
+    ('contaminant', '1005', NULL, 3, 'Arsenic'),
+    ('contaminant', '2050', NULL, 3, 'Atrazine'),
+    ('contaminant', '2047', NULL, 3, 'Aldicarb'),
+    ('contaminant', '2046', NULL, 3, 'Carbofuran'),
+    ('contaminant', '1095', NULL, 1, 'Zinc'),
+    ('contaminant', '1919', NULL, 1, 'Calcium'),
+    ('contaminant', '1930', NULL, 1, 'Total dissolved solids'),
+    ('status', 'Unaddressed', NULL, 2, NULL),
+    ('status', 'Addressed', NULL, 1, NULL),
+    ('status', 'Resolved', NULL, -1, 'Historical'),
+    ('status', 'Archived', NULL, -2, 'Very old'),
+    ('health_based', 'N', NULL, -3, 'Monitoring and reporting violations'),
+    ('school', 'Y', NULL, 2, 'Vulnerable population'),
+    ('notification_tier', '1', NULL, 3, 'Immediate notice'),
+    ('notification_tier', '2', NULL, 1, 'Notice within 30 days'),
+    ('population', NULL, 1000, 1, NULL),
+    ('population', NULL, 10000, 2, NULL),
+    ('mcl_ratio', NULL, 1.5, 1, NULL),
+    ('mcl_ratio', NULL, 2, 2, NULL)
+ON CONFLICT DO NOTHING;
+
+INSERT INTO severity_risk_levels (min_score, health_risk_level, map_severity_level, map_color) VALUES
+    (8, 'CRITICAL', 'critical', '#dc2626'),
+    (6, 'HIGH', 'warning', '#f59e0b'),
+    (4, 'MEDIUM', 'moderate', '#3b82f6'),
+    (1, 'LOW', 'low', '#10b981')
+ON CONFLICT DO NOTHING;
+
+COMMENT ON TABLE severity_scoring_rules IS 'Severity score weights shared by violation_severity_scores() and scripts/severity_scoring.py';
+COMMENT ON TABLE severity_risk_levels IS 'Lowest severity score of each health risk level and map severity level';
+
+-- ============================================================================
+-- SCORING
+-- ============================================================================
+
+-- Raw inputs of the score, one row per violation
+CREATE OR REPLACE VIEW violation_severity_facts AS
+SELECT
+    v.submission_year_quarter,
+    v.pwsid,
+    v.violation_id,
+    v.contaminant_code,
+    v.violation_status,
+    v.is_health_based_ind,
+    COALESCE(p.population_served_count, 0) AS population_served,
+    COALESCE(p.is_school_or_daycare_ind = 'Y', FALSE) AS is_school_or_daycare,
+    v.public_notification_tier,
+    v.viol_measure,
+    v.federal_mcl
+FROM violations_enforcement v
+LEFT JOIN public_water_systems p
+    ON p.submission_year_quarter = v.submission_year_quarter AND p.pwsid = v.pwsid;
+
+CREATE OR REPLACE FUNCTION violation_severity_scores()
+RETURNS TABLE (
+    submission_year_quarter VARCHAR(7),
+    pwsid VARCHAR(9),
+    violation_id VARCHAR(20),
+    severity_score INTEGER,
+    health_risk_level VARCHAR(20),
+    map_severity_level VARCHAR(20),
+    map_color VARCHAR(7)
+) AS $$
+    WITH facts AS (
+        SELECT
+            f.*,
+            -- federal_mcl is free text; only plain decimals count (same rule as severity_scoring.py)
+            CASE WHEN btrim(f.federal_mcl) ~ '^[0-9]*\.?[0-9]+$' THEN btrim(f.federal_mcl)::numeric END AS mcl
+        FROM violation_severity_facts f
+    ),
+    scored AS (
+        SELECT
+            f.submission_year_quarter,
+            f.pwsid,
+            f.violation_id,
+            LEAST(10, GREATEST(1,
+                base.points
+                + COALESCE(contaminant.points, 0)
+                + COALESCE(status.points, 0)
+                + COALESCE(health_based.points, 0)
+                + COALESCE(school.points, 0)
+                + COALESCE(tier.points, 0)
+                + COALESCE(population.points, 0)
+                + COALESCE(mcl_ratio.points, 0)
+            ))::integer AS severity_score
+        FROM facts f
+        CROSS JOIN (SELECT COALESCE(SUM(r.points), 0) AS points FROM severity_scoring_rules r WHERE r.factor = 'base') base
+        LEFT JOIN severity_scoring_rules contaminant
+            ON contaminant.factor = 'contaminant' AND contaminant.match_value = f.contaminant_code
+        LEFT JOIN severity_scoring_rules status
+            ON status.factor = 'status' AND status.match_value = f.violation_status
+        LEFT JOIN severity_scoring_rules health_based
+            ON health_based.factor = 'health_based' AND health_based.match_value = f.is_health_based_ind
+        LEFT JOIN severity_scoring_rules school
+            ON school.factor = 'school' AND school.match_value = CASE WHEN f.is_school_or_daycare THEN 'Y' ELSE 'N' END
+        LEFT JOIN severity_scoring_rules tier
+            ON tier.factor = 'notification_tier' AND tier.match_value = f.public_notification_tier::text
+        LEFT JOIN LATERAL (
+            SELECT r.points FROM severity_scoring_rules r
+            WHERE r.factor = 'population' AND f.population_served > r.min_value
+            ORDER BY r.min_value DESC
+            LIMIT 1
+        ) population ON TRUE
+        LEFT JOIN LATERAL (
+            SELECT r.points FROM severity_scoring_rules r
+            WHERE r.factor = 'mcl_ratio' AND f.mcl > 0 AND f.viol_measure > f.mcl * r.min_value
+            ORDER BY r.min_value DESC
+            LIMIT 1
+        ) mcl_ratio ON TRUE
+    )
+    SELECT
+        s.submission_year_quarter,
+        s.pwsid,
+        s.violation_id,
+        s.severity_score,
+        level.health_risk_level,
+        level.map_severity_level,
+        level.map_color
+    FROM scored s
+    LEFT JOIN LATERAL (
+        SELECT l.* FROM severity_risk_levels l
+        WHERE l.min_score <= s.severity_score
+        ORDER BY l.min_score DESC
+        LIMIT 1
+    ) level ON TRUE;
+$$ LANGUAGE sql STABLE;
+
+-- Rescore every current explanation and map marker from the rules in one pass
+CREATE OR REPLACE FUNCTION rescore_violations()
+RETURNS TABLE (explanations_updated INTEGER, locations_updated INTEGER) AS $$
+BEGIN
+    CREATE TEMP TABLE rescored ON COMMIT DROP AS
+    SELECT * FROM violation_severity_scores();
+
+    UPDATE violation_ai_explanations ai
+    SET severity_score = s.severity_score,
+        health_risk_level = s.health_risk_level,
+        updated_at = NOW()
+    FROM rescored s
+    WHERE ai.submission_year_quarter = s.submission_year_quarter
+      AND ai.pwsid = s.pwsid
+      AND ai.violation_id = s.violation_id
+      AND ai.is_current
+      AND (ai.severity_score, ai.health_risk_level) IS DISTINCT FROM (s.severity_score, s.health_risk_level);
+    GET DIAGNOSTICS explanations_updated = ROW_COUNT;
+
+    UPDATE violation_locations vl
+    SET severity_level = s.map_severity_level,
+        map_color = s.map_color,
+        updated_at = NOW()
+    FROM rescored s
+    WHERE vl.submission_year_quarter = s.submission_year_quarter
+      AND vl.pwsid = s.pwsid
+      AND vl.violation_id = s.violation_id
+      AND (vl.severity_level, vl.map_color) IS DISTINCT FROM (s.map_severity_level, s.map_color);
+    GET DIAGNOSTICS locations_updated = ROW_COUNT;
+
+    DROP TABLE rescored;
+    RETURN NEXT;
+END;
+$$ LANGUAGE plpgsql;
+
+-- ============================================================================
+-- MAP SEVERITY FROM THE SAME SCORES
+-- ============================================================================
+
+CREATE OR REPLACE FUNCTION populate_violation_locations()
+RETURNS INTEGER AS $$
+DECLARE
+    inserted_count INTEGER := 0;
+BEGIN
+    INSERT INTO violation_locations (
+        violation_id,
+        pwsid,
+        submission_year_quarter,
+        water_system_location_id,
+        facility_id,
+        severity_level,
+        map_color,
+        is_health_based,
+        is_unaddressed,
+        violation_begin_date,
+        violation_end_date
+    )
+    SELECT
+        v.violation_id,
+        v.pwsid,
+        v.submission_year_quarter,
+        wsl.id as water_system_location_id,
+        v.facility_id,
+        s.map_severity_level as severity_level,
+        s.map_color,
+        (v.is_health_based_ind = 'Y') as is_health_based,
+        (v.violation_status = 'Unaddressed') as is_unaddressed,
+        v.non_compl_per_begin_date,
+        v.non_compl_per_end_date
+    FROM violations_enforcement v
+    JOIN water_system_locations wsl ON v.pwsid = wsl.pwsid
+        AND v.submission_year_quarter = wsl.submission_year_quarter
+    JOIN violation_severity_scores() s ON s.submission_year_quarter = v.submission_year_quarter
+        AND s.pwsid = v.pwsid
+        AND s.violation_id = v.violation_id
+    WHERE NOT EXISTS (
+        SELECT 1 FROM violation_locations vl
+        WHERE vl.violation_id = v.violation_id AND vl.pwsid = v.pwsid
+    );
+
+    GET DIAGNOSTICS inserted_count = ROW_COUNT;
+    RETURN inserted_count;
+END;
+$$ LANGUAGE plpgsql;
+
+COMMENT ON FUNCTION violation_severity_scores() IS 'Severity score, risk level and map marker of every violation, from severity_scoring_rules';
+COMMENT ON FUNCTION rescore_violations() IS 'Applies the current scoring rules to current AI explanations and violation_locations';
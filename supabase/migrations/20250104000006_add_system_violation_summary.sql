@@ -0,0 +1,165 @@
+-- Materialized per-system violation counts
+-- system_health_dashboard, current_violations_summary, county_summary and
+-- get_systems_sorted() each grouped violations_enforcement by system on every
+-- request. They now read system_violation_summary, which scripts/import_data.py
+-- refreshes (concurrently, so readers are never blocked) after each import.
+
+-- ============================================================================
+-- SUMMARY
+-- ============================================================================
+
+-- One row per system and quarter. Violations are counted before the join, so the
+-- counts cannot be multiplied by other one-to-many joins.
+CREATE MATERIALIZED VIEW IF NOT EXISTS system_violation_summary AS
+SELECT
+    p.submission_year_quarter,
+    p.pwsid,
+    p.pws_name,
+    p.pws_type_code,
+    p.pws_activity_code,
+    p.population_served_count,
+    p.state_code,
+    COALESCE(v.total_violations, 0) AS total_violations,
+    COALESCE(v.health_violations, 0) AS health_violations,
+    COALESCE(v.unaddressed_violations, 0) AS unaddressed_violations,
+    COALESCE(v.resolved_violations, 0) AS resolved_violations,
+    COALESCE(v.critical_violations, 0) AS critical_violations,
+    v.latest_violation_date,
+    CASE
+        WHEN COALESCE(v.critical_violations, 0) > 0 THEN 'RED'
+        WHEN COALESCE(v.health_violations, 0) > 0 THEN 'YELLOW'
+        ELSE 'GREEN'
+    END AS health_status
+FROM public_water_systems p
+LEFT JOIN (
+    SELECT
+        submission_year_quarter,
+        pwsid,
+        COUNT(*) AS total_violations,
+        COUNT(*) FILTER (WHERE is_health_based_ind = 'Y') AS health_violations,
+        COUNT(*) FILTER (WHERE violation_status = 'Unaddressed') AS unaddressed_violations,
+        COUNT(*) FILTER (WHERE violation_status = 'Resolved') AS resolved_violations,
+        COUNT(*) FILTER (WHERE is_health_based_ind = 'Y' AND violation_status = 'Unaddressed') AS critical_violations,
+        MAX(non_compl_per_begin_date) AS latest_violation_date
+    FROM violations_enforcement
+    GROUP BY submission_year_quarter, pwsid
+) v ON v.submission_year_quarter = p.submission_year_quarter AND v.pwsid = p.pwsid;
+
+-- Required by REFRESH ... CONCURRENTLY
+CREATE UNIQUE INDEX IF NOT EXISTS idx_system_violation_summary_key
+    ON system_violation_summary(submission_year_quarter, pwsid);
+CREATE INDEX IF NOT EXISTS idx_system_violation_summary_status
+    ON system_violation_summary(health_status) WHERE pws_activity_code = 'A';
+
+CREATE OR REPLACE FUNCTION refresh_system_violation_summary()
+RETURNS VOID AS $$
+BEGIN
+    -- CONCURRENTLY keeps the old rows readable during the refresh, but needs a populated view
+    IF (SELECT relispopulated FROM pg_class WHERE oid = 'system_violation_summary'::regclass) THEN
+        REFRESH MATERIALIZED VIEW CONCURRENTLY system_violation_summary;
+    ELSE
+        REFRESH MATERIALIZED VIEW system_violation_summary;
+    END IF;
+END;
+$$ LANGUAGE plpgsql;
+
+COMMENT ON MATERIALIZED VIEW system_violation_summary IS 'Violation counts and health status per system and quarter; refreshed by refresh_system_violation_summary() after imports';
+COMMENT ON FUNCTION refresh_system_violation_summary() IS 'Refreshes system_violation_summary without blocking readers';
+
+-- ============================================================================
+-- VIEWS AND RPC READ THE SUMMARY
+-- ============================================================================
+
+CREATE OR REPLACE VIEW current_violations_summary AS
+SELECT
+    s.pwsid,
+    s.pws_name,
+    s.pws_type_code,
+    s.population_served_count,
+    s.state_code,
+    s.total_violations,
+    s.health_violations,
+    s.unaddressed_violations,
+    s.resolved_violations,
+    s.latest_violation_date
+FROM system_violation_summary s;
+
+CREATE OR REPLACE VIEW system_health_dashboard AS
+SELECT
+    s.pwsid,
+    s.pws_name,
+    s.pws_type_code,
+    s.population_served_count,
+    g.county_served,
+    g.city_served,
+    s.health_status,
+    s.critical_violations,
+    s.unaddressed_violations AS total_unaddressed
+FROM system_violation_summary s
+LEFT JOIN geographic_areas g ON g.pwsid = s.pwsid
+    AND g.submission_year_quarter = s.submission_year_quarter
+    AND g.area_type_code = 'CN'
+WHERE s.pws_activity_code = 'A';
+
+-- Population is summed once per system; it used to be repeated for every violation row
+CREATE OR REPLACE VIEW county_summary AS
+SELECT
+    g.county_served,
+    g.state_served,
+    COUNT(DISTINCT s.pwsid) as total_systems,
+    SUM(s.population_served_count) as total_population,
+    SUM(s.critical_violations)::bigint as critical_violations,
+    SUM(s.total_violations)::bigint as total_violations
+FROM geographic_areas g
+JOIN system_violation_summary s ON s.pwsid = g.pwsid AND s.submission_year_quarter = g.submission_year_quarter
+WHERE g.area_type_code = 'CN'
+GROUP BY g.county_served, g.state_served;
+
+CREATE OR REPLACE FUNCTION get_systems_sorted(
+    page_offset INTEGER DEFAULT 0,
+    page_limit INTEGER DEFAULT 20
+)
+RETURNS TABLE (
+    pwsid VARCHAR(9),
+    pws_name VARCHAR(100),
+    pws_type_code VARCHAR(6),
+    population_served_count INTEGER,
+    county_served VARCHAR(40),
+    city_served VARCHAR(40),
+    health_status TEXT,
+    critical_violations BIGINT,
+    total_unaddressed BIGINT
+) AS $$
+BEGIN
+    RETURN QUERY
+    SELECT
+        d.pwsid,
+        d.pws_name,
+        d.pws_type_code,
+        d.population_served_count,
+        d.county_served,
+        d.city_served,
+        d.health_status,
+        d.critical_violations,
+        d.total_unaddressed
+    FROM system_health_dashboard d
+    ORDER BY
+        -- Sort by health status (worst first)
+        CASE d.health_status WHEN 'RED' THEN 1 WHEN 'YELLOW' THEN 2 ELSE 3 END,
+        -- Within each status, sort by number of critical violations (descending)
+        d.critical_violations DESC,
+        -- Then by total unaddressed violations (descending)
+        d.total_unaddressed DESC,
+        -- Then by population served (larger systems first)
+        d.population_served_count DESC,
+        -- Finally by system, so pages never overlap
+        d.pwsid
+    OFFSET page_offset
+    LIMIT page_limit;
+END;
+$$ LANGUAGE plpgsql;
+
+COMMENT ON VIEW system_health_dashboard IS 'Health status per active system, read from system_violation_summary';
+COMMENT ON VIEW current_violations_summary IS 'Violation statistics per system, read from system_violation_summary';
+COMMENT ON VIEW county_summary IS 'County totals, read from system_violation_summary';
+COMMENT ON FUNCTION get_systems_sorted IS 'Get water systems sorted by health status (worst first) with pagination, read from system_violation_summary';
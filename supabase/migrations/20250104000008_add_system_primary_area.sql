@@ -0,0 +1,364 @@
+-- One primary location per system for the reporting views
+-- Views and RPCs joined geographic_areas on pwsid (and sometimes violations on
+-- pwsid alone), so a system listed in two counties, or present in two quarters,
+-- returned every violation twice and doubled its counts. They now join
+-- system_primary_area, which has exactly one row per system and quarter, and match
+-- every other join on the full key. scripts/check_reporting_views.py checks the
+-- row counts and how query time grows with the data.
+
+-- ============================================================================
+-- PRIMARY AREA PER SYSTEM
+-- ============================================================================
+
+-- County (and its state and ZIP) from the first CN row, city from the first CT row:
+-- SDWIS reports cities as separate CT rows, so city_served is empty on CN rows.
+-- Systems without geographic rows get NULLs rather than disappearing.
+CREATE OR REPLACE VIEW system_primary_area AS
+SELECT
+    p.submission_year_quarter,
+    p.pwsid,
+    cn.county_served,
+    cn.state_served,
+    cn.zip_code_served,
+    COALESCE(ct.city_served, cn.city_served) AS city_served
+FROM public_water_systems p
+LEFT JOIN LATERAL (
+    SELECT g.county_served, g.state_served, g.zip_code_served, g.city_served
+    FROM geographic_areas g
+    WHERE g.submission_year_quarter = p.submission_year_quarter
+      AND g.pwsid = p.pwsid
+      AND g.area_type_code = 'CN'
+    ORDER BY g.county_served
+    LIMIT 1
+) cn ON TRUE
+LEFT JOIN LATERAL (
+    SELECT g.city_served
+    FROM geographic_areas g
+    WHERE g.submission_year_quarter = p.submission_year_quarter
+      AND g.pwsid = p.pwsid
+      AND g.area_type_code = 'CT'
+    ORDER BY g.city_served
+    LIMIT 1
+) ct ON TRUE;
+
+-- The CN lookup uses idx_geo_areas_system_county; this serves the CT lookup
+CREATE INDEX IF NOT EXISTS idx_geo_areas_system_city
+    ON geographic_areas(submission_year_quarter, pwsid, city_served)
+    WHERE area_type_code = 'CT';
+
+COMMENT ON VIEW system_primary_area IS 'Exactly one county and city per system and quarter, for joins that must not multiply rows';
+
+-- ============================================================================
+-- VIEWS
+-- ============================================================================
+
+CREATE OR REPLACE VIEW system_health_dashboard AS
+SELECT
+    s.pwsid,
+    s.pws_name,
+    s.pws_type_code,
+    s.population_served_count,
+    a.county_served,
+    a.city_served,
+    s.health_status,
+    s.critical_violations,
+    s.unaddressed_violations AS total_unaddressed
+FROM system_violation_summary s
+LEFT JOIN system_primary_area a ON a.submission_year_quarter = s.submission_year_quarter AND a.pwsid = s.pwsid
+WHERE s.pws_activity_code = 'A';
+
+-- Explanations are matched on pwsid too: violation IDs are only unique within a system.
+-- Dropped rather than replaced: databases where 20250103000005 could not replace the
+-- older column list still have it.
+DROP VIEW IF EXISTS public_violation_explanations CASCADE;
+
+CREATE VIEW public_violation_explanations AS
+SELECT
+    -- System info
+    v.pwsid,
+    p.pws_name,
+    p.population_served_count,
+    p.is_school_or_daycare_ind,
+
+    -- Violation details
+    v.violation_id,
+    v.violation_code,
+    v.is_health_based_ind,
+    v.non_compl_per_begin_date,
+    v.non_compl_per_end_date,
+    v.violation_status,
+    v.contaminant_code,
+    v.viol_measure,
+    v.unit_of_measure,
+    v.federal_mcl,
+    v.state_mcl,
+    v.public_notification_tier,
+    v.calculated_pub_notif_tier,
+    v.violation_category_code,
+
+    -- Reference descriptions
+    rc_violation.value_description as violation_description,
+    rc_contaminant.value_description as contaminant_description,
+
+    -- AI explanations (nullable for violations without explanations)
+    ai.explanation_text,
+    ai.health_risk_level,
+    ai.health_impact,
+    ai.recommended_actions,
+    ai.timeline_context,
+    ai.severity_score,
+    ai.vulnerable_groups,
+    ai.contaminant_explanation,
+    ai.generated_at as ai_generated_at,
+    ai.model_version as ai_model_version,
+
+    -- Geographic info
+    geo.county_served,
+    geo.city_served,
+    geo.zip_code_served
+
+FROM violations_enforcement v
+-- LEFT JOIN so violations without AI explanations still appear
+LEFT JOIN violation_ai_explanations ai ON v.submission_year_quarter = ai.submission_year_quarter
+    AND v.pwsid = ai.pwsid AND v.violation_id = ai.violation_id AND ai.is_current = TRUE
+JOIN public_water_systems p ON v.pwsid = p.pwsid AND v.submission_year_quarter = p.submission_year_quarter
+LEFT JOIN reference_codes rc_violation ON rc_violation.value_type = 'VIOLATION_CODE' AND rc_violation.value_code = v.violation_code
+LEFT JOIN reference_codes rc_contaminant ON rc_contaminant.value_type = 'CONTAMINANT_CODE' AND rc_contaminant.value_code = v.contaminant_code
+LEFT JOIN system_primary_area geo ON v.pwsid = geo.pwsid AND v.submission_year_quarter = geo.submission_year_quarter
+ORDER BY
+    COALESCE(ai.severity_score,
+        CASE
+            WHEN v.is_health_based_ind = 'Y' AND v.violation_status = 'Unaddressed' THEN 8
+            WHEN v.is_health_based_ind = 'Y' THEN 6
+            WHEN v.violation_status = 'Unaddressed' THEN 4
+            ELSE 2
+        END
+    ) DESC,
+    v.non_compl_per_begin_date DESC;
+
+-- Dropped with public_violation_explanations
+CREATE VIEW health_violation_explanations AS
+SELECT * FROM public_violation_explanations
+WHERE is_health_based_ind = 'Y';
+
+-- Each marker's system and violation are the rows of the marker's own quarter
+CREATE OR REPLACE VIEW violations_map_data AS
+SELECT
+    vl.violation_id,
+    vl.pwsid,
+    p.pws_name,
+    COALESCE(vl.latitude, wsl.latitude) as latitude,
+    COALESCE(vl.longitude, wsl.longitude) as longitude,
+    wsl.full_address,
+    wsl.county_name,
+    p.population_served_count,
+    p.pws_type_code,
+    v.violation_status,
+    v.is_health_based_ind,
+    v.violation_category_code,
+    v.contaminant_code,
+    v.non_compl_per_begin_date,
+    v.non_compl_per_end_date,
+    g.county_served,
+    g.city_served,
+    g.zip_code_served,
+    rc_cont.value_description as contaminant_name,
+    rc_viol.value_description as violation_description,
+    vl.severity_level,
+    vl.map_color,
+    vl.violation_count,
+    wsl.geocoding_accuracy,
+    wsl.geocoded_at
+FROM violation_locations vl
+JOIN water_system_locations wsl ON vl.water_system_location_id = wsl.id
+JOIN public_water_systems p ON vl.pwsid = p.pwsid AND vl.submission_year_quarter = p.submission_year_quarter
+JOIN violations_enforcement v ON vl.submission_year_quarter = v.submission_year_quarter
+    AND vl.pwsid = v.pwsid AND vl.violation_id = v.violation_id
+LEFT JOIN system_primary_area g ON vl.pwsid = g.pwsid AND vl.submission_year_quarter = g.submission_year_quarter
+LEFT JOIN reference_codes rc_cont ON rc_cont.value_type = 'CONTAMINANT_CODE'
+    AND rc_cont.value_code = v.contaminant_code
+LEFT JOIN reference_codes rc_viol ON rc_viol.value_type = 'VIOLATION_CODE'
+    AND rc_viol.value_code = v.violation_code
+WHERE (vl.latitude IS NOT NULL OR wsl.latitude IS NOT NULL)
+    AND (vl.longitude IS NOT NULL OR wsl.longitude IS NOT NULL)
+    AND p.pws_activity_code = 'A';
+
+-- county_summary keeps one row per county a system serves: a system in two counties
+-- counts toward both, which is what a per-county total means
+
+COMMENT ON VIEW system_health_dashboard IS 'Health status per active system, read from system_violation_summary; one row per system and quarter';
+COMMENT ON VIEW public_violation_explanations IS 'Complete view of ALL violations with AI explanations where available; one row per violation';
+COMMENT ON VIEW health_violation_explanations IS 'Health-based violations only - for compatibility with existing queries';
+
+-- ============================================================================
+-- RPC FUNCTIONS
+-- ============================================================================
+
+CREATE OR REPLACE FUNCTION get_systems_sorted_after(
+    after_sort_key BIGINT[] DEFAULT NULL,
+    after_pwsid VARCHAR(9) DEFAULT NULL,
+    page_limit INTEGER DEFAULT 20
+)
+RETURNS TABLE (
+    pwsid VARCHAR(9),
+    pws_name VARCHAR(100),
+    pws_type_code VARCHAR(6),
+    population_served_count INTEGER,
+    county_served VARCHAR(40),
+    city_served VARCHAR(40),
+    health_status TEXT,
+    critical_violations BIGINT,
+    total_unaddressed BIGINT,
+    sort_key BIGINT[]
+) AS $$
+BEGIN
+    RETURN QUERY
+    SELECT
+        s.pwsid,
+        s.pws_name,
+        s.pws_type_code,
+        s.population_served_count,
+        a.county_served,
+        a.city_served,
+        s.health_status,
+        s.critical_violations,
+        s.unaddressed_violations,
+        s.sort_key
+    FROM system_violation_summary s
+    LEFT JOIN system_primary_area a ON a.submission_year_quarter = s.submission_year_quarter AND a.pwsid = s.pwsid
+    WHERE s.pws_activity_code = 'A'
+      AND (after_sort_key IS NULL OR (s.sort_key, s.pwsid) > (after_sort_key, after_pwsid))
+    ORDER BY s.sort_key, s.pwsid
+    LIMIT page_limit;
+END;
+$$ LANGUAGE plpgsql STABLE;
+
+CREATE OR REPLACE FUNCTION get_violations_with_explanations(
+    system_pwsid TEXT
+)
+RETURNS TABLE (
+    violation_id VARCHAR(20),
+    violation_code VARCHAR(4),
+    violation_description TEXT,
+    violation_status VARCHAR(11),
+    is_health_based_ind VARCHAR(1),
+    contaminant_code VARCHAR(4),
+    contaminant_description TEXT,
+    non_compl_per_begin_date DATE,
+    non_compl_per_end_date DATE,
+    public_notification_tier INTEGER,
+    viol_measure NUMERIC,
+    unit_of_measure VARCHAR(9),
+    explanation_text TEXT,
+    health_risk_level VARCHAR(10),
+    severity_score INTEGER,
+    pws_name VARCHAR(100),
+    population_served_count INTEGER,
+    county_served VARCHAR(40),
+    city_served VARCHAR(40),
+    health_impact TEXT,
+    recommended_actions TEXT,
+    timeline_context TEXT,
+    vulnerable_groups TEXT,
+    contaminant_explanation TEXT,
+    ai_generated_at TIMESTAMP WITH TIME ZONE,
+    ai_model_version VARCHAR(50)
+) AS $$
+BEGIN
+    -- Try to return violations with AI explanations
+    RETURN QUERY
+    SELECT
+        pve.violation_id,
+        pve.violation_code,
+        pve.violation_description,
+        pve.violation_status,
+        pve.is_health_based_ind,
+        pve.contaminant_code,
+        pve.contaminant_description,
+        pve.non_compl_per_begin_date,
+        pve.non_compl_per_end_date,
+        pve.public_notification_tier,
+        pve.viol_measure,
+        pve.unit_of_measure,
+        pve.explanation_text,
+        pve.health_risk_level,
+        pve.severity_score,
+        pve.pws_name,
+        pve.population_served_count,
+        pve.county_served,
+        pve.city_served,
+        pve.health_impact,
+        pve.recommended_actions,
+        pve.timeline_context,
+        pve.vulnerable_groups,
+        pve.contaminant_explanation,
+        pve.ai_generated_at,
+        pve.ai_model_version
+    FROM public_violation_explanations pve
+    WHERE pve.pwsid = system_pwsid
+    ORDER BY
+        -- Sort by severity (higher scores first)
+        COALESCE(pve.severity_score, 0) DESC,
+        -- Then by violation status priority
+        CASE pve.violation_status
+            WHEN 'Unaddressed' THEN 1
+            WHEN 'Addressed' THEN 2
+            WHEN 'Resolved' THEN 3
+            WHEN 'Archived' THEN 4
+            ELSE 5
+        END,
+        -- Finally by date (most recent first)
+        pve.non_compl_per_begin_date DESC;
+
+    -- If no results with explanations, fall back to basic violation data
+    IF NOT FOUND THEN
+        RETURN QUERY
+        SELECT
+            ve.violation_id,
+            ve.violation_code,
+            NULL::TEXT as violation_description,
+            ve.violation_status,
+            ve.is_health_based_ind,
+            ve.contaminant_code,
+            NULL::TEXT as contaminant_description,
+            ve.non_compl_per_begin_date,
+            ve.non_compl_per_end_date,
+            ve.public_notification_tier,
+            ve.viol_measure,
+            ve.unit_of_measure,
+            NULL::TEXT as explanation_text,
+            NULL::VARCHAR(10) as health_risk_level,
+            NULL::INTEGER as severity_score,
+            pws.pws_name,
+            pws.population_served_count,
+            geo.county_served,
+            geo.city_served,
+            NULL::TEXT as health_impact,
+            NULL::TEXT as recommended_actions,
+            NULL::TEXT as timeline_context,
+            NULL::TEXT as vulnerable_groups,
+            NULL::TEXT as contaminant_explanation,
+            NULL::TIMESTAMP WITH TIME ZONE as ai_generated_at,
+            NULL::VARCHAR(50) as ai_model_version
+        FROM violations_enforcement ve
+        LEFT JOIN public_water_systems pws ON ve.pwsid = pws.pwsid AND ve.submission_year_quarter = pws.submission_year_quarter
+        LEFT JOIN system_primary_area geo ON ve.pwsid = geo.pwsid AND ve.submission_year_quarter = geo.submission_year_quarter
+        WHERE ve.pwsid = system_pwsid
+        ORDER BY
+            -- Sort by health-based status
+            CASE WHEN ve.is_health_based_ind = 'Y' THEN 0 ELSE 1 END,
+            -- Then by violation status priority
+            CASE ve.violation_status
+                WHEN 'Unaddressed' THEN 1
+                WHEN 'Addressed' THEN 2
+                WHEN 'Resolved' THEN 3
+                WHEN 'Archived' THEN 4
+                ELSE 5
+            END,
+            -- Finally by date (most recent first)
+            ve.non_compl_per_begin_date DESC;
+    END IF;
+END;
+$$ LANGUAGE plpgsql;
+
+COMMENT ON FUNCTION get_violations_with_explanations IS 'Get violations for a system with AI explanations, fallback to basic data if no explanations available; one row per violation';
@@ -0,0 +1,167 @@
+-- Primary area stored in system_violation_summary
+-- system_health_dashboard and get_systems_sorted_after() looked up
+-- system_primary_area on every read. Past one quarter of data the planner switched
+-- to computing it for every system, closed ones included, before filtering to the
+-- active list. The summary now stores each system's county and city, so both read
+-- one materialized row per system and list pages stay index-only.
+
+-- ============================================================================
+-- SUMMARY WITH THE PRIMARY AREA
+-- ============================================================================
+
+-- Same definition as 20250104000007 plus county_served and city_served; the views
+-- that read it are rebuilt below
+DROP MATERIALIZED VIEW IF EXISTS system_violation_summary CASCADE;
+
+CREATE MATERIALIZED VIEW system_violation_summary AS
+SELECT
+    s.*,
+    ARRAY[
+        CASE s.health_status WHEN 'RED' THEN 1 WHEN 'YELLOW' THEN 2 ELSE 3 END,
+        -s.critical_violations,
+        -s.unaddressed_violations,
+        -COALESCE(s.population_served_count, 2147483647),
+        -(substr(s.submission_year_quarter, 1, 4)::bigint * 10 + substr(s.submission_year_quarter, 6, 1)::bigint)
+    ]::bigint[] AS sort_key
+FROM (
+    SELECT
+        p.submission_year_quarter,
+        p.pwsid,
+        p.pws_name,
+        p.pws_type_code,
+        p.pws_activity_code,
+        p.population_served_count,
+        p.state_code,
+        a.county_served,
+        a.city_served,
+        COALESCE(v.total_violations, 0) AS total_violations,
+        COALESCE(v.health_violations, 0) AS health_violations,
+        COALESCE(v.unaddressed_violations, 0) AS unaddressed_violations,
+        COALESCE(v.resolved_violations, 0) AS resolved_violations,
+        COALESCE(v.critical_violations, 0) AS critical_violations,
+        v.latest_violation_date,
+        CASE
+            WHEN COALESCE(v.critical_violations, 0) > 0 THEN 'RED'
+            WHEN COALESCE(v.health_violations, 0) > 0 THEN 'YELLOW'
+            ELSE 'GREEN'
+        END AS health_status
+    FROM public_water_systems p
+    JOIN system_primary_area a ON a.submission_year_quarter = p.submission_year_quarter AND a.pwsid = p.pwsid
+    LEFT JOIN (
+        SELECT
+            submission_year_quarter,
+            pwsid,
+            COUNT(*) AS total_violations,
+            COUNT(*) FILTER (WHERE is_health_based_ind = 'Y') AS health_violations,
+            COUNT(*) FILTER (WHERE violation_status = 'Unaddressed') AS unaddressed_violations,
+            COUNT(*) FILTER (WHERE violation_status = 'Resolved') AS resolved_violations,
+            COUNT(*) FILTER (WHERE is_health_based_ind = 'Y' AND violation_status = 'Unaddressed') AS critical_violations,
+            MAX(non_compl_per_begin_date) AS latest_violation_date
+        FROM violations_enforcement
+        GROUP BY submission_year_quarter, pwsid
+    ) v ON v.submission_year_quarter = p.submission_year_quarter AND v.pwsid = p.pwsid
+) s;
+
+-- Required by REFRESH ... CONCURRENTLY
+CREATE UNIQUE INDEX idx_system_violation_summary_key
+    ON system_violation_summary(submission_year_quarter, pwsid);
+CREATE INDEX idx_system_violation_summary_status
+    ON system_violation_summary(health_status) WHERE pws_activity_code = 'A';
+-- Pages of the active list are range scans; the listed columns make them index-only
+CREATE INDEX idx_system_violation_summary_sort
+    ON system_violation_summary(sort_key, pwsid)
+    INCLUDE (pws_name, pws_type_code, population_served_count, county_served, city_served, health_status, critical_violations, unaddressed_violations, submission_year_quarter)
+    WHERE pws_activity_code = 'A';
+
+COMMENT ON MATERIALIZED VIEW system_violation_summary IS 'Violation counts, health status and primary area per system and quarter; refreshed by refresh_system_violation_summary() after imports';
+COMMENT ON COLUMN system_violation_summary.sort_key IS 'Worst-first list position: status rank, then negated critical, unaddressed, population and quarter';
+COMMENT ON COLUMN system_violation_summary.county_served IS 'County from system_primary_area';
+
+-- ============================================================================
+-- VIEWS AND RPC
+-- ============================================================================
+
+CREATE OR REPLACE VIEW current_violations_summary AS
+SELECT
+    s.pwsid,
+    s.pws_name,
+    s.pws_type_code,
+    s.population_served_count,
+    s.state_code,
+    s.total_violations,
+    s.health_violations,
+    s.unaddressed_violations,
+    s.resolved_violations,
+    s.latest_violation_date
+FROM system_violation_summary s;
+
+CREATE OR REPLACE VIEW system_health_dashboard AS
+SELECT
+    s.pwsid,
+    s.pws_name,
+    s.pws_type_code,
+    s.population_served_count,
+    s.county_served,
+    s.city_served,
+    s.health_status,
+    s.critical_violations,
+    s.unaddressed_violations AS total_unaddressed
+FROM system_violation_summary s
+WHERE s.pws_activity_code = 'A';
+
+-- county_summary keeps one row per county a system serves: a system in two counties
+-- counts toward both, which is what a per-county total means
+CREATE OR REPLACE VIEW county_summary AS
+SELECT
+    g.county_served,
+    g.state_served,
+    COUNT(DISTINCT s.pwsid) as total_systems,
+    SUM(s.population_served_count) as total_population,
+    SUM(s.critical_violations)::bigint as critical_violations,
+    SUM(s.total_violations)::bigint as total_violations
+FROM geographic_areas g
+JOIN system_violation_summary s ON s.pwsid = g.pwsid AND s.submission_year_quarter = g.submission_year_quarter
+WHERE g.area_type_code = 'CN'
+GROUP BY g.county_served, g.state_served;
+
+COMMENT ON VIEW system_health_dashboard IS 'Health status per active system, read from system_violation_summary; one row per system and quarter';
+COMMENT ON VIEW current_violations_summary IS 'Violation statistics per system, read from system_violation_summary';
+COMMENT ON VIEW county_summary IS 'County totals, read from system_violation_summary';
+
+CREATE OR REPLACE FUNCTION get_systems_sorted_after(
+    after_sort_key BIGINT[] DEFAULT NULL,
+    after_pwsid VARCHAR(9) DEFAULT NULL,
+    page_limit INTEGER DEFAULT 20
+)
+RETURNS TABLE (
+    pwsid VARCHAR(9),
+    pws_name VARCHAR(100),
+    pws_type_code VARCHAR(6),
+    population_served_count INTEGER,
+    county_served VARCHAR(40),
+    city_served VARCHAR(40),
+    health_status TEXT,
+    critical_violations BIGINT,
+    total_unaddressed BIGINT,
+    sort_key BIGINT[]
+) AS $$
+BEGIN
+    RETURN QUERY
+    SELECT
+        s.pwsid,
+        s.pws_name,
+        s.pws_type_code,
+        s.population_served_count,
+        s.county_served,
+        s.city_served,
+        s.health_status,
+        s.critical_violations,
+        s.unaddressed_violations,
+        s.sort_key
+    FROM system_violation_summary s
+    WHERE s.pws_activity_code = 'A'
+      AND (after_sort_key IS NULL OR (s.sort_key, s.pwsid) > (after_sort_key, after_pwsid))
+    ORDER BY s.sort_key, s.pwsid
+    LIMIT page_limit;
+END;
+$$ LANGUAGE plpgsql STABLE;
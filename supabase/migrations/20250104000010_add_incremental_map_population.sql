@@ -0,0 +1,396 @@
+-- Incremental, per-quarter map data
+-- populate_water_system_locations(), get_systems_needing_geocoding() and
+-- update_system_coordinates() only looked at 2025Q1, and populate_violation_locations()
+-- anti-joined every violation on each call without ever updating or removing a marker.
+-- The functions now take the quarter (NULL for every quarter) and upsert only rows
+-- whose source changed since a given time. sync_map_locations() tracks that time per
+-- quarter and runs both; scripts/import_data.py calls it after every import of
+-- systems or violations.
+
+-- ============================================================================
+-- KEYS AND INDEXES
+-- ============================================================================
+
+-- A violation has one marker per quarter (the original key allowed one in total)
+ALTER TABLE violation_locations
+    DROP CONSTRAINT IF EXISTS violation_locations_violation_id_pwsid_key;
+
+ALTER TABLE violation_locations
+    ADD CONSTRAINT violation_locations_natural_key
+    UNIQUE (submission_year_quarter, pwsid, violation_id);
+
+-- Rows an import touched (updated_at is set on insert, update and removal)
+CREATE INDEX IF NOT EXISTS idx_pws_quarter_updated
+    ON public_water_systems(submission_year_quarter, updated_at);
+CREATE INDEX IF NOT EXISTS idx_violations_quarter_updated
+    ON violations_enforcement(submission_year_quarter, updated_at);
+
+-- Coordinates carried over from another quarter at the same address
+CREATE INDEX IF NOT EXISTS idx_wsl_pwsid_address
+    ON water_system_locations(pwsid, full_address) WHERE geocoded_at IS NOT NULL;
+
+-- Removing a system location sets its markers' water_system_location_id to NULL
+CREATE INDEX IF NOT EXISTS idx_vl_system_location
+    ON violation_locations(water_system_location_id);
+CREATE INDEX IF NOT EXISTS idx_vl_orphaned
+    ON violation_locations(submission_year_quarter) WHERE water_system_location_id IS NULL;
+
+COMMENT ON CONSTRAINT violation_locations_natural_key ON violation_locations IS 'One map marker per violation and quarter';
+
+-- ============================================================================
+-- SYNC STATE
+-- ============================================================================
+
+CREATE TABLE IF NOT EXISTS map_location_syncs (
+    submission_year_quarter VARCHAR(7) PRIMARY KEY,
+    synced_at TIMESTAMP WITH TIME ZONE NOT NULL,
+    systems_changed INTEGER NOT NULL DEFAULT 0,
+    violations_changed INTEGER NOT NULL DEFAULT 0
+);
+
+COMMENT ON TABLE map_location_syncs IS 'When sync_map_locations() last brought each quarter''s map tables up to date';
+
+-- ============================================================================
+-- POPULATION
+-- ============================================================================
+
+-- The no-argument versions would make calls with defaults ambiguous
+DROP FUNCTION IF EXISTS populate_water_system_locations();
+DROP FUNCTION IF EXISTS populate_violation_locations();
+DROP FUNCTION IF EXISTS get_systems_needing_geocoding(INTEGER);
+DROP FUNCTION IF EXISTS update_system_coordinates(VARCHAR, DECIMAL, DECIMAL, VARCHAR, VARCHAR, DECIMAL);
+
+-- Upserts the location row of every active system in target_quarter (NULL for all
+-- quarters) changed after changed_since (NULL for all), and removes the rows of
+-- systems that closed or left the export. A new row, or a row whose address
+-- changed, takes the coordinates of the same address in another quarter, so
+-- systems are geocoded once rather than once per quarter.
+-- Returns the number of rows inserted, updated or removed.
+CREATE OR REPLACE FUNCTION populate_water_system_locations(
+    target_quarter VARCHAR(7) DEFAULT NULL,
+    changed_since TIMESTAMP WITH TIME ZONE DEFAULT NULL
+)
+RETURNS INTEGER AS $$
+DECLARE
+    upserted_count INTEGER := 0;
+    removed_count INTEGER := 0;
+BEGIN
+    DELETE FROM water_system_locations wsl
+    USING public_water_systems p
+    WHERE p.submission_year_quarter = wsl.submission_year_quarter
+        AND p.pwsid = wsl.pwsid
+        AND (target_quarter IS NULL OR p.submission_year_quarter = target_quarter)
+        AND (changed_since IS NULL OR p.updated_at > changed_since)
+        AND (p.pws_activity_code IS DISTINCT FROM 'A' OR p.removed_at IS NOT NULL);
+    GET DIAGNOSTICS removed_count = ROW_COUNT;
+
+    INSERT INTO water_system_locations AS wsl (
+        pwsid,
+        submission_year_quarter,
+        address_line1,
+        address_line2,
+        city_name,
+        state_code,
+        zip_code,
+        full_address,
+        latitude,
+        longitude,
+        geocoded_at,
+        geocoding_accuracy,
+        geocoding_source,
+        geocoding_confidence
+    )
+    SELECT
+        s.pwsid,
+        s.submission_year_quarter,
+        s.address_line1,
+        s.address_line2,
+        s.city_name,
+        s.state_code,
+        s.zip_code,
+        s.full_address,
+        prev.latitude,
+        prev.longitude,
+        prev.geocoded_at,
+        prev.geocoding_accuracy,
+        prev.geocoding_source,
+        prev.geocoding_confidence
+    FROM (
+        SELECT
+            p.pwsid,
+            p.submission_year_quarter,
+            p.address_line1,
+            p.address_line2,
+            p.city_name,
+            p.state_code,
+            p.zip_code,
+            CASE
+                WHEN p.address_line1 IS NOT NULL AND p.city_name IS NOT NULL AND p.state_code IS NOT NULL THEN
+                    CONCAT(
+                        COALESCE(p.address_line1, ''),
+                        CASE WHEN p.address_line2 IS NOT NULL AND p.address_line2 != '' THEN ', ' || p.address_line2 ELSE '' END,
+                        ', ', COALESCE(p.city_name, ''),
+                        ', ', COALESCE(p.state_code, ''),
+                        CASE WHEN p.zip_code IS NOT NULL AND p.zip_code != '' THEN ' ' || p.zip_code ELSE '' END
+                    )
+                ELSE NULL
+            END as full_address
+        FROM public_water_systems p
+        WHERE (target_quarter IS NULL OR p.submission_year_quarter = target_quarter)
+            AND (changed_since IS NULL OR p.updated_at > changed_since)
+            AND p.pws_activity_code = 'A'
+            AND p.removed_at IS NULL
+    ) s
+    LEFT JOIN LATERAL (
+        SELECT w.latitude, w.longitude, w.geocoded_at, w.geocoding_accuracy, w.geocoding_source, w.geocoding_confidence
+        FROM water_system_locations w
+        WHERE w.pwsid = s.pwsid
+            AND w.full_address = s.full_address
+            AND w.geocoded_at IS NOT NULL
+            AND w.submission_year_quarter <> s.submission_year_quarter
+        ORDER BY w.geocoded_at DESC
+        LIMIT 1
+    ) prev ON TRUE
+    ON CONFLICT (pwsid, submission_year_quarter) DO UPDATE SET
+        address_line1 = EXCLUDED.address_line1,
+        address_line2 = EXCLUDED.address_line2,
+        city_name = EXCLUDED.city_name,
+        state_code = EXCLUDED.state_code,
+        zip_code = EXCLUDED.zip_code,
+        full_address = EXCLUDED.full_address,
+        -- A new address is geocoded again, unless another quarter already has it
+        latitude = CASE WHEN wsl.full_address IS DISTINCT FROM EXCLUDED.full_address THEN EXCLUDED.latitude ELSE wsl.latitude END,
+        longitude = CASE WHEN wsl.full_address IS DISTINCT FROM EXCLUDED.full_address THEN EXCLUDED.longitude ELSE wsl.longitude END,
+        geocoded_at = CASE WHEN wsl.full_address IS DISTINCT FROM EXCLUDED.full_address THEN EXCLUDED.geocoded_at ELSE wsl.geocoded_at END,
+        geocoding_accuracy = CASE WHEN wsl.full_address IS DISTINCT FROM EXCLUDED.full_address THEN EXCLUDED.geocoding_accuracy ELSE wsl.geocoding_accuracy END,
+        geocoding_source = CASE WHEN wsl.full_address IS DISTINCT FROM EXCLUDED.full_address THEN EXCLUDED.geocoding_source ELSE wsl.geocoding_source END,
+        geocoding_confidence = CASE WHEN wsl.full_address IS DISTINCT FROM EXCLUDED.full_address THEN EXCLUDED.geocoding_confidence ELSE wsl.geocoding_confidence END
+    WHERE (wsl.address_line1, wsl.address_line2, wsl.city_name, wsl.state_code, wsl.zip_code, wsl.full_address)
+        IS DISTINCT FROM
+          (EXCLUDED.address_line1, EXCLUDED.address_line2, EXCLUDED.city_name, EXCLUDED.state_code, EXCLUDED.zip_code, EXCLUDED.full_address);
+    GET DIAGNOSTICS upserted_count = ROW_COUNT;
+
+    RETURN upserted_count + removed_count;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Upserts the marker of every violation in target_quarter (NULL for all quarters)
+-- whose violation or system changed after changed_since (NULL for all), and removes
+-- markers of removed violations and of systems without a location row.
+-- Returns the number of rows inserted, updated or removed.
+CREATE OR REPLACE FUNCTION populate_violation_locations(
+    target_quarter VARCHAR(7) DEFAULT NULL,
+    changed_since TIMESTAMP WITH TIME ZONE DEFAULT NULL
+)
+RETURNS INTEGER AS $$
+DECLARE
+    upserted_count INTEGER := 0;
+    removed_count INTEGER := 0;
+    orphaned_count INTEGER := 0;
+BEGIN
+    DELETE FROM violation_locations vl
+    USING violations_enforcement v
+    WHERE v.submission_year_quarter = vl.submission_year_quarter
+        AND v.pwsid = vl.pwsid
+        AND v.violation_id = vl.violation_id
+        AND (target_quarter IS NULL OR v.submission_year_quarter = target_quarter)
+        AND (changed_since IS NULL OR v.updated_at > changed_since)
+        AND v.removed_at IS NOT NULL;
+    GET DIAGNOSTICS removed_count = ROW_COUNT;
+
+    -- Removing a system location sets water_system_location_id to NULL
+    DELETE FROM violation_locations vl
+    WHERE (target_quarter IS NULL OR vl.submission_year_quarter = target_quarter)
+        AND vl.water_system_location_id IS NULL;
+    GET DIAGNOSTICS orphaned_count = ROW_COUNT;
+
+    -- Violations that changed, and every violation of a system that changed
+    -- (population and school flag feed the severity score). Staged and analyzed
+    -- so the planner knows how many there are: right after a load it would
+    -- otherwise guess a handful and score every violation once per changed row.
+    CREATE TEMP TABLE changed_violations ON COMMIT DROP AS
+    SELECT c.submission_year_quarter, c.pwsid, c.violation_id
+    FROM violations_enforcement c
+    WHERE (target_quarter IS NULL OR c.submission_year_quarter = target_quarter)
+        AND (changed_since IS NULL OR c.updated_at > changed_since)
+    UNION
+    SELECT c.submission_year_quarter, c.pwsid, c.violation_id
+    FROM public_water_systems p
+    JOIN violations_enforcement c ON c.submission_year_quarter = p.submission_year_quarter
+        AND c.pwsid = p.pwsid
+    WHERE changed_since IS NOT NULL
+        AND (target_quarter IS NULL OR p.submission_year_quarter = target_quarter)
+        AND p.updated_at > changed_since;
+    ANALYZE changed_violations;
+
+    INSERT INTO violation_locations AS vl (
+        violation_id,
+        pwsid,
+        submission_year_quarter,
+        water_system_location_id,
+        facility_id,
+        severity_level,
+        map_color,
+        is_health_based,
+        is_unaddressed,
+        violation_begin_date,
+        violation_end_date
+    )
+    SELECT
+        v.violation_id,
+        v.pwsid,
+        v.submission_year_quarter,
+        wsl.id as water_system_location_id,
+        v.facility_id,
+        s.map_severity_level as severity_level,
+        s.map_color,
+        (v.is_health_based_ind = 'Y') as is_health_based,
+        (v.violation_status = 'Unaddressed') as is_unaddressed,
+        v.non_compl_per_begin_date,
+        v.non_compl_per_end_date
+    FROM changed_violations changed
+    JOIN violations_enforcement v ON v.submission_year_quarter = changed.submission_year_quarter
+        AND v.pwsid = changed.pwsid
+        AND v.violation_id = changed.violation_id
+    JOIN water_system_locations wsl ON wsl.submission_year_quarter = v.submission_year_quarter
+        AND wsl.pwsid = v.pwsid
+    JOIN violation_severity_scores() s ON s.submission_year_quarter = v.submission_year_quarter
+        AND s.pwsid = v.pwsid
+        AND s.violation_id = v.violation_id
+    WHERE v.removed_at IS NULL
+        AND (target_quarter IS NULL OR s.submission_year_quarter = target_quarter)
+    ON CONFLICT (submission_year_quarter, pwsid, violation_id) DO UPDATE SET
+        water_system_location_id = EXCLUDED.water_system_location_id,
+        facility_id = EXCLUDED.facility_id,
+        severity_level = EXCLUDED.severity_level,
+        map_color = EXCLUDED.map_color,
+        is_health_based = EXCLUDED.is_health_based,
+        is_unaddressed = EXCLUDED.is_unaddressed,
+        violation_begin_date = EXCLUDED.violation_begin_date,
+        violation_end_date = EXCLUDED.violation_end_date
+    WHERE (vl.water_system_location_id, vl.facility_id, vl.severity_level, vl.map_color, vl.is_health_based,
+           vl.is_unaddressed, vl.violation_begin_date, vl.violation_end_date)
+        IS DISTINCT FROM
+          (EXCLUDED.water_system_location_id, EXCLUDED.facility_id, EXCLUDED.severity_level, EXCLUDED.map_color,
+           EXCLUDED.is_health_based, EXCLUDED.is_unaddressed, EXCLUDED.violation_begin_date, EXCLUDED.violation_end_date);
+    GET DIAGNOSTICS upserted_count = ROW_COUNT;
+
+    DROP TABLE changed_violations;
+    RETURN upserted_count + removed_count + orphaned_count;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Brings the map tables of target_quarter (NULL for every loaded quarter) up to date
+-- with the rows changed since that quarter's last sync. The first sync of a quarter
+-- covers all of its rows. The sync time is this transaction's start, so call it
+-- after the import has committed.
+CREATE OR REPLACE FUNCTION sync_map_locations(target_quarter VARCHAR(7) DEFAULT NULL)
+RETURNS TABLE (quarter VARCHAR(7), systems_changed INTEGER, violations_changed INTEGER) AS $$
+DECLARE
+    last_synced TIMESTAMP WITH TIME ZONE;
+BEGIN
+    FOR quarter IN
+        SELECT DISTINCT p.submission_year_quarter
+        FROM public_water_systems p
+        WHERE target_quarter IS NULL OR p.submission_year_quarter = target_quarter
+        ORDER BY 1
+    LOOP
+        SELECT m.synced_at INTO last_synced
+        FROM map_location_syncs m
+        WHERE m.submission_year_quarter = quarter;
+
+        systems_changed := populate_water_system_locations(quarter, last_synced);
+        violations_changed := populate_violation_locations(quarter, last_synced);
+
+        INSERT INTO map_location_syncs AS m (submission_year_quarter, synced_at, systems_changed, violations_changed)
+        VALUES (quarter, NOW(), sync_map_locations.systems_changed, sync_map_locations.violations_changed)
+        ON CONFLICT (submission_year_quarter) DO UPDATE SET
+            synced_at = EXCLUDED.synced_at,
+            systems_changed = EXCLUDED.systems_changed,
+            violations_changed = EXCLUDED.violations_changed;
+
+        RETURN NEXT;
+    END LOOP;
+END;
+$$ LANGUAGE plpgsql;
+
+-- ============================================================================
+-- GEOCODING
+-- ============================================================================
+
+-- Systems still without coordinates in target_quarter (NULL for the latest quarter)
+CREATE OR REPLACE FUNCTION get_systems_needing_geocoding(
+    limit_count INTEGER DEFAULT 100,
+    target_quarter VARCHAR(7) DEFAULT NULL
+)
+RETURNS TABLE (
+    pwsid VARCHAR(9),
+    pws_name VARCHAR(100),
+    full_address TEXT,
+    population_served INTEGER
+) AS $$
+BEGIN
+    RETURN QUERY
+    SELECT
+        wsl.pwsid,
+        p.pws_name,
+        wsl.full_address,
+        p.population_served_count
+    FROM water_system_locations wsl
+    JOIN public_water_systems p ON wsl.pwsid = p.pwsid
+        AND wsl.submission_year_quarter = p.submission_year_quarter
+    WHERE wsl.submission_year_quarter = COALESCE(
+            target_quarter,
+            (SELECT MAX(l.submission_year_quarter) FROM water_system_locations l)
+        )
+        AND wsl.full_address IS NOT NULL
+        AND wsl.latitude IS NULL
+        AND wsl.longitude IS NULL
+        AND p.pws_activity_code = 'A'
+    ORDER BY p.population_served_count DESC NULLS LAST
+    LIMIT limit_count;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Sets the coordinates of a system in target_quarter, or with NULL, in every
+-- quarter where it has the same address as in its latest quarter
+CREATE OR REPLACE FUNCTION update_system_coordinates(
+    system_pwsid VARCHAR(9),
+    lat DECIMAL(10, 8),
+    lng DECIMAL(11, 8),
+    accuracy VARCHAR(20) DEFAULT 'APPROXIMATE',
+    source VARCHAR(50) DEFAULT 'manual',
+    confidence DECIMAL(3, 2) DEFAULT 0.8,
+    target_quarter VARCHAR(7) DEFAULT NULL
+) RETURNS BOOLEAN AS $$
+BEGIN
+    UPDATE water_system_locations wsl
+    SET
+        latitude = lat,
+        longitude = lng,
+        geom = ST_SetSRID(ST_MakePoint(lng, lat), 4326),
+        geocoded_at = NOW(),
+        geocoding_accuracy = accuracy,
+        geocoding_source = source,
+        geocoding_confidence = confidence,
+        updated_at = NOW()
+    WHERE wsl.pwsid = system_pwsid
+        AND CASE
+            WHEN target_quarter IS NOT NULL THEN wsl.submission_year_quarter = target_quarter
+            ELSE wsl.full_address IS NOT DISTINCT FROM (
+                SELECT l.full_address FROM water_system_locations l
+                WHERE l.pwsid = system_pwsid
+                ORDER BY l.submission_year_quarter DESC
+                LIMIT 1
+            )
+        END;
+
+    RETURN FOUND;
+END;
+$$ LANGUAGE plpgsql;
+
+COMMENT ON FUNCTION populate_water_system_locations(VARCHAR, TIMESTAMP WITH TIME ZONE) IS 'Upserts location rows of systems changed since the given time, for one quarter or all';
+COMMENT ON FUNCTION populate_violation_locations(VARCHAR, TIMESTAMP WITH TIME ZONE) IS 'Upserts map markers of violations changed since the given time, for one quarter or all';
+COMMENT ON FUNCTION sync_map_locations(VARCHAR) IS 'Applies changes since the last sync to the map tables of one quarter or all; called by import_data.py';
+COMMENT ON FUNCTION get_systems_needing_geocoding(INTEGER, VARCHAR) IS 'Active systems without coordinates in a quarter (default latest), largest first';
+COMMENT ON FUNCTION update_system_coordinates(VARCHAR, DECIMAL, DECIMAL, VARCHAR, VARCHAR, DECIMAL, VARCHAR) IS 'Stores geocoded coordinates for a system in one quarter, or every quarter at its current address';
@@ -0,0 +1,45 @@
+-- Batch geocoding support for scripts/geocode_systems.py
+-- A persistent cache of what each backend answered for a normalized address, and
+-- ZIP and city centroids from the Census gazetteer so systems can be placed
+-- without any network access.
+
+-- ============================================================================
+-- ADDRESS CACHE
+-- ============================================================================
+
+-- One answer per normalized address and backend. A row without coordinates means
+-- the backend found no match; it is not asked again unless --retry-misses is given.
+CREATE TABLE IF NOT EXISTS geocoding_cache (
+    address_key TEXT NOT NULL,
+    backend VARCHAR(50) NOT NULL,
+    latitude DECIMAL(10, 8),
+    longitude DECIMAL(11, 8),
+    geocoding_accuracy VARCHAR(20),
+    geocoding_source VARCHAR(50),
+    geocoding_confidence DECIMAL(3, 2),
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    PRIMARY KEY (address_key, backend)
+);
+
+-- ============================================================================
+-- GAZETTEER CENTROIDS
+-- ============================================================================
+
+-- Internal points of ZIP code tabulation areas (kind 'zip', key is the 5-digit ZIP)
+-- and of places (kind 'place', key is 'CITY|ST' normalized like the addresses)
+CREATE TABLE IF NOT EXISTS geocoding_gazetteer (
+    kind VARCHAR(10) NOT NULL CHECK (kind IN ('zip', 'place')),
+    place_key VARCHAR(150) NOT NULL,
+    name VARCHAR(150),
+    latitude DECIMAL(10, 8) NOT NULL,
+    longitude DECIMAL(11, 8) NOT NULL,
+    PRIMARY KEY (kind, place_key)
+);
+
+-- Pending rows for the batch geocoder
+CREATE INDEX IF NOT EXISTS idx_wsl_pending_geocoding
+    ON water_system_locations(submission_year_quarter)
+    WHERE latitude IS NULL AND full_address IS NOT NULL;
+
+COMMENT ON TABLE geocoding_cache IS 'Coordinates (or no match) each geocoding backend returned for a normalized address';
+COMMENT ON TABLE geocoding_gazetteer IS 'Census gazetteer ZIP and place centroids for offline geocoding';
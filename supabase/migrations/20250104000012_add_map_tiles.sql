@@ -0,0 +1,379 @@
+-- Server-side map tiles
+-- The app fetched every row of violations_map_data and clustered the markers on the
+-- device. These RPCs return one web-mercator tile (z/x/y, 256 px) of clusters,
+-- either as rows or as a Mapbox Vector Tile, found through idx_wsl_geom. Each tile
+-- is built once per quarter and kept in map_tile_cache; triggers on the map tables
+-- drop the cached tiles that contain a changed location.
+
+-- ============================================================================
+-- TILE GRID
+-- ============================================================================
+
+-- Zoom levels served; above this the app can zoom the last tiles in
+-- (20 is roughly one building per tile)
+CREATE OR REPLACE FUNCTION map_max_zoom()
+RETURNS INTEGER AS $$
+    SELECT 20;
+$$ LANGUAGE sql IMMUTABLE;
+
+-- Position in tile units at zoom z: floor() is the tile column or row, and the
+-- fraction the position within the tile. Tiles are half open (west and north edges
+-- inclusive), so every point belongs to exactly one tile per zoom.
+CREATE OR REPLACE FUNCTION map_world_x(lng DOUBLE PRECISION, z INTEGER)
+RETURNS DOUBLE PRECISION AS $$
+    SELECT (lng + 180) / 360 * 2 ^ z;
+$$ LANGUAGE sql IMMUTABLE;
+
+CREATE OR REPLACE FUNCTION map_world_y(lat DOUBLE PRECISION, z INTEGER)
+RETURNS DOUBLE PRECISION AS $$
+    SELECT (1 - ln(tan(radians(lat)) + 1 / cos(radians(lat))) / pi()) / 2 * 2 ^ z;
+$$ LANGUAGE sql IMMUTABLE;
+
+-- Tile bounds in degrees
+CREATE OR REPLACE FUNCTION map_tile_bounds(z INTEGER, x INTEGER, y INTEGER)
+RETURNS TABLE (west DOUBLE PRECISION, south DOUBLE PRECISION, east DOUBLE PRECISION, north DOUBLE PRECISION) AS $$
+    SELECT
+        x / 2 ^ z * 360 - 180,
+        degrees(atan(sinh(pi() * (1 - 2 * (y + 1) / 2 ^ z)))),
+        (x + 1) / 2 ^ z * 360 - 180,
+        degrees(atan(sinh(pi() * (1 - 2 * y / 2 ^ z))));
+$$ LANGUAGE sql IMMUTABLE;
+
+-- ============================================================================
+-- TILE CACHE
+-- ============================================================================
+
+CREATE TABLE IF NOT EXISTS map_tile_cache (
+    submission_year_quarter VARCHAR(7) NOT NULL,
+    z SMALLINT NOT NULL,
+    x INTEGER NOT NULL,
+    y INTEGER NOT NULL,
+    clusters JSONB NOT NULL,
+    mvt BYTEA, -- encoded from clusters on the first vector tile request
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    PRIMARY KEY (submission_year_quarter, z, x, y)
+);
+
+COMMENT ON TABLE map_tile_cache IS 'Clustered violation markers per map tile and quarter; rows are dropped when a location in the tile changes';
+
+-- Drops the cached tiles, at every zoom, that contain a changed location
+CREATE OR REPLACE FUNCTION invalidate_map_tiles()
+RETURNS TRIGGER AS $$
+DECLARE
+    quarters VARCHAR(7)[] := '{}';
+    latitudes DOUBLE PRECISION[] := '{}';
+    longitudes DOUBLE PRECISION[] := '{}';
+BEGIN
+    IF TG_OP = 'TRUNCATE' THEN
+        DELETE FROM map_tile_cache;
+        RETURN NULL;
+    END IF;
+
+    -- A transition table can only be read by the triggers that declare it
+    IF TG_TABLE_NAME = 'water_system_locations' THEN
+        IF TG_OP IN ('INSERT', 'UPDATE') THEN
+            SELECT quarters || array_agg(r.submission_year_quarter), latitudes || array_agg(r.latitude::double precision),
+                   longitudes || array_agg(r.longitude::double precision)
+            INTO quarters, latitudes, longitudes
+            FROM new_rows r WHERE r.latitude IS NOT NULL;
+        END IF;
+        IF TG_OP IN ('UPDATE', 'DELETE') THEN
+            SELECT quarters || array_agg(r.submission_year_quarter), latitudes || array_agg(r.latitude::double precision),
+                   longitudes || array_agg(r.longitude::double precision)
+            INTO quarters, latitudes, longitudes
+            FROM old_rows r WHERE r.latitude IS NOT NULL;
+        END IF;
+    ELSE
+        -- Markers are drawn at their system's location
+        IF TG_OP IN ('INSERT', 'UPDATE') THEN
+            SELECT quarters || array_agg(wsl.submission_year_quarter), latitudes || array_agg(wsl.latitude::double precision),
+                   longitudes || array_agg(wsl.longitude::double precision)
+            INTO quarters, latitudes, longitudes
+            FROM water_system_locations wsl
+            WHERE wsl.id IN (SELECT r.water_system_location_id FROM new_rows r) AND wsl.latitude IS NOT NULL;
+        END IF;
+        IF TG_OP IN ('UPDATE', 'DELETE') THEN
+            SELECT quarters || array_agg(wsl.submission_year_quarter), latitudes || array_agg(wsl.latitude::double precision),
+                   longitudes || array_agg(wsl.longitude::double precision)
+            INTO quarters, latitudes, longitudes
+            FROM water_system_locations wsl
+            WHERE wsl.id IN (SELECT r.water_system_location_id FROM old_rows r) AND wsl.latitude IS NOT NULL;
+        END IF;
+    END IF;
+
+    IF cardinality(quarters) > 0 THEN
+        DELETE FROM map_tile_cache c
+        USING (
+            SELECT DISTINCT
+                p.submission_year_quarter,
+                zoom.z,
+                floor(map_world_x(p.longitude, zoom.z))::integer AS x,
+                floor(map_world_y(p.latitude, zoom.z))::integer AS y
+            FROM unnest(quarters, latitudes, longitudes) AS p(submission_year_quarter, latitude, longitude)
+            CROSS JOIN generate_series(0, map_max_zoom()) AS zoom(z)
+        ) t
+        WHERE c.submission_year_quarter = t.submission_year_quarter
+            AND c.z = t.z
+            AND c.x = t.x
+            AND c.y = t.y;
+    END IF;
+
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Transition tables need one trigger per event
+DROP TRIGGER IF EXISTS trigger_wsl_tiles_insert ON water_system_locations;
+DROP TRIGGER IF EXISTS trigger_wsl_tiles_update ON water_system_locations;
+DROP TRIGGER IF EXISTS trigger_wsl_tiles_delete ON water_system_locations;
+DROP TRIGGER IF EXISTS trigger_wsl_tiles_truncate ON water_system_locations;
+CREATE TRIGGER trigger_wsl_tiles_insert AFTER INSERT ON water_system_locations
+    REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION invalidate_map_tiles();
+CREATE TRIGGER trigger_wsl_tiles_update AFTER UPDATE ON water_system_locations
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION invalidate_map_tiles();
+CREATE TRIGGER trigger_wsl_tiles_delete AFTER DELETE ON water_system_locations
+    REFERENCING OLD TABLE AS old_rows FOR EACH STATEMENT EXECUTE FUNCTION invalidate_map_tiles();
+CREATE TRIGGER trigger_wsl_tiles_truncate AFTER TRUNCATE ON water_system_locations
+    FOR EACH STATEMENT EXECUTE FUNCTION invalidate_map_tiles();
+
+DROP TRIGGER IF EXISTS trigger_vl_tiles_insert ON violation_locations;
+DROP TRIGGER IF EXISTS trigger_vl_tiles_update ON violation_locations;
+DROP TRIGGER IF EXISTS trigger_vl_tiles_delete ON violation_locations;
+DROP TRIGGER IF EXISTS trigger_vl_tiles_truncate ON violation_locations;
+CREATE TRIGGER trigger_vl_tiles_insert AFTER INSERT ON violation_locations
+    REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION invalidate_map_tiles();
+CREATE TRIGGER trigger_vl_tiles_update AFTER UPDATE ON violation_locations
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION invalidate_map_tiles();
+CREATE TRIGGER trigger_vl_tiles_delete AFTER DELETE ON violation_locations
+    REFERENCING OLD TABLE AS old_rows FOR EACH STATEMENT EXECUTE FUNCTION invalidate_map_tiles();
+CREATE TRIGGER trigger_vl_tiles_truncate AFTER TRUNCATE ON violation_locations
+    FOR EACH STATEMENT EXECUTE FUNCTION invalidate_map_tiles();
+
+-- ============================================================================
+-- CLUSTERS
+-- ============================================================================
+
+-- Markers of one tile grouped into 32 px cells; from zoom 14 every location is its
+-- own cluster. Each cluster sits at the violation-weighted centre of its locations
+-- and takes the color of its most severe violation.
+CREATE OR REPLACE FUNCTION build_map_tile_clusters(z INTEGER, x INTEGER, y INTEGER, target_quarter VARCHAR(7))
+RETURNS JSONB AS $$
+    WITH locations AS (
+        SELECT
+            wsl.id,
+            wsl.pwsid,
+            wsl.latitude::double precision AS latitude,
+            wsl.longitude::double precision AS longitude,
+            COUNT(*) AS violation_count,
+            COUNT(*) FILTER (WHERE vl.severity_level = 'critical') AS critical_count,
+            COUNT(*) FILTER (WHERE vl.severity_level = 'warning') AS warning_count,
+            COUNT(*) FILTER (WHERE vl.severity_level = 'moderate') AS moderate_count,
+            COUNT(*) FILTER (WHERE vl.severity_level = 'low') AS low_count,
+            MAX(r.min_score) AS worst_score
+        FROM map_tile_bounds(z, x, y) b
+        JOIN water_system_locations wsl ON wsl.geom && ST_MakeEnvelope(b.west, b.south, b.east, b.north, 4326)
+        JOIN violation_locations vl ON vl.water_system_location_id = wsl.id
+        LEFT JOIN severity_risk_levels r ON r.map_severity_level = vl.severity_level
+        WHERE wsl.submission_year_quarter = target_quarter
+            -- The index search includes points on the edges; keep the ones this tile owns
+            AND floor(map_world_x(wsl.longitude::double precision, z)) = x
+            AND floor(map_world_y(wsl.latitude::double precision, z)) = y
+        GROUP BY wsl.id
+    ),
+    clusters AS (
+        SELECT
+            SUM(l.latitude * l.violation_count) / SUM(l.violation_count) AS latitude,
+            SUM(l.longitude * l.violation_count) / SUM(l.violation_count) AS longitude,
+            COUNT(*) AS location_count,
+            SUM(l.violation_count) AS violation_count,
+            SUM(l.critical_count) AS critical_count,
+            SUM(l.warning_count) AS warning_count,
+            SUM(l.moderate_count) AS moderate_count,
+            SUM(l.low_count) AS low_count,
+            MAX(l.worst_score) AS worst_score,
+            CASE WHEN COUNT(*) = 1 THEN MIN(l.pwsid) END AS pwsid
+        FROM locations l
+        GROUP BY
+            CASE WHEN z < 14 THEN floor((map_world_x(l.longitude, z) - x) * 256 / 32) END,
+            CASE WHEN z < 14 THEN floor((map_world_y(l.latitude, z) - y) * 256 / 32) END,
+            CASE WHEN z >= 14 THEN l.id END
+    )
+    SELECT COALESCE(jsonb_agg(jsonb_build_object(
+        'latitude', c.latitude,
+        'longitude', c.longitude,
+        'location_count', c.location_count,
+        'violation_count', c.violation_count,
+        'critical_count', c.critical_count,
+        'warning_count', c.warning_count,
+        'moderate_count', c.moderate_count,
+        'low_count', c.low_count,
+        'severity_level', r.map_severity_level,
+        'map_color', r.map_color,
+        'pwsid', c.pwsid
+    ) ORDER BY c.violation_count DESC), '[]'::jsonb)
+    FROM clusters c
+    LEFT JOIN severity_risk_levels r ON r.min_score = c.worst_score;
+$$ LANGUAGE sql STABLE;
+
+-- Clusters of tile z/x/y in target_quarter (NULL for the latest quarter), from the
+-- cache or built and cached
+CREATE OR REPLACE FUNCTION get_map_tile_clusters(
+    z INTEGER,
+    x INTEGER,
+    y INTEGER,
+    target_quarter VARCHAR(7) DEFAULT NULL
+)
+RETURNS JSONB AS $$
+DECLARE
+    quarter VARCHAR(7) := COALESCE(
+        target_quarter,
+        (SELECT MAX(l.submission_year_quarter) FROM water_system_locations l)
+    );
+    result JSONB;
+BEGIN
+    IF z NOT BETWEEN 0 AND map_max_zoom() OR x NOT BETWEEN 0 AND 2 ^ z - 1 OR y NOT BETWEEN 0 AND 2 ^ z - 1 THEN
+        RAISE EXCEPTION 'No map tile %/%/%', z, x, y;
+    END IF;
+
+    SELECT c.clusters INTO result
+    FROM map_tile_cache c
+    WHERE c.submission_year_quarter = quarter AND c.z = get_map_tile_clusters.z
+        AND c.x = get_map_tile_clusters.x AND c.y = get_map_tile_clusters.y;
+
+    IF result IS NULL THEN
+        result := build_map_tile_clusters(z, x, y, quarter);
+        INSERT INTO map_tile_cache (submission_year_quarter, z, x, y, clusters)
+        VALUES (quarter, z, x, y, result)
+        ON CONFLICT ON CONSTRAINT map_tile_cache_pkey DO NOTHING;
+    END IF;
+
+    RETURN result;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Tile z/x/y as a Mapbox Vector Tile with one 'violations' layer of cluster points
+-- carrying the cluster fields. PostgREST returns it as raw bytes when called with
+-- Accept: application/octet-stream.
+CREATE OR REPLACE FUNCTION get_map_tile(
+    z INTEGER,
+    x INTEGER,
+    y INTEGER,
+    target_quarter VARCHAR(7) DEFAULT NULL
+)
+RETURNS BYTEA AS $$
+DECLARE
+    quarter VARCHAR(7) := COALESCE(
+        target_quarter,
+        (SELECT MAX(l.submission_year_quarter) FROM water_system_locations l)
+    );
+    clusters JSONB := get_map_tile_clusters(z, x, y, quarter);
+    result BYTEA;
+BEGIN
+    SELECT c.mvt INTO result
+    FROM map_tile_cache c
+    WHERE c.submission_year_quarter = quarter AND c.z = get_map_tile.z
+        AND c.x = get_map_tile.x AND c.y = get_map_tile.y;
+
+    IF result IS NULL THEN
+        SELECT COALESCE(ST_AsMVT(t, 'violations', 4096, 'geom'), ''::bytea) INTO result
+        FROM (
+            SELECT
+                ST_AsMVTGeom(
+                    ST_Transform(ST_SetSRID(ST_MakePoint(c.longitude, c.latitude), 4326), 3857),
+                    ST_TileEnvelope(z, x, y)
+                ) AS geom,
+                c.location_count,
+                c.violation_count,
+                c.critical_count,
+                c.warning_count,
+                c.moderate_count,
+                c.low_count,
+                c.severity_level,
+                c.map_color,
+                c.pwsid
+            FROM jsonb_to_recordset(clusters) AS c(
+                latitude DOUBLE PRECISION,
+                longitude DOUBLE PRECISION,
+                location_count INTEGER,
+                violation_count INTEGER,
+                critical_count INTEGER,
+                warning_count INTEGER,
+                moderate_count INTEGER,
+                low_count INTEGER,
+                severity_level TEXT,
+                map_color TEXT,
+                pwsid TEXT
+            )
+        ) t;
+
+        UPDATE map_tile_cache c SET mvt = result
+        WHERE c.submission_year_quarter = quarter AND c.z = get_map_tile.z
+            AND c.x = get_map_tile.x AND c.y = get_map_tile.y;
+    END IF;
+
+    RETURN result;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Clusters inside a bounding box at zoom_level, assembled from the cached tiles that
+-- cover it. At most 64 tiles: a phone screen needs about a dozen.
+CREATE OR REPLACE FUNCTION get_map_clusters(
+    min_lng DOUBLE PRECISION,
+    min_lat DOUBLE PRECISION,
+    max_lng DOUBLE PRECISION,
+    max_lat DOUBLE PRECISION,
+    zoom_level INTEGER,
+    target_quarter VARCHAR(7) DEFAULT NULL
+)
+RETURNS TABLE (
+    latitude DOUBLE PRECISION,
+    longitude DOUBLE PRECISION,
+    location_count INTEGER,
+    violation_count INTEGER,
+    critical_count INTEGER,
+    warning_count INTEGER,
+    moderate_count INTEGER,
+    low_count INTEGER,
+    severity_level TEXT,
+    map_color TEXT,
+    pwsid TEXT
+) AS $$
+DECLARE
+    z INTEGER := LEAST(GREATEST(zoom_level, 0), map_max_zoom());
+    last_tile INTEGER := 2 ^ z - 1;
+    -- Web mercator stops short of the poles
+    min_x INTEGER := GREATEST(floor(map_world_x(min_lng, z)), 0);
+    max_x INTEGER := LEAST(floor(map_world_x(max_lng, z)), last_tile);
+    min_y INTEGER := GREATEST(floor(map_world_y(LEAST(max_lat, 85.05), z)), 0);
+    max_y INTEGER := LEAST(floor(map_world_y(GREATEST(min_lat, -85.05), z)), last_tile);
+BEGIN
+    IF (max_x - min_x + 1) * (max_y - min_y + 1) > 64 THEN
+        RAISE EXCEPTION 'Bounding box covers % tiles at zoom %; at most 64 are served at once',
+            (max_x - min_x + 1) * (max_y - min_y + 1), z;
+    END IF;
+
+    RETURN QUERY
+    SELECT c.*
+    FROM generate_series(min_x, max_x) AS tx(x)
+    CROSS JOIN generate_series(min_y, max_y) AS ty(y)
+    CROSS JOIN LATERAL jsonb_to_recordset(get_map_tile_clusters(z, tx.x, ty.y, target_quarter)) AS c(
+        latitude DOUBLE PRECISION,
+        longitude DOUBLE PRECISION,
+        location_count INTEGER,
+        violation_count INTEGER,
+        critical_count INTEGER,
+        warning_count INTEGER,
+        moderate_count INTEGER,
+        low_count INTEGER,
+        severity_level TEXT,
+        map_color TEXT,
+        pwsid TEXT
+    )
+    WHERE c.longitude BETWEEN min_lng AND max_lng
+        AND c.latitude BETWEEN min_lat AND max_lat;
+END;
+$$ LANGUAGE plpgsql;
+
+COMMENT ON FUNCTION get_map_tile_clusters IS 'Clustered violation markers of one map tile as a JSON array, cached per quarter';
+COMMENT ON FUNCTION get_map_tile IS 'One map tile of clustered violation markers as a Mapbox Vector Tile (layer violations)';
+COMMENT ON FUNCTION get_map_clusters IS 'Clustered violation markers inside a bounding box at a zoom level';
@@ -0,0 +1,115 @@
+-- "Systems near me"
+-- get_systems_near() answers the app's first question for a point: the nearest active
+-- systems and their health status. Nearest systems come from a KNN search on
+-- idx_wsl_geom; systems serving the user's ZIP code or county fill the rest of the
+-- list, so systems that are not geocoded yet (or a user without a location fix)
+-- still get an answer.
+
+-- ZIP and county fallbacks, per quarter
+CREATE INDEX IF NOT EXISTS idx_geo_areas_zip_lookup
+    ON geographic_areas(submission_year_quarter, zip_code_served)
+    WHERE zip_code_served IS NOT NULL;
+CREATE INDEX IF NOT EXISTS idx_geo_areas_county_lookup
+    ON geographic_areas(submission_year_quarter, upper(county_served))
+    WHERE area_type_code = 'CN';
+CREATE INDEX IF NOT EXISTS idx_wsl_zip5
+    ON water_system_locations(submission_year_quarter, left(zip_code, 5));
+
+-- Up to result_limit active systems of target_quarter (NULL for the latest):
+-- first those within max_distance_meters of lat/lng, nearest first, then systems
+-- serving zip_code, then systems serving county ('Fulton' or 'Fulton County'),
+-- largest first. match_type tells which of the three found a system.
+CREATE OR REPLACE FUNCTION get_systems_near(
+    lat DOUBLE PRECISION DEFAULT NULL,
+    lng DOUBLE PRECISION DEFAULT NULL,
+    result_limit INTEGER DEFAULT 10,
+    zip_code VARCHAR(10) DEFAULT NULL,
+    county VARCHAR(40) DEFAULT NULL,
+    max_distance_meters DOUBLE PRECISION DEFAULT 50000,
+    target_quarter VARCHAR(7) DEFAULT NULL
+)
+RETURNS TABLE (
+    pwsid VARCHAR(9),
+    pws_name VARCHAR(100),
+    pws_type_code VARCHAR(6),
+    population_served_count INTEGER,
+    county_served VARCHAR(40),
+    city_served VARCHAR(40),
+    health_status TEXT,
+    critical_violations BIGINT,
+    total_unaddressed BIGINT,
+    latitude DECIMAL(10, 8),
+    longitude DECIMAL(11, 8),
+    distance_meters DOUBLE PRECISION,
+    match_type TEXT
+) AS $$
+DECLARE
+    quarter VARCHAR(7) := COALESCE(
+        target_quarter,
+        (SELECT MAX(l.submission_year_quarter) FROM water_system_locations l)
+    );
+    origin GEOMETRY := CASE
+        WHEN lat IS NOT NULL AND lng IS NOT NULL THEN ST_SetSRID(ST_MakePoint(lng, lat), 4326)
+    END;
+    zip5 VARCHAR(5) := NULLIF(left(regexp_replace(COALESCE(zip_code, ''), '\D', '', 'g'), 5), '');
+    county_key TEXT := NULLIF(upper(regexp_replace(trim(COALESCE(county, '')), '\s+county$', '', 'i')), '');
+BEGIN
+    RETURN QUERY
+    WITH nearest AS (
+        -- Ordered by planar distance in degrees straight from the index, with room to
+        -- re-rank by true distance: a degree of longitude is shorter than one of latitude
+        SELECT wsl.pwsid, wsl.geom
+        FROM water_system_locations wsl
+        WHERE origin IS NOT NULL
+            AND wsl.geom IS NOT NULL
+            AND wsl.submission_year_quarter = quarter
+        ORDER BY wsl.geom <-> origin
+        LIMIT result_limit * 4
+    ),
+    matches AS (
+        SELECT n.pwsid, 1 AS match_rank, 'distance' AS match_type
+        FROM nearest n
+        WHERE ST_DWithin(n.geom::geography, origin::geography, max_distance_meters)
+        UNION ALL
+        SELECT g.pwsid, 2, 'zip'
+        FROM geographic_areas g
+        WHERE zip5 IS NOT NULL AND g.submission_year_quarter = quarter AND g.zip_code_served = zip5
+        UNION ALL
+        SELECT wsl.pwsid, 2, 'zip'
+        FROM water_system_locations wsl
+        WHERE zip5 IS NOT NULL AND wsl.submission_year_quarter = quarter AND left(wsl.zip_code, 5) = zip5
+        UNION ALL
+        SELECT g.pwsid, 3, 'county'
+        FROM geographic_areas g
+        WHERE county_key IS NOT NULL AND g.submission_year_quarter = quarter
+            AND g.area_type_code = 'CN' AND upper(g.county_served) = county_key
+    ),
+    best AS (
+        SELECT DISTINCT ON (m.pwsid) m.pwsid, m.match_rank, m.match_type
+        FROM matches m
+        ORDER BY m.pwsid, m.match_rank
+    )
+    SELECT
+        s.pwsid,
+        s.pws_name,
+        s.pws_type_code,
+        s.population_served_count,
+        s.county_served,
+        s.city_served,
+        s.health_status,
+        s.critical_violations,
+        s.unaddressed_violations,
+        wsl.latitude,
+        wsl.longitude,
+        ST_Distance(wsl.geom::geography, origin::geography) AS distance_meters,
+        b.match_type
+    FROM best b
+    JOIN system_violation_summary s ON s.submission_year_quarter = quarter AND s.pwsid = b.pwsid
+    LEFT JOIN water_system_locations wsl ON wsl.submission_year_quarter = quarter AND wsl.pwsid = b.pwsid
+    WHERE s.pws_activity_code = 'A'
+    ORDER BY b.match_rank, 12 NULLS LAST, s.population_served_count DESC NULLS LAST, s.pwsid
+    LIMIT result_limit;
+END;
+$$ LANGUAGE plpgsql STABLE;
+
+COMMENT ON FUNCTION get_systems_near IS 'Nearest active systems to a point with their health status, filled up from the ZIP code and county';
@@ -0,0 +1,147 @@
+-- System search
+-- Finding a system by name, city, county, ZIP code or PWSID meant ILIKE scans over
+-- public_water_systems and geographic_areas. system_search keeps one row per system
+-- (its latest quarter) with everything it can be found by, in a tsvector for
+-- prefix matching and in plain text for pg_trgm typo matching. search_systems()
+-- ranks both; import_data.py refreshes the view after every import.
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+-- ============================================================================
+-- SEARCH VIEW
+-- ============================================================================
+
+DROP MATERIALIZED VIEW IF EXISTS system_search;
+
+CREATE MATERIALIZED VIEW system_search AS
+SELECT
+    n.pwsid,
+    n.submission_year_quarter,
+    n.pws_name,
+    n.pws_type_code,
+    n.pws_activity_code,
+    n.population_served_count,
+    n.county_served,
+    n.city_served,
+    n.health_status,
+    n.critical_violations,
+    -- Name words weigh most, then places, then codes
+    setweight(to_tsvector('simple', n.name_key), 'A')
+        || setweight(to_tsvector('simple', n.places), 'B')
+        || setweight(to_tsvector('simple', n.codes), 'C') AS document,
+    n.name_key,
+    trim(n.name_key || ' ' || n.places) AS search_text
+FROM (
+    SELECT
+        s.*,
+        -- Lower case words of letters and digits, like the normalized search query: the
+        -- parser would otherwise keep 'TERRACE/PRIMROSE' or 'A.B.C.' as single words
+        trim(lower(regexp_replace(COALESCE(s.pws_name, ''), '[^[:alnum:]]+', ' ', 'g'))) AS name_key,
+        trim(lower(regexp_replace(concat_ws(' ', a.cities, a.counties, p.city_name), '[^[:alnum:]]+', ' ', 'g'))) AS places,
+        lower(concat_ws(' ', s.pwsid, a.zip_codes, left(p.zip_code, 5))) AS codes
+    FROM (
+        SELECT DISTINCT ON (summary.pwsid) summary.*
+        FROM system_violation_summary summary
+        ORDER BY summary.pwsid, summary.submission_year_quarter DESC
+    ) s
+    JOIN public_water_systems p ON p.submission_year_quarter = s.submission_year_quarter AND p.pwsid = s.pwsid
+    LEFT JOIN LATERAL (
+        SELECT
+            string_agg(DISTINCT g.city_served, ' ') AS cities,
+            string_agg(DISTINCT g.county_served, ' ') AS counties,
+            string_agg(DISTINCT g.zip_code_served, ' ') AS zip_codes
+        FROM geographic_areas g
+        WHERE g.submission_year_quarter = s.submission_year_quarter
+          AND g.pwsid = s.pwsid
+    ) a ON TRUE
+) n;
+
+-- Required by REFRESH ... CONCURRENTLY
+CREATE UNIQUE INDEX idx_system_search_pwsid ON system_search(pwsid);
+CREATE INDEX idx_system_search_document ON system_search USING GIN(document);
+CREATE INDEX idx_system_search_trigram ON system_search USING GIN(search_text gin_trgm_ops);
+
+COMMENT ON MATERIALIZED VIEW system_search IS 'One row per system (latest quarter) with its name, places and codes indexed for search; refreshed by refresh_system_search() after imports';
+
+-- Reads system_violation_summary, so it runs after refresh_system_violation_summary()
+CREATE OR REPLACE FUNCTION refresh_system_search()
+RETURNS VOID AS $$
+BEGIN
+    -- CONCURRENTLY keeps the old rows readable during the refresh, but needs a populated view
+    IF (SELECT relispopulated FROM pg_class WHERE oid = 'system_search'::regclass) THEN
+        REFRESH MATERIALIZED VIEW CONCURRENTLY system_search;
+    ELSE
+        REFRESH MATERIALIZED VIEW system_search;
+    END IF;
+END;
+$$ LANGUAGE plpgsql;
+
+COMMENT ON FUNCTION refresh_system_search() IS 'Refreshes system_search without blocking readers';
+
+-- ============================================================================
+-- SEARCH RPC
+-- ============================================================================
+
+-- Systems matching search_query, best first. Every word matches as a prefix, so each
+-- keystroke of a type-ahead box can call it ('gwin', 'gwinnett co', 'GA135', '3004');
+-- from three letters on, misspellings match too ('gwinet'). Exact and leading name
+-- matches rank first, then text rank and similarity, nudged up by population.
+CREATE OR REPLACE FUNCTION search_systems(
+    search_query TEXT,
+    result_limit INTEGER DEFAULT 10,
+    active_only BOOLEAN DEFAULT TRUE
+)
+RETURNS TABLE (
+    pwsid VARCHAR(9),
+    pws_name VARCHAR(100),
+    pws_type_code VARCHAR(6),
+    population_served_count INTEGER,
+    county_served VARCHAR(40),
+    city_served VARCHAR(40),
+    health_status TEXT,
+    critical_violations BIGINT,
+    rank REAL
+) AS $$
+DECLARE
+    normalized TEXT := lower(trim(regexp_replace(COALESCE(search_query, ''), '[^[:alnum:]]+', ' ', 'g')));
+    prefix_query TSQUERY;
+BEGIN
+    IF normalized = '' THEN
+        RETURN;
+    END IF;
+    -- Words are letters and digits only, so they are safe inside to_tsquery
+    prefix_query := to_tsquery('simple', replace(regexp_replace(normalized, '(\S+)', '\1:*', 'g'), ' ', ' & '));
+
+    RETURN QUERY
+    WITH candidates AS (
+        SELECT c.pwsid FROM system_search c WHERE c.document @@ prefix_query
+        UNION
+        SELECT c.pwsid FROM system_search c WHERE length(normalized) >= 3 AND normalized <% c.search_text
+    )
+    SELECT
+        s.pwsid,
+        s.pws_name,
+        s.pws_type_code,
+        s.population_served_count,
+        s.county_served,
+        s.city_served,
+        s.health_status,
+        s.critical_violations,
+        (CASE
+            WHEN lower(s.pwsid) = normalized OR s.name_key = normalized THEN 3
+            WHEN s.name_key LIKE normalized || '%' THEN 1
+            ELSE 0
+         END
+         + ts_rank(s.document, prefix_query)
+         + word_similarity(normalized, s.search_text)
+         -- More people look up large systems: up to about 0.35 for the largest
+         + log(COALESCE(s.population_served_count, 0) + 1) / 20)::real AS rank
+    FROM candidates
+    JOIN system_search s ON s.pwsid = candidates.pwsid
+    WHERE NOT active_only OR s.pws_activity_code = 'A'
+    ORDER BY 9 DESC, s.population_served_count DESC NULLS LAST, s.pwsid
+    LIMIT result_limit;
+END;
+$$ LANGUAGE plpgsql STABLE;
+
+COMMENT ON FUNCTION search_systems IS 'Ranked, typo-tolerant type-ahead search over systems by name, city, county, ZIP code and PWSID';
@@ -0,0 +1,45 @@
+-- Fresh statistics for water_system_locations during a map sync
+-- The first sync after an import into emptied tables fills water_system_locations
+-- and then joins it to the violations of the quarter. The table's statistics still
+-- describe it as empty, so the planner expects one location row and rescans every
+-- violation's severity score once per location: quadratic in the number of systems.
+-- Found by scripts/benchmark_import.py at 2x Georgia with two quarters, where the
+-- first sync ran for more than half an hour. The sync now analyzes the table after
+-- writing location rows, as populate_violation_locations() already does for the
+-- violations it stages.
+
+CREATE OR REPLACE FUNCTION sync_map_locations(target_quarter VARCHAR(7) DEFAULT NULL)
+RETURNS TABLE (quarter VARCHAR(7), systems_changed INTEGER, violations_changed INTEGER) AS $$
+DECLARE
+    last_synced TIMESTAMP WITH TIME ZONE;
+BEGIN
+    FOR quarter IN
+        SELECT DISTINCT p.submission_year_quarter
+        FROM public_water_systems p
+        WHERE target_quarter IS NULL OR p.submission_year_quarter = target_quarter
+        ORDER BY 1
+    LOOP
+        SELECT m.synced_at INTO last_synced
+        FROM map_location_syncs m
+        WHERE m.submission_year_quarter = quarter;
+
+        systems_changed := populate_water_system_locations(quarter, last_synced);
+        -- populate_violation_locations() joins the rows just written
+        IF systems_changed > 0 THEN
+            ANALYZE water_system_locations;
+        END IF;
+        violations_changed := populate_violation_locations(quarter, last_synced);
+
+        INSERT INTO map_location_syncs AS m (submission_year_quarter, synced_at, systems_changed, violations_changed)
+        VALUES (quarter, NOW(), sync_map_locations.systems_changed, sync_map_locations.violations_changed)
+        ON CONFLICT (submission_year_quarter) DO UPDATE SET
+            synced_at = EXCLUDED.synced_at,
+            systems_changed = EXCLUDED.systems_changed,
+            violations_changed = EXCLUDED.violations_changed;
+
+        RETURN NEXT;
+    END LOOP;
+END;
+$$ LANGUAGE plpgsql;
+
+COMMENT ON FUNCTION sync_map_locations(VARCHAR) IS 'Applies changes since the last sync to the map tables of one quarter or all; called by import_data.py';
@@ -0,0 +1,380 @@
+-- One-call data health check
+-- check_and_populate_map_data.py, debug_map_view.py and debug_query.sql found out
+-- whether data was loaded and the map could show it with a dozen separate COUNT(*)
+-- queries, each a full scan of its table. data_health_check() answers all of it in
+-- one round trip: the rows of every table and materialized view, the quarters each
+-- quarter-keyed table holds, whether each quarter is synced to the map tables and
+-- geocoded, and rows whose foreign key parent is missing or marked removed.
+--
+-- By default nothing is scanned: row counts come from planner statistics, the
+-- quarters of a table from a skip scan of an index that leads with
+-- submission_year_quarter (one index probe per quarter) and orphans from a small
+-- block sample of each referencing table, so the check takes milliseconds however
+-- large the tables grow. exact_counts => TRUE counts and anti-joins every row instead.
+
+-- ============================================================================
+-- Estimates
+-- ============================================================================
+
+-- Planner estimate of a relation's rows, summed over the leaves of a partitioned
+-- table; the live tuple count stands in for tables never analyzed (reltuples -1)
+CREATE OR REPLACE FUNCTION health_estimated_rows(rel REGCLASS)
+RETURNS BIGINT AS $$
+    SELECT COALESCE(SUM(CASE WHEN c.reltuples >= 0 THEN c.reltuples ELSE COALESCE(s.n_live_tup, 0) END), 0)::BIGINT
+    FROM (
+        SELECT rel AS relid WHERE NOT EXISTS (SELECT 1 FROM pg_partition_tree(rel))
+        UNION ALL
+        SELECT t.relid FROM pg_partition_tree(rel) t WHERE t.isleaf
+    ) leaves
+    JOIN pg_class c ON c.oid = leaves.relid
+    LEFT JOIN pg_stat_user_tables s ON s.relid = leaves.relid;
+$$ LANGUAGE sql STABLE;
+
+-- Exact row count of a relation, for data_health_check(exact_counts => TRUE)
+CREATE OR REPLACE FUNCTION health_exact_rows(rel REGCLASS)
+RETURNS BIGINT AS $$
+DECLARE
+    result BIGINT;
+BEGIN
+    EXECUTE format('SELECT COUNT(*) FROM %s', rel) INTO result;
+    RETURN result;
+END;
+$$ LANGUAGE plpgsql STABLE;
+
+-- Last ANALYZE of a relation (of its least recently analyzed leaf), NULL if never
+CREATE OR REPLACE FUNCTION health_analyzed_at(rel REGCLASS)
+RETURNS TIMESTAMP WITH TIME ZONE AS $$
+    SELECT CASE WHEN bool_and(COALESCE(s.last_analyze, s.last_autoanalyze) IS NOT NULL)
+                THEN MIN(GREATEST(s.last_analyze, s.last_autoanalyze)) END
+    FROM (
+        SELECT rel AS relid WHERE NOT EXISTS (SELECT 1 FROM pg_partition_tree(rel))
+        UNION ALL
+        SELECT t.relid FROM pg_partition_tree(rel) t WHERE t.isleaf
+    ) leaves
+    LEFT JOIN pg_stat_user_tables s ON s.relid = leaves.relid;
+$$ LANGUAGE sql STABLE;
+
+-- Rows per submission quarter of a table. Estimated: the quarters present come from
+-- a skip scan when an index leads with submission_year_quarter, otherwise from the
+-- most common values in pg_stats, and each quarter's rows are its share of the
+-- planner's row estimate (NULL when the table has no statistics yet).
+CREATE OR REPLACE FUNCTION health_quarter_rows(rel REGCLASS, exact_counts BOOLEAN DEFAULT FALSE)
+RETURNS TABLE (quarter TEXT, row_count BIGINT) AS $$
+DECLARE
+    total BIGINT;
+    stats RECORD;
+    distinct_quarters DOUBLE PRECISION;
+    other_share DOUBLE PRECISION;
+    other_quarters DOUBLE PRECISION;
+    quarters TEXT[];
+BEGIN
+    IF exact_counts THEN
+        RETURN QUERY EXECUTE format(
+            'SELECT submission_year_quarter::TEXT, COUNT(*) FROM %s GROUP BY 1 ORDER BY 1', rel);
+        RETURN;
+    END IF;
+
+    total := health_estimated_rows(rel);
+
+    -- Partitioned tables keep their statistics as inherited rows
+    SELECT s.most_common_vals::TEXT::TEXT[] AS vals, s.most_common_freqs AS freqs,
+           s.null_frac, s.n_distinct
+    INTO stats
+    FROM pg_class c
+    JOIN pg_stats s ON s.schemaname = c.relnamespace::regnamespace::TEXT AND s.tablename = c.relname
+    WHERE c.oid = rel AND s.attname = 'submission_year_quarter'
+    ORDER BY s.inherited DESC
+    LIMIT 1;
+
+    IF EXISTS (
+        SELECT 1
+        FROM pg_index i
+        JOIN pg_class ic ON ic.oid = i.indexrelid
+        JOIN pg_am am ON am.oid = ic.relam
+        JOIN pg_attribute a ON a.attrelid = i.indrelid AND a.attnum = i.indkey[0]
+        WHERE i.indrelid = rel AND am.amname = 'btree' AND i.indpred IS NULL
+          AND a.attname = 'submission_year_quarter'
+    ) THEN
+        EXECUTE format($q$
+            WITH RECURSIVE q AS (
+                SELECT MIN(submission_year_quarter)::TEXT AS value FROM %1$s
+                UNION ALL
+                SELECT (SELECT MIN(submission_year_quarter)::TEXT FROM %1$s WHERE submission_year_quarter > q.value)
+                FROM q WHERE q.value IS NOT NULL
+            )
+            SELECT array_agg(value ORDER BY value) FROM q WHERE value IS NOT NULL
+        $q$, rel) INTO quarters;
+    ELSE
+        SELECT array_agg(value ORDER BY value) INTO quarters FROM unnest(stats.vals) value;
+    END IF;
+
+    IF stats.freqs IS NOT NULL OR stats.n_distinct IS NOT NULL THEN
+        distinct_quarters := CASE WHEN stats.n_distinct < 0 THEN -stats.n_distinct * total ELSE stats.n_distinct END;
+        other_share := GREATEST(1 - COALESCE((SELECT SUM(f) FROM unnest(stats.freqs) f), 0) - stats.null_frac, 0);
+        other_quarters := GREATEST(distinct_quarters - COALESCE(cardinality(stats.freqs), 0), 1);
+    END IF;
+
+    RETURN QUERY
+    SELECT q.value,
+           CASE WHEN stats IS NULL OR (stats.freqs IS NULL AND stats.n_distinct IS NULL) THEN NULL
+                ELSE ROUND(total * COALESCE(m.freq, other_share / other_quarters))::BIGINT END
+    FROM unnest(quarters) q(value)
+    LEFT JOIN unnest(stats.vals, stats.freqs) m(value, freq) ON m.value = q.value
+    ORDER BY q.value;
+END;
+$$ LANGUAGE plpgsql STABLE;
+
+-- Rows of every foreign key whose parent row is missing, or is marked removed while
+-- the child is not. Estimated: referencing tables with more than sample_rows rows
+-- are read through a block sample of about sample_rows rows and the counts scaled up.
+CREATE OR REPLACE FUNCTION health_foreign_key_orphans(exact_counts BOOLEAN DEFAULT FALSE, sample_rows INTEGER DEFAULT 2000)
+RETURNS TABLE (
+    constraint_name TEXT,
+    table_name TEXT,
+    references_table TEXT,
+    missing_parent BIGINT,
+    removed_parent BIGINT,
+    rows_checked BIGINT,
+    estimated BOOLEAN
+) AS $$
+DECLARE
+    fk RECORD;
+    total BIGINT;
+    sample TEXT;
+    missing BIGINT;
+    removed BIGINT;
+    checked BIGINT;
+BEGIN
+    FOR fk IN
+        SELECT con.conname::TEXT AS name, con.conrelid::regclass AS child, con.confrelid::regclass AS parent,
+               (SELECT string_agg(format('c.%I IS NOT NULL', a.attname), ' AND ')
+                FROM unnest(con.conkey) k(attnum)
+                JOIN pg_attribute a ON a.attrelid = con.conrelid AND a.attnum = k.attnum) AS not_null,
+               (SELECT string_agg(format('p.%I = c.%I', pa.attname, ca.attname), ' AND ')
+                FROM unnest(con.conkey, con.confkey) k(child_attnum, parent_attnum)
+                JOIN pg_attribute ca ON ca.attrelid = con.conrelid AND ca.attnum = k.child_attnum
+                JOIN pg_attribute pa ON pa.attrelid = con.confrelid AND pa.attnum = k.parent_attnum) AS join_on,
+               (SELECT format('p.%I', pa.attname)
+                FROM pg_attribute pa WHERE pa.attrelid = con.confrelid AND pa.attnum = con.confkey[1]) AS parent_key,
+               (SELECT COUNT(*) = 2 FROM pg_attribute a
+                WHERE a.attrelid IN (con.conrelid, con.confrelid) AND a.attname = 'removed_at'
+                  AND NOT a.attisdropped) AS both_removable
+        FROM pg_constraint con
+        WHERE con.contype = 'f' AND con.conparentid = 0
+          AND con.connamespace = 'public'::regnamespace
+        ORDER BY con.conrelid::regclass::TEXT, con.conname
+    LOOP
+        total := health_estimated_rows(fk.child);
+        estimated := NOT exact_counts AND total > sample_rows;
+        sample := CASE WHEN estimated
+                       THEN format(' TABLESAMPLE SYSTEM (%s) REPEATABLE (0)', round(100.0 * sample_rows / total, 4))
+                       ELSE '' END;
+
+        EXECUTE format(
+            'SELECT COUNT(*) FILTER (WHERE %s IS NULL), %s, COUNT(*) FROM %s c%s LEFT JOIN %s p ON %s WHERE %s',
+            fk.parent_key,
+            CASE WHEN fk.both_removable
+                 THEN 'COUNT(*) FILTER (WHERE c.removed_at IS NULL AND p.removed_at IS NOT NULL)'
+                 ELSE 'NULL::BIGINT' END,
+            fk.child, sample, fk.parent, fk.join_on, fk.not_null)
+        INTO missing, removed, checked;
+
+        constraint_name := fk.name;
+        table_name := fk.child::TEXT;
+        references_table := fk.parent::TEXT;
+        rows_checked := checked;
+        IF estimated AND checked > 0 THEN
+            missing_parent := ROUND(missing * total::NUMERIC / checked);
+            removed_parent := ROUND(removed * total::NUMERIC / checked);
+        ELSE
+            missing_parent := missing;
+            removed_parent := removed;
+        END IF;
+        RETURN NEXT;
+    END LOOP;
+END;
+$$ LANGUAGE plpgsql STABLE;
+
+-- ============================================================================
+-- The check
+-- ============================================================================
+
+CREATE OR REPLACE FUNCTION data_health_check(exact_counts BOOLEAN DEFAULT FALSE, sample_rows INTEGER DEFAULT 2000)
+RETURNS JSONB AS $$
+DECLARE
+    started TIMESTAMP WITH TIME ZONE := clock_timestamp();
+    tables JSONB;
+    coverage JSONB := '{}';
+    rel RECORD;
+    last_import TIMESTAMP WITH TIME ZONE;
+    latitude_nulls DOUBLE PRECISION;
+    detached_nulls DOUBLE PRECISION;
+    exact_map JSONB;
+    quarters JSONB;
+    views JSONB;
+    orphans JSONB;
+    problems TEXT[] := '{}';
+    latest JSONB;
+BEGIN
+    -- Rows of every table and materialized view
+    SELECT jsonb_agg(jsonb_build_object(
+               'table', c.relname,
+               'kind', CASE c.relkind WHEN 'm' THEN 'materialized view'
+                                      WHEN 'p' THEN 'partitioned table' ELSE 'table' END,
+               'rows', CASE WHEN exact_counts AND (c.relkind <> 'm' OR c.relispopulated)
+                            THEN health_exact_rows(c.oid::regclass)
+                            ELSE health_estimated_rows(c.oid::regclass) END,
+               'analyzed_at', health_analyzed_at(c.oid::regclass))
+           ORDER BY c.relname)
+    INTO tables
+    FROM pg_class c
+    WHERE c.relnamespace = 'public'::regnamespace
+      AND c.relkind IN ('r', 'p', 'm')
+      AND NOT c.relispartition;
+
+    -- Quarters of every quarter-keyed table
+    FOR rel IN
+        SELECT c.oid::regclass AS oid, c.relname
+        FROM pg_class c
+        JOIN pg_attribute a ON a.attrelid = c.oid AND a.attname = 'submission_year_quarter' AND NOT a.attisdropped
+        WHERE c.relnamespace = 'public'::regnamespace
+          AND c.relkind IN ('r', 'p', 'm')
+          AND NOT c.relispartition
+          AND (c.relkind <> 'm' OR c.relispopulated)
+        ORDER BY c.relname
+    LOOP
+        coverage := coverage || jsonb_build_object(rel.relname, (
+            SELECT COALESCE(jsonb_object_agg(q.quarter, q.row_count ORDER BY q.quarter), '{}')
+            FROM health_quarter_rows(rel.oid, exact_counts) q));
+    END LOOP;
+
+    -- Map readiness of every quarter of public_water_systems
+    SELECT MAX(updated_at) INTO last_import
+    FROM import_checkpoints
+    WHERE completed AND table_name IN ('public_water_systems', 'violations_enforcement');
+
+    IF exact_counts THEN
+        SELECT jsonb_object_agg(q.quarter, jsonb_build_object('geocoded', q.geocoded, 'detached', q.detached))
+        INTO exact_map
+        FROM (
+            SELECT COALESCE(l.quarter, v.quarter) AS quarter, COALESCE(l.geocoded, 0) AS geocoded,
+                   COALESCE(v.detached, 0) AS detached
+            FROM (SELECT submission_year_quarter AS quarter,
+                         COUNT(*) FILTER (WHERE latitude IS NOT NULL AND longitude IS NOT NULL) AS geocoded
+                  FROM water_system_locations GROUP BY 1) l
+            FULL JOIN (SELECT submission_year_quarter AS quarter,
+                              COUNT(*) FILTER (WHERE water_system_location_id IS NULL) AS detached
+                       FROM violation_locations GROUP BY 1) v ON v.quarter = l.quarter
+        ) q;
+    ELSE
+        SELECT s.null_frac INTO latitude_nulls
+        FROM pg_stats s
+        WHERE s.schemaname = 'public' AND s.tablename = 'water_system_locations' AND s.attname = 'latitude'
+        ORDER BY s.inherited DESC LIMIT 1;
+        SELECT s.null_frac INTO detached_nulls
+        FROM pg_stats s
+        WHERE s.schemaname = 'public' AND s.tablename = 'violation_locations' AND s.attname = 'water_system_location_id'
+        ORDER BY s.inherited DESC LIMIT 1;
+    END IF;
+
+    SELECT COALESCE(jsonb_agg(q ORDER BY q->>'quarter'), '[]') INTO quarters
+    FROM (
+        SELECT jsonb_build_object(
+                   'quarter', m.quarter,
+                   'systems', m.systems,
+                   'violations', m.violations,
+                   'locations', m.locations,
+                   'geocoded', m.geocoded,
+                   'markers', m.markers,
+                   'detached_markers', m.detached,
+                   'synced_at', m.synced_at,
+                   'stale', m.stale,
+                   'problems', to_jsonb(array_remove(ARRAY[
+                       CASE WHEN m.synced_at IS NULL
+                            THEN 'not synced to the map tables: run SELECT * FROM sync_map_locations()' END,
+                       CASE WHEN m.stale
+                            THEN 'imported again since the last map sync: run SELECT * FROM sync_map_locations()' END,
+                       CASE WHEN m.synced_at IS NOT NULL AND m.systems > 0 AND m.locations = 0
+                            THEN 'synced but has no water system locations' END,
+                       CASE WHEN m.synced_at IS NOT NULL AND m.violations > 0 AND m.markers = 0
+                            THEN 'synced but has no violation markers' END,
+                       CASE WHEN m.locations > 0 AND m.geocoded = 0
+                            THEN 'no water system locations geocoded: run python geocode_systems.py' END
+                   ], NULL))) AS q
+        FROM (
+            SELECT p.key AS quarter,
+                   (p.value #>> '{}')::BIGINT AS systems,
+                   (coverage #>> ARRAY['violations_enforcement', p.key])::BIGINT AS violations,
+                   COALESCE((coverage #>> ARRAY['water_system_locations', p.key])::BIGINT, 0) AS locations,
+                   COALESCE((coverage #>> ARRAY['violation_locations', p.key])::BIGINT, 0) AS markers,
+                   CASE WHEN exact_counts THEN COALESCE((exact_map #>> ARRAY[p.key, 'geocoded'])::BIGINT, 0)
+                        ELSE ROUND(COALESCE((coverage #>> ARRAY['water_system_locations', p.key])::BIGINT, 0)
+                                   * (1 - COALESCE(latitude_nulls, 0)))::BIGINT END AS geocoded,
+                   CASE WHEN exact_counts THEN COALESCE((exact_map #>> ARRAY[p.key, 'detached'])::BIGINT, 0)
+                        ELSE ROUND(COALESCE((coverage #>> ARRAY['violation_locations', p.key])::BIGINT, 0)
+                                   * COALESCE(detached_nulls, 0))::BIGINT END AS detached,
+                   s.synced_at,
+                   COALESCE(s.synced_at < last_import, FALSE) AS stale
+            FROM jsonb_each(COALESCE(coverage->'public_water_systems', '{}')) p
+            LEFT JOIN map_location_syncs s ON s.submission_year_quarter = p.key
+        ) m
+    ) quarter_rows;
+
+    SELECT jsonb_object_agg(c.relname, c.relispopulated) INTO views
+    FROM pg_class c
+    WHERE c.relnamespace = 'public'::regnamespace AND c.relkind = 'm';
+
+    SELECT COALESCE(jsonb_agg(to_jsonb(o)), '[]') INTO orphans
+    FROM health_foreign_key_orphans(exact_counts, sample_rows) o;
+
+    -- Everything that needs attention, in one list
+    latest := quarters->-1;
+    IF latest IS NULL THEN
+        problems := problems || 'no water systems loaded: run python import_data.py'::TEXT;
+    ELSE
+        problems := problems || ARRAY(
+            SELECT format('%s: %s', latest->>'quarter', p) FROM jsonb_array_elements_text(latest->'problems') p);
+    END IF;
+    problems := problems || ARRAY(
+        SELECT format('%s is not populated: run REFRESH MATERIALIZED VIEW %s', v.key, v.key)
+        FROM jsonb_each(COALESCE(views, '{}')) v WHERE NOT v.value::BOOLEAN ORDER BY v.key);
+    problems := problems || ARRAY(
+        SELECT format('%s has rows but no statistics: run ANALYZE %s', t->>'table', t->>'table')
+        FROM jsonb_array_elements(tables) t
+        -- autovacuum analyzes small tables in its own time; plans only suffer on large ones
+        WHERE t->>'analyzed_at' IS NULL AND (t->>'rows')::BIGINT > 10000
+          AND t->>'kind' <> 'materialized view');
+    problems := problems || ARRAY(
+        SELECT format('%s%s rows of %s have no %s row (%s)',
+                      CASE WHEN (o->>'estimated')::BOOLEAN THEN '~' ELSE '' END,
+                      o->>'missing_parent', o->>'table_name', o->>'references_table', o->>'constraint_name')
+        FROM jsonb_array_elements(orphans) o WHERE (o->>'missing_parent')::BIGINT > 0);
+    problems := problems || ARRAY(
+        SELECT format('%s%s current rows of %s belong to a removed %s row (%s)',
+                      CASE WHEN (o->>'estimated')::BOOLEAN THEN '~' ELSE '' END,
+                      o->>'removed_parent', o->>'table_name', o->>'references_table', o->>'constraint_name')
+        FROM jsonb_array_elements(orphans) o WHERE (o->>'removed_parent')::BIGINT > 0);
+
+    RETURN jsonb_build_object(
+        'checked_at', started,
+        'exact', exact_counts,
+        'tables', COALESCE(tables, '[]'),
+        'coverage', coverage,
+        'map', jsonb_build_object(
+            'ready', latest IS NOT NULL AND jsonb_array_length(latest->'problems') = 0
+                     AND NOT COALESCE(jsonb_path_exists(views, '$.* ? (@ == false)'), FALSE),
+            'latest_quarter', latest->>'quarter',
+            'last_import', last_import,
+            'quarters', quarters,
+            'views', COALESCE(views, '{}')),
+        'orphans', orphans,
+        'problems', to_jsonb(problems),
+        'duration_ms', round(EXTRACT(EPOCH FROM clock_timestamp() - started) * 1000, 1)
+    );
+END;
+$$ LANGUAGE plpgsql STABLE;
+
+COMMENT ON FUNCTION health_estimated_rows(REGCLASS) IS 'Planner estimate of the rows of a table, materialized view or partitioned table';
+COMMENT ON FUNCTION health_quarter_rows(REGCLASS, BOOLEAN) IS 'Rows per submission quarter of a table, estimated from an index skip scan and pg_stats unless exact_counts';
+COMMENT ON FUNCTION health_foreign_key_orphans(BOOLEAN, INTEGER) IS 'Rows per foreign key whose parent is missing or removed, from a block sample unless exact_counts';
+COMMENT ON FUNCTION data_health_check(BOOLEAN, INTEGER) IS 'Table counts, quarter coverage, map readiness and orphaned rows in one call; called by scripts/check_data_health.py';
@@ -0,0 +1,427 @@
+-- Violations partitioned by submission quarter
+-- violations_enforcement held every quarter ever loaded in one heap, so a query about
+-- the current quarter probed indexes that span all of them, and retiring a quarter
+-- meant a DELETE of millions of rows (and of their map markers through the foreign
+-- key). The table and the two tables that mirror it row for row, violation_locations
+-- and violation_ai_explanations, are now partitioned by LIST on
+-- submission_year_quarter: one partition per quarter and table. Queries that name a
+-- quarter read only its partitions, and retire_quarter() drops a quarter's
+-- partitions instead of deleting their rows.
+--
+-- create_quarter_partitions() creates the partitions of a quarter; import_data.py
+-- calls it for every quarter it sees before writing violations. There is no default
+-- partition (creating a quarter's partition would have to scan it), so a row of a
+-- quarter without partitions is rejected with "no partition of relation found".
+--
+-- Unique keys of a partitioned table must include the partition key, so the
+-- surrogate primary keys become (submission_year_quarter, id); nothing references
+-- them. Exclusion constraints are not supported on partitioned tables before
+-- PostgreSQL 17, so one current explanation per violation is now kept by a partial
+-- unique index, and archive_old_explanations() runs before the insert instead of
+-- after it, so the previous explanation is no longer current when the index is checked.
+
+-- ============================================================================
+-- QUARTER PARTITIONS
+-- ============================================================================
+
+-- Children before parents, the order partitions are detached in
+CREATE OR REPLACE FUNCTION quarter_partitioned_tables()
+RETURNS TEXT[] AS $$
+    SELECT ARRAY['violation_ai_explanations', 'violation_locations', 'violations_enforcement'];
+$$ LANGUAGE sql IMMUTABLE;
+
+-- The partition of parent that holds quarter, or NULL
+CREATE OR REPLACE FUNCTION quarter_partition(parent REGCLASS, quarter VARCHAR(7))
+RETURNS REGCLASS AS $$
+    SELECT c.oid::regclass
+    FROM pg_inherits i
+    JOIN pg_class c ON c.oid = i.inhrelid
+    WHERE i.inhparent = parent
+      AND pg_get_expr(c.relpartbound, c.oid) = format('FOR VALUES IN (%L)', quarter);
+$$ LANGUAGE sql STABLE;
+
+CREATE OR REPLACE FUNCTION create_quarter_partitions(quarter VARCHAR(7))
+RETURNS INTEGER AS $$
+DECLARE
+    parent TEXT;
+    partition_name TEXT;
+    created INTEGER := 0;
+BEGIN
+    -- Import workers of the same run may reach a new quarter together
+    PERFORM pg_advisory_xact_lock(hashtext('create_quarter_partitions'));
+
+    FOREACH parent IN ARRAY quarter_partitioned_tables() LOOP
+        CONTINUE WHEN quarter_partition(parent::regclass, quarter) IS NOT NULL;
+
+        partition_name := parent || '_' || regexp_replace(lower(quarter), '[^a-z0-9]', '', 'g');
+        EXECUTE format('CREATE TABLE %I PARTITION OF %I FOR VALUES IN (%L)', partition_name, parent, quarter);
+        -- A partition is a table of its own to PostgREST; the parent's policies do not cover it
+        IF (SELECT relrowsecurity FROM pg_class WHERE oid = parent::regclass) THEN
+            EXECUTE format('ALTER TABLE %I ENABLE ROW LEVEL SECURITY', partition_name);
+        END IF;
+        created := created + 1;
+    END LOOP;
+
+    RETURN created;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Detaches the partitions of a quarter and drops them, or with keep_detached leaves
+-- them as standalone tables (without foreign keys) to archive or attach again later
+CREATE OR REPLACE FUNCTION drop_quarter_partitions(quarter VARCHAR(7), keep_detached BOOLEAN DEFAULT FALSE)
+RETURNS TABLE (partition_name TEXT) AS $$
+DECLARE
+    parent TEXT;
+    partition REGCLASS;
+    foreign_key TEXT;
+BEGIN
+    FOREACH parent IN ARRAY quarter_partitioned_tables() LOOP
+        partition := quarter_partition(parent::regclass, quarter);
+        CONTINUE WHEN partition IS NULL;
+
+        EXECUTE format('ALTER TABLE %I DETACH PARTITION %s', parent, partition);
+        partition_name := partition::TEXT;
+        IF keep_detached THEN
+            -- The next parent cannot be detached while these rows still reference it
+            FOR foreign_key IN
+                SELECT conname FROM pg_constraint WHERE conrelid = partition AND contype = 'f'
+            LOOP
+                EXECUTE format('ALTER TABLE %s DROP CONSTRAINT %I', partition, foreign_key);
+            END LOOP;
+        ELSE
+            EXECUTE format('DROP TABLE %s', partition);
+        END IF;
+        RETURN NEXT;
+    END LOOP;
+
+    -- Tile triggers do not fire on DETACH; the next sync rebuilds the quarter's markers
+    DELETE FROM map_tile_cache t WHERE t.submission_year_quarter = quarter;
+    DELETE FROM map_location_syncs s WHERE s.submission_year_quarter = quarter;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Removes a quarter from the database: its violation partitions are dropped, and its
+-- rows in the unpartitioned quarter-keyed tables (a fraction of the size) deleted
+CREATE OR REPLACE FUNCTION retire_quarter(quarter VARCHAR(7))
+RETURNS TABLE (table_name TEXT, action TEXT, rows_deleted BIGINT) AS $$
+DECLARE
+    child TEXT;
+BEGIN
+    FOR table_name IN SELECT * FROM drop_quarter_partitions(quarter) LOOP
+        action := 'dropped';
+        rows_deleted := NULL;
+        RETURN NEXT;
+    END LOOP;
+
+    -- Children of public_water_systems first; its delete cascades to water_system_locations
+    FOREACH child IN ARRAY ARRAY['pn_violation_assoc', 'events_milestones', 'site_visits', 'lcr_samples',
+                                 'service_areas', 'geographic_areas', 'facilities', 'public_water_systems'] LOOP
+        EXECUTE format('DELETE FROM %I WHERE submission_year_quarter = $1', child) USING quarter;
+        GET DIAGNOSTICS rows_deleted = ROW_COUNT;
+        table_name := child;
+        action := 'deleted';
+        RETURN NEXT;
+    END LOOP;
+
+    PERFORM refresh_system_violation_summary();
+    PERFORM refresh_system_search();
+END;
+$$ LANGUAGE plpgsql;
+
+-- ============================================================================
+-- DEPENDENT VIEWS
+-- ============================================================================
+
+-- Views and materialized views built on the three tables (and on those views) are
+-- saved from the catalog, dropped, and recreated unchanged on the new tables below
+CREATE TEMP TABLE partitioning_saved_views (
+    position SERIAL,
+    name TEXT,
+    kind "char",
+    statements TEXT[]
+);
+
+DO $$
+DECLARE
+    saved RECORD;
+BEGIN
+    INSERT INTO partitioning_saved_views (name, kind, statements)
+    WITH RECURSIVE dependents AS (
+        SELECT r.ev_class AS oid, 1 AS depth
+        FROM pg_depend d
+        JOIN pg_rewrite r ON r.oid = d.objid
+        WHERE d.classid = 'pg_rewrite'::regclass
+          AND d.refobjid = ANY(ARRAY['violations_enforcement'::regclass, 'violation_locations'::regclass,
+                                     'violation_ai_explanations'::regclass]::oid[])
+        UNION ALL
+        SELECT r.ev_class, dependents.depth + 1
+        FROM dependents
+        JOIN pg_depend d ON d.refobjid = dependents.oid AND d.classid = 'pg_rewrite'::regclass
+        JOIN pg_rewrite r ON r.oid = d.objid
+        WHERE r.ev_class <> dependents.oid
+    )
+    SELECT c.relname, c.relkind,
+           format('CREATE %s %I%s AS %s',
+                  CASE c.relkind WHEN 'm' THEN 'MATERIALIZED VIEW' ELSE 'VIEW' END, c.relname,
+                  CASE WHEN c.reloptions IS NOT NULL THEN format(' WITH (%s)', array_to_string(c.reloptions, ', ')) ELSE '' END,
+                  rtrim(pg_get_viewdef(c.oid), ';'))
+           || ARRAY(SELECT pg_get_indexdef(i.indexrelid) FROM pg_index i WHERE i.indrelid = c.oid ORDER BY i.indexrelid)
+           || ARRAY(SELECT format('COMMENT ON INDEX %I IS %L', i.indexrelid::regclass, obj_description(i.indexrelid, 'pg_class'))
+                    FROM pg_index i WHERE i.indrelid = c.oid AND obj_description(i.indexrelid, 'pg_class') IS NOT NULL)
+           || ARRAY(SELECT format('COMMENT ON %s %I IS %L', CASE c.relkind WHEN 'm' THEN 'MATERIALIZED VIEW' ELSE 'VIEW' END,
+                                  c.relname, obj_description(c.oid, 'pg_class'))
+                    WHERE obj_description(c.oid, 'pg_class') IS NOT NULL)
+    FROM (SELECT oid, MAX(depth) AS depth FROM dependents GROUP BY oid) v
+    JOIN pg_class c ON c.oid = v.oid
+    WHERE c.relkind IN ('v', 'm')
+      AND c.oid NOT IN ('violations_enforcement'::regclass, 'violation_locations'::regclass,
+                        'violation_ai_explanations'::regclass)
+    ORDER BY v.depth, c.relname;
+
+    FOR saved IN SELECT * FROM partitioning_saved_views ORDER BY position DESC LOOP
+        EXECUTE format('DROP %s %I', CASE saved.kind WHEN 'm' THEN 'MATERIALIZED VIEW' ELSE 'VIEW' END, saved.name);
+    END LOOP;
+END $$;
+
+-- ============================================================================
+-- PARTITIONED TABLES
+-- ============================================================================
+
+ALTER TABLE violations_enforcement RENAME TO violations_enforcement_unpartitioned;
+ALTER TABLE violation_locations RENAME TO violation_locations_unpartitioned;
+ALTER TABLE violation_ai_explanations RENAME TO violation_ai_explanations_unpartitioned;
+
+CREATE TABLE violations_enforcement (
+    LIKE violations_enforcement_unpartitioned INCLUDING DEFAULTS INCLUDING CONSTRAINTS INCLUDING COMMENTS INCLUDING STORAGE
+) PARTITION BY LIST (submission_year_quarter);
+
+CREATE TABLE violation_locations (
+    LIKE violation_locations_unpartitioned INCLUDING DEFAULTS INCLUDING CONSTRAINTS INCLUDING COMMENTS INCLUDING STORAGE
+) PARTITION BY LIST (submission_year_quarter);
+
+CREATE TABLE violation_ai_explanations (
+    LIKE violation_ai_explanations_unpartitioned INCLUDING DEFAULTS INCLUDING CONSTRAINTS INCLUDING COMMENTS INCLUDING STORAGE
+) PARTITION BY LIST (submission_year_quarter);
+
+ALTER SEQUENCE violation_ai_explanations_id_seq OWNED BY violation_ai_explanations.id;
+
+SELECT create_quarter_partitions(quarter)
+FROM (
+    SELECT submission_year_quarter AS quarter FROM violations_enforcement_unpartitioned
+    UNION
+    SELECT submission_year_quarter FROM violation_locations_unpartitioned
+    UNION
+    SELECT submission_year_quarter FROM violation_ai_explanations_unpartitioned
+) quarters
+ORDER BY quarter;
+
+-- Rows are copied before the indexes exist, which builds each index once per partition
+INSERT INTO violations_enforcement SELECT * FROM violations_enforcement_unpartitioned;
+INSERT INTO violation_locations SELECT * FROM violation_locations_unpartitioned;
+INSERT INTO violation_ai_explanations SELECT * FROM violation_ai_explanations_unpartitioned;
+
+DROP TABLE violation_ai_explanations_unpartitioned;
+DROP TABLE violation_locations_unpartitioned;
+DROP TABLE violations_enforcement_unpartitioned;
+
+COMMENT ON TABLE violations_enforcement IS 'Water quality violations with enforcement data - key table for public health dashboard; partitioned by submission_year_quarter';
+COMMENT ON TABLE violation_locations IS 'Location-specific data for violations, optimized for map display; partitioned by submission_year_quarter';
+COMMENT ON TABLE violation_ai_explanations IS 'AI-generated explanations for health-based water quality violations to help public understanding; partitioned by submission_year_quarter';
+
+-- violations_enforcement
+ALTER TABLE violations_enforcement
+    ADD CONSTRAINT violations_enforcement_pkey PRIMARY KEY (submission_year_quarter, id),
+    ADD CONSTRAINT violations_enforcement_submission_year_quarter_pwsid_violat_key
+        UNIQUE (submission_year_quarter, pwsid, violation_id),
+    ADD CONSTRAINT violations_enforcement_submission_year_quarter_pwsid_fkey
+        FOREIGN KEY (submission_year_quarter, pwsid) REFERENCES public_water_systems(submission_year_quarter, pwsid);
+
+CREATE INDEX idx_violations_begin_date ON violations_enforcement(non_compl_per_begin_date);
+CREATE INDEX idx_violations_category ON violations_enforcement(violation_category_code);
+CREATE INDEX idx_violations_health_based ON violations_enforcement(is_health_based_ind);
+CREATE INDEX idx_violations_pwsid ON violations_enforcement(pwsid);
+CREATE INDEX idx_violations_quarter_updated ON violations_enforcement(submission_year_quarter, updated_at);
+CREATE INDEX idx_violations_status ON violations_enforcement(violation_status);
+CREATE INDEX idx_violations_year ON violations_enforcement(EXTRACT(year FROM non_compl_per_begin_date));
+CREATE INDEX idx_violations_explanation_priority ON violations_enforcement (
+    (CASE WHEN violation_status IN ('Unaddressed', 'Addressed') THEN 1 ELSE 2 END),
+    (COALESCE(non_compl_per_begin_date, '1900-01-01'::date)) DESC
+) WHERE is_health_based_ind = 'Y';
+
+COMMENT ON INDEX idx_violations_explanation_priority IS 'Priority order of generate_ai_explanations.py candidates; must match its ORDER BY';
+
+CREATE TRIGGER update_violations_updated_at BEFORE UPDATE ON violations_enforcement
+    FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
+
+ALTER TABLE violations_enforcement ENABLE ROW LEVEL SECURITY;
+CREATE POLICY "Public violations are readable by everyone" ON violations_enforcement
+    FOR SELECT USING (true);
+
+-- violation_locations
+ALTER TABLE violation_locations
+    ADD CONSTRAINT violation_locations_pkey PRIMARY KEY (submission_year_quarter, id),
+    ADD CONSTRAINT violation_locations_natural_key UNIQUE (submission_year_quarter, pwsid, violation_id),
+    ADD CONSTRAINT violation_locations_submission_year_quarter_pwsid_violatio_fkey
+        FOREIGN KEY (submission_year_quarter, pwsid, violation_id)
+        REFERENCES violations_enforcement(submission_year_quarter, pwsid, violation_id) ON DELETE CASCADE,
+    ADD CONSTRAINT violation_locations_water_system_location_id_fkey
+        FOREIGN KEY (water_system_location_id) REFERENCES water_system_locations(id) ON DELETE SET NULL;
+
+CREATE INDEX idx_vl_coordinates ON violation_locations(latitude, longitude)
+    WHERE latitude IS NOT NULL AND longitude IS NOT NULL;
+CREATE INDEX idx_vl_health_based ON violation_locations(is_health_based) WHERE is_health_based = true;
+CREATE INDEX idx_vl_orphaned ON violation_locations(submission_year_quarter) WHERE water_system_location_id IS NULL;
+CREATE INDEX idx_vl_pwsid ON violation_locations(pwsid);
+CREATE INDEX idx_vl_severity ON violation_locations(severity_level);
+CREATE INDEX idx_vl_system_location ON violation_locations(water_system_location_id);
+
+CREATE TRIGGER trigger_update_vl_updated_at BEFORE UPDATE ON violation_locations
+    FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
+
+-- Statement triggers on the parent see the rows of every partition in their transition tables
+CREATE TRIGGER trigger_vl_tiles_insert AFTER INSERT ON violation_locations
+    REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION invalidate_map_tiles();
+CREATE TRIGGER trigger_vl_tiles_update AFTER UPDATE ON violation_locations
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION invalidate_map_tiles();
+CREATE TRIGGER trigger_vl_tiles_delete AFTER DELETE ON violation_locations
+    REFERENCING OLD TABLE AS old_rows FOR EACH STATEMENT EXECUTE FUNCTION invalidate_map_tiles();
+CREATE TRIGGER trigger_vl_tiles_truncate AFTER TRUNCATE ON violation_locations
+    FOR EACH STATEMENT EXECUTE FUNCTION invalidate_map_tiles();
+
+-- violation_ai_explanations
+ALTER TABLE violation_ai_explanations
+    ADD CONSTRAINT violation_ai_explanations_pkey PRIMARY KEY (submission_year_quarter, id),
+    ADD CONSTRAINT fk_violation_ai_explanations_violation
+        FOREIGN KEY (submission_year_quarter, pwsid, violation_id)
+        REFERENCES violations_enforcement(submission_year_quarter, pwsid, violation_id);
+
+CREATE UNIQUE INDEX unique_current_explanation_per_violation
+    ON violation_ai_explanations(submission_year_quarter, pwsid, violation_id) WHERE is_current;
+CREATE INDEX idx_violation_ai_explanations_current ON violation_ai_explanations(is_current) WHERE is_current = true;
+CREATE INDEX idx_violation_ai_explanations_generated_at ON violation_ai_explanations(generated_at);
+CREATE INDEX idx_violation_ai_explanations_health_risk ON violation_ai_explanations(health_risk_level);
+CREATE INDEX idx_violation_ai_explanations_pwsid ON violation_ai_explanations(pwsid);
+CREATE INDEX idx_violation_ai_explanations_severity ON violation_ai_explanations(severity_score);
+CREATE INDEX idx_violation_ai_explanations_violation_id ON violation_ai_explanations(violation_id);
+
+CREATE TRIGGER trigger_update_violation_ai_explanations_updated_at BEFORE UPDATE ON violation_ai_explanations
+    FOR EACH ROW EXECUTE FUNCTION update_violation_ai_explanations_updated_at();
+
+-- Before the insert, so the unique index never sees two current explanations
+CREATE TRIGGER trigger_archive_old_explanations BEFORE INSERT ON violation_ai_explanations
+    FOR EACH ROW EXECUTE FUNCTION archive_old_explanations();
+
+-- ============================================================================
+-- DATA HEALTH SAMPLING
+-- ============================================================================
+
+-- A block sample with a fixed seed picks the same block numbers in every partition,
+-- so a partitioned table with many small partitions can come back with no rows at
+-- all. The sample is instead a UNION ALL of a block sample of each leaf partition,
+-- each with its own seed, still planned and run as one query per foreign key.
+CREATE OR REPLACE FUNCTION health_foreign_key_orphans(exact_counts BOOLEAN DEFAULT FALSE, sample_rows INTEGER DEFAULT 2000)
+RETURNS TABLE (
+    constraint_name TEXT,
+    table_name TEXT,
+    references_table TEXT,
+    missing_parent BIGINT,
+    removed_parent BIGINT,
+    rows_checked BIGINT,
+    estimated BOOLEAN
+) AS $$
+DECLARE
+    fk RECORD;
+    total BIGINT;
+    sample TEXT;
+    missing BIGINT;
+    removed BIGINT;
+    checked BIGINT;
+BEGIN
+    FOR fk IN
+        SELECT con.conname::TEXT AS name, con.conrelid::regclass AS child, con.confrelid::regclass AS parent,
+               (SELECT string_agg(format('c.%I IS NOT NULL', a.attname), ' AND ')
+                FROM unnest(con.conkey) k(attnum)
+                JOIN pg_attribute a ON a.attrelid = con.conrelid AND a.attnum = k.attnum) AS not_null,
+               (SELECT string_agg(format('p.%I = c.%I', pa.attname, ca.attname), ' AND ')
+                FROM unnest(con.conkey, con.confkey) k(child_attnum, parent_attnum)
+                JOIN pg_attribute ca ON ca.attrelid = con.conrelid AND ca.attnum = k.child_attnum
+                JOIN pg_attribute pa ON pa.attrelid = con.confrelid AND pa.attnum = k.parent_attnum) AS join_on,
+               (SELECT format('p.%I', pa.attname)
+                FROM pg_attribute pa WHERE pa.attrelid = con.confrelid AND pa.attnum = con.confkey[1]) AS parent_key,
+               (SELECT COUNT(*) = 2 FROM pg_attribute a
+                WHERE a.attrelid IN (con.conrelid, con.confrelid) AND a.attname = 'removed_at'
+                  AND NOT a.attisdropped) AS both_removable
+        FROM pg_constraint con
+        WHERE con.contype = 'f' AND con.conparentid = 0
+          AND con.connamespace = 'public'::regnamespace
+        ORDER BY con.conrelid::regclass::TEXT, con.conname
+    LOOP
+        total := health_estimated_rows(fk.child);
+        estimated := NOT exact_counts AND total > sample_rows;
+        IF estimated THEN
+            -- pg_partition_tree() is empty for a table that is not partitioned: then it is the one leaf
+            SELECT '(' || string_agg(format('SELECT * FROM %s TABLESAMPLE SYSTEM (%s) REPEATABLE (%s)',
+                                            leaf.relid::regclass, round(100.0 * sample_rows / total, 4), leaf.seed - 1),
+                                     ' UNION ALL ') || ')'
+            INTO sample
+            FROM (
+                SELECT l.relid, row_number() OVER (ORDER BY l.relid::regclass::TEXT) AS seed
+                FROM (SELECT t.relid FROM pg_partition_tree(fk.child) t WHERE t.isleaf
+                      UNION ALL
+                      SELECT fk.child::oid WHERE NOT EXISTS (SELECT 1 FROM pg_partition_tree(fk.child))) l
+            ) leaf;
+        ELSE
+            sample := fk.child::TEXT;
+        END IF;
+
+        EXECUTE format(
+            'SELECT COUNT(*) FILTER (WHERE %s IS NULL), %s, COUNT(*) FROM %s c LEFT JOIN %s p ON %s WHERE %s',
+            fk.parent_key,
+            CASE WHEN fk.both_removable
+                 THEN 'COUNT(*) FILTER (WHERE c.removed_at IS NULL AND p.removed_at IS NOT NULL)'
+                 ELSE 'NULL::BIGINT' END,
+            sample, fk.parent, fk.join_on, fk.not_null)
+        INTO missing, removed, checked;
+
+        constraint_name := fk.name;
+        table_name := fk.child::TEXT;
+        references_table := fk.parent::TEXT;
+        rows_checked := checked;
+        IF estimated AND checked > 0 THEN
+            missing_parent := ROUND(missing * total::NUMERIC / checked);
+            removed_parent := ROUND(removed * total::NUMERIC / checked);
+        ELSE
+            missing_parent := missing;
+            removed_parent := removed;
+        END IF;
+        RETURN NEXT;
+    END LOOP;
+END;
+$$ LANGUAGE plpgsql STABLE;
+
+-- ============================================================================
+-- RECREATE DEPENDENT VIEWS
+-- ============================================================================
+
+DO $$
+DECLARE
+    saved RECORD;
+    statement TEXT;
+BEGIN
+    FOR saved IN SELECT * FROM partitioning_saved_views ORDER BY position LOOP
+        FOREACH statement IN ARRAY saved.statements LOOP
+            EXECUTE statement;
+        END LOOP;
+    END LOOP;
+END $$;
+
+DROP TABLE partitioning_saved_views;
+
+-- Autovacuum never analyzes a partitioned parent, and plans over the parent use its statistics
+ANALYZE violations_enforcement;
+ANALYZE violation_locations;
+ANALYZE violation_ai_explanations;
+
+COMMENT ON FUNCTION create_quarter_partitions(VARCHAR) IS 'Creates the partitions of a submission quarter in the violation tables that lack one; called by import_data.py';
+COMMENT ON FUNCTION drop_quarter_partitions(VARCHAR, BOOLEAN) IS 'Detaches the violation partitions of a quarter and drops them, or keeps them as standalone tables';
+COMMENT ON FUNCTION retire_quarter(VARCHAR) IS 'Removes a submission quarter: drops its violation partitions and deletes its rows from the other quarter-keyed tables';
@@ -0,0 +1,186 @@
+-- Keep the map legend on the health-based and unaddressed rule
+-- 20250104000005 made violation_locations.severity_level and map_color a band of
+-- the severity score. That changed what the markers show: a health-based,
+-- unaddressed violation at a small system with no notification tier scores 7 and
+-- became 'warning', while a tier 1 monitoring violation at a large system scores 9
+-- and became 'critical'. county_violations_map still used the old rule, so county
+-- and marker colors disagreed. The markers go back to the original legend, kept as
+-- data in map_severity_levels; the severity score still drives the explanation's
+-- health_risk_level and the AI candidate order.
+
+-- ============================================================================
+-- MAP LEGEND
+-- ============================================================================
+
+-- One row per combination of health-based and unaddressed; rank orders the levels
+-- when a map cluster takes the color of its most severe violation
+CREATE TABLE IF NOT EXISTS map_severity_levels (
+    severity_level VARCHAR(20) PRIMARY KEY,
+    rank INTEGER NOT NULL UNIQUE,
+    is_health_based BOOLEAN NOT NULL,
+    is_unaddressed BOOLEAN NOT NULL,
+    map_color VARCHAR(7) NOT NULL,
+    UNIQUE (is_health_based, is_unaddressed)
+);
+
+INSERT INTO map_severity_levels (severity_level, rank, is_health_based, is_unaddressed, map_color) VALUES
+    ('critical', 4, TRUE, TRUE, '#dc2626'),
+    ('warning', 3, TRUE, FALSE, '#f59e0b'),
+    ('moderate', 2, FALSE, TRUE, '#3b82f6'),
+    ('low', 1, FALSE, FALSE, '#10b981')
+ON CONFLICT DO NOTHING;
+
+-- ============================================================================
+-- SCORING
+-- ============================================================================
+
+CREATE OR REPLACE FUNCTION violation_severity_scores()
+RETURNS TABLE (
+    submission_year_quarter VARCHAR(7),
+    pwsid VARCHAR(9),
+    violation_id VARCHAR(20),
+    severity_score INTEGER,
+    health_risk_level VARCHAR(20),
+    map_severity_level VARCHAR(20),
+    map_color VARCHAR(7)
+) AS $$
+    WITH facts AS (
+        SELECT
+            f.*,
+            -- federal_mcl is free text; only plain decimals count (same rule as severity_scoring.py)
+            CASE WHEN btrim(f.federal_mcl) ~ '^[0-9]*\.?[0-9]+$' THEN btrim(f.federal_mcl)::numeric END AS mcl
+        FROM violation_severity_facts f
+    ),
+    scored AS (
+        SELECT
+            f.submission_year_quarter,
+            f.pwsid,
+            f.violation_id,
+            COALESCE(f.is_health_based_ind = 'Y', FALSE) AS is_health_based,
+            COALESCE(f.violation_status = 'Unaddressed', FALSE) AS is_unaddressed,
+            LEAST(10, GREATEST(1,
+                base.points
+                + COALESCE(contaminant.points, 0)
+                + COALESCE(status.points, 0)
+                + COALESCE(health_based.points, 0)
+                + COALESCE(school.points, 0)
+                + COALESCE(tier.points, 0)
+                + COALESCE(population.points, 0)
+                + COALESCE(mcl_ratio.points, 0)
+            ))::integer AS severity_score
+        FROM facts f
+        CROSS JOIN (SELECT COALESCE(SUM(r.points), 0) AS points FROM severity_scoring_rules r WHERE r.factor = 'base') base
+        LEFT JOIN severity_scoring_rules contaminant
+            ON contaminant.factor = 'contaminant' AND contaminant.match_value = f.contaminant_code
+        LEFT JOIN severity_scoring_rules status
+            ON status.factor = 'status' AND status.match_value = f.violation_status
+        LEFT JOIN severity_scoring_rules health_based
+            ON health_based.factor = 'health_based' AND health_based.match_value = f.is_health_based_ind
+        LEFT JOIN severity_scoring_rules school
+            ON school.factor = 'school' AND school.match_value = CASE WHEN f.is_school_or_daycare THEN 'Y' ELSE 'N' END
+        LEFT JOIN severity_scoring_rules tier
+            ON tier.factor = 'notification_tier' AND tier.match_value = f.public_notification_tier::text
+        LEFT JOIN LATERAL (
+            SELECT r.points FROM severity_scoring_rules r
+            WHERE r.factor = 'population' AND f.population_served > r.min_value
+            ORDER BY r.min_value DESC
+            LIMIT 1
+        ) population ON TRUE
+        LEFT JOIN LATERAL (
+            SELECT r.points FROM severity_scoring_rules r
+            WHERE r.factor = 'mcl_ratio' AND f.mcl > 0 AND f.viol_measure > f.mcl * r.min_value
+            ORDER BY r.min_value DESC
+            LIMIT 1
+        ) mcl_ratio ON TRUE
+    )
+    SELECT
+        s.submission_year_quarter,
+        s.pwsid,
+        s.violation_id,
+        s.severity_score,
+        level.health_risk_level,
+        marker.severity_level,
+        marker.map_color
+    FROM scored s
+    LEFT JOIN LATERAL (
+        SELECT l.* FROM severity_risk_levels l
+        WHERE l.min_score <= s.severity_score
+        ORDER BY l.min_score DESC
+        LIMIT 1
+    ) level ON TRUE
+    LEFT JOIN map_severity_levels marker
+        ON marker.is_health_based = s.is_health_based AND marker.is_unaddressed = s.is_unaddressed;
+$$ LANGUAGE sql STABLE;
+
+-- ============================================================================
+-- MAP TILES
+-- ============================================================================
+
+CREATE OR REPLACE FUNCTION build_map_tile_clusters(z INTEGER, x INTEGER, y INTEGER, target_quarter VARCHAR(7))
+RETURNS JSONB AS $$
+    WITH locations AS (
+        SELECT
+            wsl.id,
+            wsl.pwsid,
+            wsl.latitude::double precision AS latitude,
+            wsl.longitude::double precision AS longitude,
+            COUNT(*) AS violation_count,
+            COUNT(*) FILTER (WHERE vl.severity_level = 'critical') AS critical_count,
+            COUNT(*) FILTER (WHERE vl.severity_level = 'warning') AS warning_count,
+            COUNT(*) FILTER (WHERE vl.severity_level = 'moderate') AS moderate_count,
+            COUNT(*) FILTER (WHERE vl.severity_level = 'low') AS low_count,
+            MAX(r.rank) AS worst_rank
+        FROM map_tile_bounds(z, x, y) b
+        JOIN water_system_locations wsl ON wsl.geom && ST_MakeEnvelope(b.west, b.south, b.east, b.north, 4326)
+        JOIN violation_locations vl ON vl.water_system_location_id = wsl.id
+        LEFT JOIN map_severity_levels r ON r.severity_level = vl.severity_level
+        WHERE wsl.submission_year_quarter = target_quarter
+            -- The index search includes points on the edges; keep the ones this tile owns
+            AND floor(map_world_x(wsl.longitude::double precision, z)) = x
+            AND floor(map_world_y(wsl.latitude::double precision, z)) = y
+        GROUP BY wsl.id
+    ),
+    clusters AS (
+        SELECT
+            SUM(l.latitude * l.violation_count) / SUM(l.violation_count) AS latitude,
+            SUM(l.longitude * l.violation_count) / SUM(l.violation_count) AS longitude,
+            COUNT(*) AS location_count,
+            SUM(l.violation_count) AS violation_count,
+            SUM(l.critical_count) AS critical_count,
+            SUM(l.warning_count) AS warning_count,
+            SUM(l.moderate_count) AS moderate_count,
+            SUM(l.low_count) AS low_count,
+            MAX(l.worst_rank) AS worst_rank,
+            CASE WHEN COUNT(*) = 1 THEN MIN(l.pwsid) END AS pwsid
+        FROM locations l
+        GROUP BY
+            CASE WHEN z < 14 THEN floor((map_world_x(l.longitude, z) - x) * 256 / 32) END,
+            CASE WHEN z < 14 THEN floor((map_world_y(l.latitude, z) - y) * 256 / 32) END,
+            CASE WHEN z >= 14 THEN l.id END
+    )
+    SELECT COALESCE(jsonb_agg(jsonb_build_object(
+        'latitude', c.latitude,
+        'longitude', c.longitude,
+        'location_count', c.location_count,
+        'violation_count', c.violation_count,
+        'critical_count', c.critical_count,
+        'warning_count', c.warning_count,
+        'moderate_count', c.moderate_count,
+        'low_count', c.low_count,
+        'severity_level', r.severity_level,
+        'map_color', r.map_color,
+        'pwsid', c.pwsid
+    ) ORDER BY c.violation_count DESC), '[]'::jsonb)
+    FROM clusters c
+    LEFT JOIN map_severity_levels r ON r.rank = c.worst_rank;
+$$ LANGUAGE sql STABLE;
+
+-- The score bands no longer set the map marker
+ALTER TABLE severity_risk_levels DROP COLUMN IF EXISTS map_severity_level, DROP COLUMN IF EXISTS map_color;
+
+-- Restore the original marker of every violation; the tile triggers drop the cached tiles they were in
+SELECT * FROM rescore_violations();
+
+COMMENT ON TABLE map_severity_levels IS 'Map marker severity and color of a violation, from whether it is health-based and unaddressed';
+COMMENT ON TABLE severity_risk_levels IS 'Lowest severity score of each explanation health risk level';
+COMMENT ON FUNCTION violation_severity_scores() IS 'Severity score and risk level of every violation from severity_scoring_rules, and its map marker from map_severity_levels';
@@ -0,0 +1,60 @@
+-- Map sync watermark that cannot skip concurrent writes
+-- sync_map_locations() recorded NOW(), its own transaction start, as synced_at and
+-- the next sync read rows with updated_at > synced_at. updated_at is stamped with the
+-- writer's transaction start, so a row written by an import that began before the
+-- sync but committed after it was read carried an older stamp than synced_at and
+-- was never picked up. A staged import is one transaction stamped when it began, so
+-- this was the normal case for a sync running during a bulk load.
+--
+-- The sync now records the start of the oldest transaction open when it begins,
+-- its own included, less a microsecond since changes are read strictly after it.
+-- Every row it could not see belongs to such a transaction and is stamped no
+-- earlier than that. Rows it did see may be read again by the next sync; the
+-- populate functions skip rows that did not change. A sync that overlapped an
+-- import also stays older than the import's checkpoint, so data_health_check()
+-- keeps reporting the quarter as stale until the next sync.
+-- Seeing other sessions' transaction start needs pg_read_all_stats or superuser, as
+-- the postgres role that import_data.py connects as has.
+
+CREATE OR REPLACE FUNCTION sync_map_locations(target_quarter VARCHAR(7) DEFAULT NULL)
+RETURNS TABLE (quarter VARCHAR(7), systems_changed INTEGER, violations_changed INTEGER) AS $$
+DECLARE
+    last_synced TIMESTAMP WITH TIME ZONE;
+    watermark TIMESTAMP WITH TIME ZONE;
+BEGIN
+    -- Read before any source table is, so every transaction invisible to the reads below is counted
+    SELECT COALESCE(MIN(a.xact_start), NOW()) - INTERVAL '1 microsecond' INTO watermark
+    FROM pg_stat_activity a
+    WHERE a.datname = current_database() AND a.xact_start IS NOT NULL;
+
+    FOR quarter IN
+        SELECT DISTINCT p.submission_year_quarter
+        FROM public_water_systems p
+        WHERE target_quarter IS NULL OR p.submission_year_quarter = target_quarter
+        ORDER BY 1
+    LOOP
+        SELECT m.synced_at INTO last_synced
+        FROM map_location_syncs m
+        WHERE m.submission_year_quarter = quarter;
+
+        systems_changed := populate_water_system_locations(quarter, last_synced);
+        -- populate_violation_locations() joins the rows just written
+        IF systems_changed > 0 THEN
+            ANALYZE water_system_locations;
+        END IF;
+        violations_changed := populate_violation_locations(quarter, last_synced);
+
+        INSERT INTO map_location_syncs AS m (submission_year_quarter, synced_at, systems_changed, violations_changed)
+        VALUES (quarter, watermark, sync_map_locations.systems_changed, sync_map_locations.violations_changed)
+        ON CONFLICT (submission_year_quarter) DO UPDATE SET
+            synced_at = EXCLUDED.synced_at,
+            systems_changed = EXCLUDED.systems_changed,
+            violations_changed = EXCLUDED.violations_changed;
+
+        RETURN NEXT;
+    END LOOP;
+END;
+$$ LANGUAGE plpgsql;
+
+COMMENT ON COLUMN map_location_syncs.synced_at IS 'Rows updated after this are applied by the next sync: the start of the oldest transaction open when the last sync began';
+COMMENT ON FUNCTION sync_map_locations(VARCHAR) IS 'Applies changes since the last sync to the map tables of one quarter or all; called by import_data.py';
@@ -0,0 +1,233 @@
+-- System lists read each system's latest quarter
+-- system_violation_summary has one row per system and quarter, and the views and
+-- RPCs rebuilt on it in 20250104000006 to 20250104000009 read it without a quarter
+-- filter. Before that they grouped by system across quarters; after it, a database
+-- holding more than one quarter listed every system once per quarter in
+-- system_health_dashboard, current_violations_summary, county_summary and the
+-- get_systems_sorted pages.
+--
+-- The summary now marks each system's latest quarter in is_latest, and every list
+-- reads only those rows: one row per system showing its current state. A system
+-- missing from newer exports keeps its last reported quarter. The partial indexes
+-- cover the latest rows only, so the list pages stay range scans however many
+-- quarters are loaded.
+
+-- ============================================================================
+-- SUMMARY WITH THE LATEST QUARTER FLAG
+-- ============================================================================
+
+-- Same definition as 20250104000009 plus is_latest; the views that read it are
+-- rebuilt below
+DROP MATERIALIZED VIEW IF EXISTS system_violation_summary CASCADE;
+
+CREATE MATERIALIZED VIEW system_violation_summary AS
+SELECT
+    s.*,
+    ARRAY[
+        CASE s.health_status WHEN 'RED' THEN 1 WHEN 'YELLOW' THEN 2 ELSE 3 END,
+        -s.critical_violations,
+        -s.unaddressed_violations,
+        -COALESCE(s.population_served_count, 2147483647),
+        -(substr(s.submission_year_quarter, 1, 4)::bigint * 10 + substr(s.submission_year_quarter, 6, 1)::bigint)
+    ]::bigint[] AS sort_key,
+    s.submission_year_quarter = MAX(s.submission_year_quarter) OVER (PARTITION BY s.pwsid) AS is_latest
+FROM (
+    SELECT
+        p.submission_year_quarter,
+        p.pwsid,
+        p.pws_name,
+        p.pws_type_code,
+        p.pws_activity_code,
+        p.population_served_count,
+        p.state_code,
+        a.county_served,
+        a.city_served,
+        COALESCE(v.total_violations, 0) AS total_violations,
+        COALESCE(v.health_violations, 0) AS health_violations,
+        COALESCE(v.unaddressed_violations, 0) AS unaddressed_violations,
+        COALESCE(v.resolved_violations, 0) AS resolved_violations,
+        COALESCE(v.critical_violations, 0) AS critical_violations,
+        v.latest_violation_date,
+        CASE
+            WHEN COALESCE(v.critical_violations, 0) > 0 THEN 'RED'
+            WHEN COALESCE(v.health_violations, 0) > 0 THEN 'YELLOW'
+            ELSE 'GREEN'
+        END AS health_status
+    FROM public_water_systems p
+    JOIN system_primary_area a ON a.submission_year_quarter = p.submission_year_quarter AND a.pwsid = p.pwsid
+    LEFT JOIN (
+        SELECT
+            submission_year_quarter,
+            pwsid,
+            COUNT(*) AS total_violations,
+            COUNT(*) FILTER (WHERE is_health_based_ind = 'Y') AS health_violations,
+            COUNT(*) FILTER (WHERE violation_status = 'Unaddressed') AS unaddressed_violations,
+            COUNT(*) FILTER (WHERE violation_status = 'Resolved') AS resolved_violations,
+            COUNT(*) FILTER (WHERE is_health_based_ind = 'Y' AND violation_status = 'Unaddressed') AS critical_violations,
+            MAX(non_compl_per_begin_date) AS latest_violation_date
+        FROM violations_enforcement
+        GROUP BY submission_year_quarter, pwsid
+    ) v ON v.submission_year_quarter = p.submission_year_quarter AND v.pwsid = p.pwsid
+) s;
+
+-- Required by REFRESH ... CONCURRENTLY
+CREATE UNIQUE INDEX idx_system_violation_summary_key
+    ON system_violation_summary(submission_year_quarter, pwsid);
+CREATE INDEX idx_system_violation_summary_latest
+    ON system_violation_summary(pwsid) WHERE is_latest;
+CREATE INDEX idx_system_violation_summary_status
+    ON system_violation_summary(health_status) WHERE pws_activity_code = 'A' AND is_latest;
+-- Pages of the active list are range scans; the listed columns make them index-only
+CREATE INDEX idx_system_violation_summary_sort
+    ON system_violation_summary(sort_key, pwsid)
+    INCLUDE (pws_name, pws_type_code, population_served_count, county_served, city_served, health_status, critical_violations, unaddressed_violations, submission_year_quarter)
+    WHERE pws_activity_code = 'A' AND is_latest;
+
+COMMENT ON MATERIALIZED VIEW system_violation_summary IS 'Violation counts, health status and primary area per system and quarter; refreshed by refresh_system_violation_summary() after imports';
+COMMENT ON COLUMN system_violation_summary.sort_key IS 'Worst-first list position: status rank, then negated critical, unaddressed, population and quarter';
+COMMENT ON COLUMN system_violation_summary.county_served IS 'County from system_primary_area';
+COMMENT ON COLUMN system_violation_summary.is_latest IS 'True on the newest quarter loaded for the system; the system lists read only these rows';
+
+-- ============================================================================
+-- VIEWS AND RPC
+-- ============================================================================
+
+CREATE OR REPLACE VIEW current_violations_summary AS
+SELECT
+    s.pwsid,
+    s.pws_name,
+    s.pws_type_code,
+    s.population_served_count,
+    s.state_code,
+    s.total_violations,
+    s.health_violations,
+    s.unaddressed_violations,
+    s.resolved_violations,
+    s.latest_violation_date
+FROM system_violation_summary s
+WHERE s.is_latest;
+
+CREATE OR REPLACE VIEW system_health_dashboard AS
+SELECT
+    s.pwsid,
+    s.pws_name,
+    s.pws_type_code,
+    s.population_served_count,
+    s.county_served,
+    s.city_served,
+    s.health_status,
+    s.critical_violations,
+    s.unaddressed_violations AS total_unaddressed
+FROM system_violation_summary s
+WHERE s.pws_activity_code = 'A' AND s.is_latest;
+
+-- county_summary keeps one row per county a system serves: a system in two counties
+-- counts toward both, which is what a per-county total means
+CREATE OR REPLACE VIEW county_summary AS
+SELECT
+    g.county_served,
+    g.state_served,
+    COUNT(DISTINCT s.pwsid) as total_systems,
+    SUM(s.population_served_count) as total_population,
+    SUM(s.critical_violations)::bigint as critical_violations,
+    SUM(s.total_violations)::bigint as total_violations
+FROM geographic_areas g
+JOIN system_violation_summary s ON s.pwsid = g.pwsid AND s.submission_year_quarter = g.submission_year_quarter
+WHERE g.area_type_code = 'CN' AND s.is_latest
+GROUP BY g.county_served, g.state_served;
+
+COMMENT ON VIEW system_health_dashboard IS 'Health status per active system in its latest quarter, read from system_violation_summary';
+COMMENT ON VIEW current_violations_summary IS 'Violation statistics per system in its latest quarter, read from system_violation_summary';
+COMMENT ON VIEW county_summary IS 'County totals over each system''s latest quarter, read from system_violation_summary';
+
+CREATE OR REPLACE FUNCTION get_systems_sorted_after(
+    after_sort_key BIGINT[] DEFAULT NULL,
+    after_pwsid VARCHAR(9) DEFAULT NULL,
+    page_limit INTEGER DEFAULT 20
+)
+RETURNS TABLE (
+    pwsid VARCHAR(9),
+    pws_name VARCHAR(100),
+    pws_type_code VARCHAR(6),
+    population_served_count INTEGER,
+    county_served VARCHAR(40),
+    city_served VARCHAR(40),
+    health_status TEXT,
+    critical_violations BIGINT,
+    total_unaddressed BIGINT,
+    sort_key BIGINT[]
+) AS $$
+BEGIN
+    RETURN QUERY
+    SELECT
+        s.pwsid,
+        s.pws_name,
+        s.pws_type_code,
+        s.population_served_count,
+        s.county_served,
+        s.city_served,
+        s.health_status,
+        s.critical_violations,
+        s.unaddressed_violations,
+        s.sort_key
+    FROM system_violation_summary s
+    WHERE s.pws_activity_code = 'A'
+      AND s.is_latest
+      AND (after_sort_key IS NULL OR (s.sort_key, s.pwsid) > (after_sort_key, after_pwsid))
+    ORDER BY s.sort_key, s.pwsid
+    LIMIT page_limit;
+END;
+$$ LANGUAGE plpgsql STABLE;
+
+-- ============================================================================
+-- SEARCH VIEW
+-- ============================================================================
+
+-- Dropped with the summary above. Same definition as 20250104000014, reading the
+-- latest rows through is_latest instead of DISTINCT ON
+CREATE MATERIALIZED VIEW system_search AS
+SELECT
+    n.pwsid,
+    n.submission_year_quarter,
+    n.pws_name,
+    n.pws_type_code,
+    n.pws_activity_code,
+    n.population_served_count,
+    n.county_served,
+    n.city_served,
+    n.health_status,
+    n.critical_violations,
+    -- Name words weigh most, then places, then codes
+    setweight(to_tsvector('simple', n.name_key), 'A')
+        || setweight(to_tsvector('simple', n.places), 'B')
+        || setweight(to_tsvector('simple', n.codes), 'C') AS document,
+    n.name_key,
+    trim(n.name_key || ' ' || n.places) AS search_text
+FROM (
+    SELECT
+        s.*,
+        -- Lower case words of letters and digits, like the normalized search query: the
+        -- parser would otherwise keep 'TERRACE/PRIMROSE' or 'A.B.C.' as single words
+        trim(lower(regexp_replace(COALESCE(s.pws_name, ''), '[^[:alnum:]]+', ' ', 'g'))) AS name_key,
+        trim(lower(regexp_replace(concat_ws(' ', a.cities, a.counties, p.city_name), '[^[:alnum:]]+', ' ', 'g'))) AS places,
+        lower(concat_ws(' ', s.pwsid, a.zip_codes, left(p.zip_code, 5))) AS codes
+    FROM system_violation_summary s
+    JOIN public_water_systems p ON p.submission_year_quarter = s.submission_year_quarter AND p.pwsid = s.pwsid
+    LEFT JOIN LATERAL (
+        SELECT
+            string_agg(DISTINCT g.city_served, ' ') AS cities,
+            string_agg(DISTINCT g.county_served, ' ') AS counties,
+            string_agg(DISTINCT g.zip_code_served, ' ') AS zip_codes
+        FROM geographic_areas g
+        WHERE g.submission_year_quarter = s.submission_year_quarter
+          AND g.pwsid = s.pwsid
+    ) a ON TRUE
+    WHERE s.is_latest
+) n;
+
+-- Required by REFRESH ... CONCURRENTLY
+CREATE UNIQUE INDEX idx_system_search_pwsid ON system_search(pwsid);
+CREATE INDEX idx_system_search_document ON system_search USING GIN(document);
+CREATE INDEX idx_system_search_trigram ON system_search USING GIN(search_text gin_trgm_ops);
+
+COMMENT ON MATERIALIZED VIEW system_search IS 'One row per system (latest quarter) with its name, places and codes indexed for search; refreshed by refresh_system_search() after imports';
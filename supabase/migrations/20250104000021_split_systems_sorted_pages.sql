@@ -0,0 +1,79 @@
+-- First and later pages of the sorted system list as separate queries
+-- get_systems_sorted_after() served both with one statement filtered by
+-- "after_sort_key IS NULL OR (sort_key, pwsid) > (...)". PL/pgSQL caches the plan,
+-- and once it switches to a generic plan the OR cannot become an index range
+-- bound: later pages read the sort index from its start and filter, so page N
+-- costs what pages 1 to N do together. Each page shape now has its own query,
+-- an index scan from the start for the first page and from the cursor for the rest.
+--
+-- Pages read the rows marked is_latest (20250104000020), one per system. The
+-- quarter that ends sort_key is the same for most systems; it only orders systems
+-- whose status, counts and population tie, the more recently reported first,
+-- before pwsid decides.
+
+-- ============================================================================
+-- KEYSET PAGINATION
+-- ============================================================================
+
+CREATE OR REPLACE FUNCTION get_systems_sorted_after(
+    after_sort_key BIGINT[] DEFAULT NULL,
+    after_pwsid VARCHAR(9) DEFAULT NULL,
+    page_limit INTEGER DEFAULT 20
+)
+RETURNS TABLE (
+    pwsid VARCHAR(9),
+    pws_name VARCHAR(100),
+    pws_type_code VARCHAR(6),
+    population_served_count INTEGER,
+    county_served VARCHAR(40),
+    city_served VARCHAR(40),
+    health_status TEXT,
+    critical_violations BIGINT,
+    total_unaddressed BIGINT,
+    sort_key BIGINT[]
+) AS $$
+BEGIN
+    IF after_sort_key IS NULL THEN
+        RETURN QUERY
+        SELECT
+            s.pwsid,
+            s.pws_name,
+            s.pws_type_code,
+            s.population_served_count,
+            s.county_served,
+            s.city_served,
+            s.health_status,
+            s.critical_violations,
+            s.unaddressed_violations,
+            s.sort_key
+        FROM system_violation_summary s
+        WHERE s.pws_activity_code = 'A'
+          AND s.is_latest
+        ORDER BY s.sort_key, s.pwsid
+        LIMIT page_limit;
+    ELSE
+        RETURN QUERY
+        SELECT
+            s.pwsid,
+            s.pws_name,
+            s.pws_type_code,
+            s.population_served_count,
+            s.county_served,
+            s.city_served,
+            s.health_status,
+            s.critical_violations,
+            s.unaddressed_violations,
+            s.sort_key
+        FROM system_violation_summary s
+        WHERE s.pws_activity_code = 'A'
+          AND s.is_latest
+          AND (s.sort_key, s.pwsid) > (after_sort_key, after_pwsid)
+        ORDER BY s.sort_key, s.pwsid
+        LIMIT page_limit;
+    END IF;
+END;
+$$ LANGUAGE plpgsql STABLE;
+
+COMMENT ON COLUMN system_violation_summary.sort_key IS 'Worst-first list position: status rank, then negated critical, unaddressed and population, then negated quarter as a tiebreak';
+COMMENT ON FUNCTION get_systems_sorted_after IS 'Active water systems in their latest quarter, worst first, continuing after the given (sort_key, pwsid); page N costs the same as page 1';
+COMMENT ON FUNCTION get_systems_sorted IS 'Offset-paged get_systems_sorted_after(), kept for existing callers; one row per system';